@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+
+"""
+Microbenchmarks of the CPU-heavy parts of the write and read paths --
+object_from_json, artifact_diff, object_to_json, class_to_jsonschema, and
+ArtifactSchema().dump -- on large synthetic artifacts (hundreds of files,
+members, tags, and affiliations).  For each, reports timing percentiles
+over repeated runs (after warmup runs, which PyPy's JIT needs), and, under
+CPython, a tracemalloc allocation profile: peak and retained memory and
+the top allocation sites.  Results are JSON, and may be compared with an
+earlier run's.
+
+Only object_from_json touches the database (to resolve references, once
+per run and outside the timed section), and nothing is written.  Run it
+with the app configured for a test database, under CPython:
+
+    FLASK_INSTANCE_CONFIG_FILE=... python benchmarks/bench_hot_paths.py --output cpython.json
+
+and under PyPy, in the image built from the Dockerfile:
+
+    docker run --rm -v $PWD/benchmarks:/app/benchmarks \\
+        -e FLASK_INSTANCE_CONFIG_FILE=... <image> \\
+        pypy3 benchmarks/bench_hot_paths.py --output pypy.json
+"""
+
+import argparse
+import collections
+import copy
+import json
+import platform
+import subprocess
+import time
+try:
+    import tracemalloc
+except ImportError:
+    # PyPy has no tracemalloc.
+    tracemalloc = None
+
+from payloads import make_artifacts
+
+from searcch_backend.api.app import app, db
+from searcch_backend.api.common.sql import (
+    object_from_json, object_to_json, artifact_diff, class_to_jsonschema,
+    get_primary_key_for_class, NaturalKeyResolver)
+from searcch_backend.models.model import Artifact, ArtifactTag
+from searcch_backend.models.schema import ArtifactSchema
+
+CASES = ("object_from_json", "artifact_diff", "object_to_json",
+         "class_to_jsonschema", "schema_dump")
+TRACE_ALLOCATIONS = tracemalloc is not None
+
+def build_artifacts(docs):
+    """
+    Returns transient Artifacts built from `docs`, with every object in each
+    graph given a primary key, as if loaded from the database.
+    """
+    with db.session.no_autoflush:
+        artifacts = [
+            object_from_json(
+                db.session, Artifact, doc, skip_primary_keys=True,
+                allow_fk=True, resolve=True)
+            for doc in copy.deepcopy(docs) ]
+    db.session.rollback()
+    next_id = [1]
+    def assign(obj, seen):
+        if id(obj) in seen:
+            return
+        seen.add(id(obj))
+        pk = get_primary_key_for_class(obj.__class__)
+        if pk and getattr(obj, pk, None) is None:
+            setattr(obj, pk, next_id[0])
+            next_id[0] += 1
+        for (k, relprop) in obj.__class__.__mapper__.relationships.items():
+            if relprop.backref or relprop.viewonly:
+                continue
+            v = getattr(obj, k)
+            for x in (v if relprop.uselist else [v] if v is not None else []):
+                assign(x, seen)
+    for artifact in artifacts:
+        assign(artifact, set())
+    return artifacts
+
+def clone(obj, memo):
+    """
+    Returns a deep copy of an object graph, with the same primary keys.
+    """
+    if id(obj) in memo:
+        return memo[id(obj)]
+    mapper = obj.__class__.__mapper__
+    c = obj.__class__(**dict(
+        (k, getattr(obj, k)) for k in mapper.column_attrs.keys()))
+    memo[id(obj)] = c
+    for (k, relprop) in mapper.relationships.items():
+        if relprop.backref or relprop.viewonly:
+            continue
+        v = getattr(obj, k)
+        if relprop.uselist:
+            setattr(c, k, [ clone(x, memo) for x in v ])
+        elif v is not None:
+            setattr(c, k, clone(v, memo))
+    return c
+
+def modified_copy(artifact):
+    """
+    Returns a copy of `artifact` with the kinds of edits a curator makes:
+    a new title, some tags removed and added, some file members changed, and
+    an affiliation removed.
+    """
+    mod = clone(artifact, {})
+    mod.title = mod.title + " (revised)"
+    mod.tags = [ t for (i, t) in enumerate(mod.tags) if i % 10 ] \
+      + [ ArtifactTag(tag="newtag%d" % (i,), source="curator") for i in range(10) ]
+    for f in mod.files:
+        for (i, m) in enumerate(f.members):
+            if i % 5 == 0:
+                m.size = (m.size or 0) + 1
+    mod.affiliations = mod.affiliations[1:]
+    return mod
+
+def make_cases(docs):
+    """
+    Returns, per case, a (setup, run) pair: setup() prepares one run's
+    input outside the timed section, and run(input) is timed.
+    """
+    artifacts = build_artifacts(docs)
+    schema = ArtifactSchema()
+
+    def setup_from_json():
+        docs_copy = copy.deepcopy(docs)
+        resolver = NaturalKeyResolver(db.session, allow_fk=True)
+        for doc in docs_copy:
+            resolver.collect(Artifact, doc)
+        resolver.resolve()
+        return (docs_copy, resolver)
+    def run_from_json(arg):
+        (docs_copy, resolver) = arg
+        with db.session.no_autoflush:
+            for doc in docs_copy:
+                object_from_json(
+                    db.session, Artifact, doc, skip_primary_keys=True,
+                    allow_fk=True, resolver=resolver)
+
+    def run_diff(mods):
+        for (artifact, mod) in zip(artifacts, mods):
+            artifact_diff(db.session, artifact, artifact, mod)
+
+    return collections.OrderedDict([
+        ("object_from_json", (setup_from_json, run_from_json)),
+        ("artifact_diff", (lambda: [ modified_copy(a) for a in artifacts ], run_diff)),
+        ("object_to_json", (lambda: None, lambda arg: [
+            object_to_json(a) for a in artifacts ])),
+        ("class_to_jsonschema", (lambda: None, lambda arg: class_to_jsonschema(Artifact))),
+        ("schema_dump", (lambda: None, lambda arg: [
+            schema.dump(a) for a in artifacts ])),
+    ])
+
+def percentile(sorted_values, p):
+    i = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[i]
+
+def allocation_profile(setup, run, top):
+    arg = setup()
+    tracemalloc.start(10)
+    try:
+        base = tracemalloc.take_snapshot()
+        run(arg)
+        (current, peak) = tracemalloc.get_traced_memory()
+        stats = tracemalloc.take_snapshot().compare_to(base, "lineno")
+    finally:
+        tracemalloc.stop()
+        db.session.rollback()
+    sites = [
+        dict(site="%s:%d" % (s.traceback[0].filename, s.traceback[0].lineno),
+             kb=round(s.size_diff / 1024.0, 1), count=s.count_diff)
+        for s in sorted(stats, key=lambda s: -s.size_diff)[:top] ]
+    return dict(alloc_peak_kb=round(peak / 1024.0, 1),
+                alloc_retained_kb=round(current / 1024.0, 1), top_allocations=sites)
+
+def bench(name, setup, run, repeat, warmup, top):
+    times = []
+    for i in range(warmup + repeat):
+        arg = setup()
+        t0 = time.perf_counter()
+        run(arg)
+        elapsed = time.perf_counter() - t0
+        db.session.rollback()
+        if i >= warmup:
+            times.append(elapsed)
+    times.sort()
+    ms = lambda t: round(t * 1000, 3)
+    result = collections.OrderedDict([
+        ("case", name), ("runs", repeat),
+        ("min_ms", ms(times[0])), ("median_ms", ms(percentile(times, 50))),
+        ("mean_ms", ms(sum(times) / len(times))), ("p95_ms", ms(percentile(times, 95))),
+        ("max_ms", ms(times[-1])) ])
+    if TRACE_ALLOCATIONS:
+        result.update(allocation_profile(setup, run, top))
+    return result
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", default=",".join(CASES))
+    parser.add_argument("--artifacts", type=int, default=5)
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--members", type=int, default=20)
+    parser.add_argument("--affiliations", type=int, default=300)
+    parser.add_argument("--tags", type=int, default=300)
+    parser.add_argument("--meta", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5,
+                        help="allocation sites to report per case")
+    parser.add_argument("--output", default=None, help="write results to this JSON file")
+    parser.add_argument("--baseline", default=None,
+                        help="compare medians with results from an earlier --output")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = dict((r["case"], r) for r in json.load(f)["results"])
+
+    docs = make_artifacts(
+        args.artifacts, files=args.files, members=args.members,
+        affiliations=args.affiliations, tags=args.tags, meta=args.meta)
+    results = []
+    with app.app_context():
+        cases = make_cases(docs)
+        for name in args.cases.split(","):
+            if name not in cases:
+                parser.error("unknown case %r" % (name,))
+            (setup, run) = cases[name]
+            result = bench(name, setup, run, args.repeat, args.warmup, args.top)
+            if name in baseline and baseline[name].get("median_ms"):
+                result["median_change_pct"] = round(
+                    100.0 * (result["median_ms"] - baseline[name]["median_ms"])
+                    / baseline[name]["median_ms"], 1)
+            results.append(result)
+            print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(dict(
+                python=platform.python_implementation(),
+                python_version=platform.python_version(),
+                machine=platform.machine(), revision=git_revision(),
+                time=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                params=dict((k, v) for (k, v) in vars(args).items()
+                            if k not in ("output", "baseline")),
+                results=results), f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+"""
+Times object_from_json() on large synthetic artifacts, and counts the
+queries it makes, with and without its identity cache, and with a
+NaturalKeyResolver.  Nothing is written to the database.
+
+Run it with the app configured for a test database, e.g.:
+
+    FLASK_INSTANCE_CONFIG_FILE=... python benchmarks/bench_object_from_json.py
+"""
+
+import argparse
+import copy
+import json
+import time
+
+import sqlalchemy
+
+from payloads import make_artifacts
+
+from searcch_backend.api.app import app, db
+from searcch_backend.api.common.sql import object_from_json, NaturalKeyResolver
+from searcch_backend.models.model import Artifact
+
+def run(mode, docs):
+    docs = copy.deepcopy(docs)
+    queries = [0]
+    def count(conn, cursor, statement, parameters, context, executemany):
+        queries[0] += 1
+    sqlalchemy.event.listen(db.engine, "before_cursor_execute", count)
+    try:
+        t0 = time.perf_counter()
+        with db.session.no_autoflush:
+            resolver = None
+            if mode == "resolver":
+                resolver = NaturalKeyResolver(db.session, allow_fk=True)
+                for doc in docs:
+                    resolver.collect(Artifact, doc)
+                resolver.resolve()
+            for doc in docs:
+                object_from_json(
+                    db.session, Artifact, doc, skip_primary_keys=True,
+                    allow_fk=True, enable_cache=(mode != "nocache"),
+                    resolver=resolver)
+        elapsed = time.perf_counter() - t0
+    finally:
+        sqlalchemy.event.remove(db.engine, "before_cursor_execute", count)
+        db.session.rollback()
+    return dict(mode=mode, artifacts=len(docs), seconds=round(elapsed, 4),
+                ms_per_artifact=round(elapsed * 1000 / len(docs), 3),
+                queries=queries[0])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--artifacts", type=int, default=10)
+    parser.add_argument("--affiliations", type=int, default=500)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--members", type=int, default=50)
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--modes", default="nocache,cache,resolver")
+    args = parser.parse_args()
+
+    docs = make_artifacts(
+        args.artifacts, affiliations=args.affiliations, files=args.files,
+        members=args.members, tags=args.tags)
+    with app.app_context():
+        for mode in args.modes.split(","):
+            best = None
+            for i in range(args.repeat):
+                result = run(mode, docs)
+                if best is None or result["seconds"] < best["seconds"]:
+                    best = result
+            print(json.dumps(best))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+
+"""
+Fills an empty, migrated database with a synthetic corpus for loadtest.py:
+artifacts with tags, metadata, affiliations, badges and publications;
+persons, organizations and users; and the users' ratings, reviews,
+favorites, and login sessions.  Rows are inserted directly, a batch of
+artifacts per transaction, so the database's triggers maintain the search
+index and artifact_stats as they would for imports.  Writes a manifest
+(artifact ids, session tokens) for loadtest.py.
+
+Run it with the app configured for a local benchmark database, e.g.:
+
+    FLASK_INSTANCE_CONFIG_FILE=... python benchmarks/gen_dataset.py --scale 100k
+"""
+
+import argparse
+import datetime
+import json
+import random
+import time
+
+from payloads import ORG_TYPES, WORDS, make_words, skewed_index
+
+from searcch_backend.api.app import app, db
+from searcch_backend.api.common.stats import rebuild_artifact_stats
+from searcch_backend.api.common.recommender import rebuild_recommendations
+from searcch_backend.models.model import (
+    ARTIFACT_TYPES, Artifact, ArtifactAffiliation, ArtifactBadge,
+    ArtifactFavorites, ArtifactMetadata, ArtifactPublication, ArtifactRatings,
+    ArtifactReviews, ArtifactTag, Affiliation, Badge, License, Organization,
+    Person, Sessions, User)
+
+SCALES = { "10k": 10000, "100k": 100000, "1m": 1000000 }
+# Artifact types, weighted roughly as in the production corpus.
+TYPE_WEIGHTS = dict(software=5, dataset=3, publication=4, presentation=1, other=1)
+SEARCH_METADATA = ("topics", "languages", "full_name", "owner_login")
+LANGUAGES = ("Python", "C", "C++", "Go", "Rust", "Java", "R", "Shell")
+EPOCH = datetime.datetime(2016, 1, 1)
+
+def next_ids(session, table, count):
+    """
+    Allocates `count` ids from `table`'s id sequence in one round trip.
+    """
+    seq = session.execute(
+        "select pg_get_serial_sequence(:table, 'id')",
+        dict(table=table.fullname)).scalar()
+    return [ id for (id,) in session.execute(
+        "select nextval(:seq) from generate_series(1, :count)",
+        dict(seq=seq, count=count)) ]
+
+def insert(session, model, rows):
+    if rows:
+        session.execute(model.__table__.insert(), rows)
+
+def sizes_for(artifacts):
+    return dict(
+        persons=max(1000, artifacts // 2), users=max(200, artifacts // 20),
+        orgs=max(100, artifacts // 100), licenses=20, badges=50)
+
+def make_catalog(session, rng, sizes, sessions, token_prefix):
+    """
+    Creates the organizations, persons (one affiliation each), users,
+    licenses, badges, and sessions artifacts refer to.  Returns their ids.
+    """
+    now = datetime.datetime.now()
+    org_ids = next_ids(session, Organization.__table__, sizes["orgs"])
+    insert(session, Organization, [
+        dict(id=id, name="%s University %d" % (WORDS[i % len(WORDS)].title(), i),
+             type=ORG_TYPES[i % len(ORG_TYPES)],
+             url="https://org%d.example.org" % (i,), verified=(i % 4 == 0))
+        for (i, id) in enumerate(org_ids) ])
+    person_ids = next_ids(session, Person.__table__, sizes["persons"])
+    insert(session, Person, [
+        dict(id=id, name="Person %d %s" % (i, WORDS[i % len(WORDS)].title()),
+             email="person%d@example.org" % (i,))
+        for (i, id) in enumerate(person_ids) ])
+    affiliation_ids = next_ids(session, Affiliation.__table__, len(person_ids))
+    insert(session, Affiliation, [
+        dict(id=id, person_id=person_ids[i],
+             org_id=org_ids[skewed_index(rng, len(org_ids), 2)])
+        for (i, id) in enumerate(affiliation_ids) ])
+    user_ids = next_ids(session, User.__table__, sizes["users"])
+    insert(session, User, [
+        dict(id=id, person_id=person_ids[i], can_admin=(i == 0))
+        for (i, id) in enumerate(user_ids) ])
+    license_ids = next_ids(session, License.__table__, sizes["licenses"])
+    insert(session, License, [
+        dict(id=id, short_name="LIC-%d" % (i,), long_name="License %d" % (i,),
+             url="https://licenses.example.org/%d" % (i,), verified=True)
+        for (i, id) in enumerate(license_ids) ])
+    badge_ids = next_ids(session, Badge.__table__, sizes["badges"])
+    insert(session, Badge, [
+        dict(id=id, title="Badge %d" % (i,), url="https://badges.example.org/%d" % (i,),
+             version="1", organization="Badge Org %d" % (i % 5,), verified=True)
+        for (i, id) in enumerate(badge_ids) ])
+    # Session 0 belongs to the admin user.
+    tokens = [ "%s%d" % (token_prefix, i) for i in range(sessions) ]
+    insert(session, Sessions, [
+        dict(user_id=user_ids[i % len(user_ids)], sso_token=token,
+             expires_on=now + datetime.timedelta(days=365), is_admin=(i == 0))
+        for (i, token) in enumerate(tokens) ])
+    return dict(orgs=org_ids, affiliations=affiliation_ids, users=user_ids,
+                licenses=license_ids, badges=badge_ids, tokens=tokens)
+
+def make_batch(session, rng, count, first, ids):
+    """
+    Inserts `count` artifacts, numbered from `first`, with their child rows
+    and their users' ratings, reviews, and favorites.  Returns their ids.
+    """
+    types = [ t for t in ARTIFACT_TYPES for i in range(TYPE_WEIGHTS.get(t, 0)) ]
+    users = ids["users"]
+    artifact_ids = next_ids(session, Artifact.__table__, count)
+    artifacts = []
+    children = dict(
+        tags=[], meta=[], affiliations=[], badges=[], publications=[],
+        ratings=[], reviews=[], favorites=[])
+    for (i, id) in enumerate(artifact_ids):
+        n = first + i
+        ctime = EPOCH + datetime.timedelta(seconds=rng.randrange(5 * 365 * 86400))
+        owner_id = users[skewed_index(rng, len(users))]
+        artifacts.append(dict(
+            id=id, type=rng.choice(types), version=0,
+            url="https://bench.example.org/artifact/%d" % (n,),
+            title="%s %d" % (make_words(rng, rng.randint(3, 8)).title(), n),
+            description=make_words(rng, rng.randint(30, 120)),
+            ctime=ctime, mtime=ctime, owner_id=owner_id,
+            license_id=rng.choice(ids["licenses"])))
+        tags = set(WORDS[skewed_index(rng, len(WORDS))]
+                   for j in range(rng.randint(2, 12)))
+        children["tags"].extend(
+            dict(artifact_id=id, tag=tag, source="keywords") for tag in tags)
+        children["meta"].extend([
+            dict(artifact_id=id, name="topics", value=",".join(sorted(tags)[:4])),
+            dict(artifact_id=id, name="languages", value=rng.choice(LANGUAGES)),
+            dict(artifact_id=id, name="full_name", value="bench/artifact-%d" % (n,)),
+            dict(artifact_id=id, name="owner_login", value="user%d" % (owner_id,)),
+            dict(artifact_id=id, name="stars", value=str(rng.randrange(1000))) ])
+        affiliations = rng.sample(ids["affiliations"], rng.randint(1, 6))
+        children["affiliations"].extend(
+            dict(artifact_id=id, affiliation_id=aid,
+                 roles="ContactPerson" if j == 0 else "Author")
+            for (j, aid) in enumerate(affiliations))
+        if rng.random() < 0.2:
+            children["badges"].extend(
+                dict(artifact_id=id, badge_id=bid)
+                for bid in rng.sample(ids["badges"], rng.randint(1, 2)))
+        if rng.random() < 0.9:
+            children["publications"].append(dict(
+                artifact_id=id, time=ctime + datetime.timedelta(days=1),
+                publisher_id=owner_id))
+        # Popularity is skewed: most artifacts have a few ratings and
+        # favorites, and a few have many.
+        raters = rng.sample(users, min(len(users), int(rng.expovariate(0.5))))
+        for (j, user_id) in enumerate(raters):
+            children["ratings"].append(dict(
+                artifact_id=id, user_id=user_id, rating=rng.randint(1, 5)))
+            if j % 3 == 0:
+                children["reviews"].append(dict(
+                    artifact_id=id, user_id=user_id,
+                    review=make_words(rng, rng.randint(10, 60)),
+                    review_time=ctime + datetime.timedelta(days=j + 2)))
+        children["favorites"].extend(
+            dict(artifact_id=id, user_id=user_id)
+            for user_id in rng.sample(users, min(len(users), int(rng.expovariate(0.7)))))
+
+    insert(session, Artifact, artifacts)
+    for (model, key) in (
+            (ArtifactTag, "tags"), (ArtifactMetadata, "meta"),
+            (ArtifactAffiliation, "affiliations"), (ArtifactBadge, "badges"),
+            (ArtifactPublication, "publications"), (ArtifactRatings, "ratings"),
+            (ArtifactReviews, "reviews"), (ArtifactFavorites, "favorites")):
+        insert(session, model, children[key])
+    return artifact_ids
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES.keys()), default="10k")
+    parser.add_argument("--artifacts", type=int, default=None,
+                        help="artifact count (overrides --scale)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--token-prefix", default="bench-token-")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--recommendations", action="store_true",
+                        help="also rebuild recommendations (slow at 1m)")
+    parser.add_argument("--manifest", default="bench-dataset.json")
+    args = parser.parse_args()
+
+    count = args.artifacts or SCALES[args.scale]
+    rng = random.Random(args.seed)
+    with app.app_context():
+        session = db.session
+        if session.query(Artifact.id).first():
+            parser.error("database already has artifacts; use an empty one")
+
+        t0 = time.perf_counter()
+        ids = make_catalog(session, rng, sizes_for(count), args.sessions,
+                           args.token_prefix)
+        session.commit()
+        artifact_ids = []
+        for first in range(0, count, args.batch_size):
+            artifact_ids.extend(make_batch(
+                session, rng, min(args.batch_size, count - first), first, ids))
+            session.commit()
+            print("%d/%d artifacts (%.1fs)" % (
+                len(artifact_ids), count, time.perf_counter() - t0))
+        rebuild_artifact_stats(session)
+        session.commit()
+        if args.recommendations:
+            rebuild_recommendations(
+                session, k=app.config.get("RECOMMENDER_NEIGHBORS", 10))
+            session.commit()
+        session.execute("analyze")
+        session.commit()
+
+    manifest = dict(
+        artifacts=count, seed=args.seed, min_artifact_id=min(artifact_ids),
+        max_artifact_id=max(artifact_ids), tokens=ids["tokens"],
+        seconds=round(time.perf_counter() - t0, 1))
+    with open(args.manifest, "w") as f:
+        json.dump(manifest, f, indent=2)
+    print("wrote %s" % (args.manifest,))
+
+if __name__ == "__main__":
+    main()
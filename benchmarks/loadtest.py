@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+
+"""
+Drives a running backend over HTTP and reports each scenario's latency
+percentiles (p50/p95/p99) and throughput.  The database should hold a
+gen_dataset.py corpus; pass its manifest.  The import scenario needs an
+importer registered with the backend, e.g. stub_importer.py.
+
+    python benchmarks/loadtest.py --url http://localhost/v1 --api-key KEY \\
+        --manifest bench-dataset.json --output after.json --baseline before.json
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import random
+import threading
+import time
+
+import requests
+
+from payloads import WORDS, skewed_index
+
+SCENARIOS = ("search", "artifact", "artifacts", "dashboard", "import")
+
+class Client(object):
+    """
+    Makes the requests for one scenario; each thread gets its own
+    requests.Session, and so its own keep-alive connection.
+    """
+
+    def __init__(self, url, api_key, manifest, seed, import_timeout=60):
+        self.url = url.rstrip("/")
+        self.api_key = api_key
+        self.manifest = manifest
+        self.seed = seed
+        self.import_timeout = import_timeout
+        self.local = threading.local()
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def _next(self):
+        with self.lock:
+            self.counter += 1
+            return self.counter
+
+    @property
+    def rng(self):
+        if not hasattr(self.local, "rng"):
+            self.local.rng = random.Random("%s-%d" % (self.seed, self._next()))
+        return self.local.rng
+
+    @property
+    def session(self):
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def headers(self, token=None):
+        headers = { "X-Api-Key": self.api_key }
+        if token is None:
+            # Tokens past the first (the admin's) are ordinary users.
+            tokens = self.manifest["tokens"]
+            token = tokens[1 + self.rng.randrange(len(tokens) - 1)] \
+              if len(tokens) > 1 else tokens[0]
+        headers["Authorization"] = token
+        return headers
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault("headers", self.headers())
+        return self.session.request(method, self.url + path, timeout=60, **kwargs)
+
+    def check(self, r):
+        if r.status_code >= 400:
+            raise Exception("%s %s: %d" % (r.request.method, r.url, r.status_code))
+        return r
+
+    def search(self):
+        rng = self.rng
+        words = [ WORDS[skewed_index(rng, len(WORDS), 2)]
+                  for i in range(rng.randint(1, 2)) ]
+        params = dict(keywords=" ".join(words), page=1 + skewed_index(rng, 5))
+        if rng.random() < 0.2:
+            params["type"] = rng.choice(("software", "dataset", "publication"))
+        self.check(self.request("GET", "/artifact/search", params=params))
+
+    def artifact(self):
+        m = self.manifest
+        # Popular artifacts are fetched more often.
+        id = m["min_artifact_id"] + skewed_index(
+            self.rng, m["max_artifact_id"] - m["min_artifact_id"] + 1, 2)
+        self.check(self.request("GET", "/artifact/%d" % (id,)))
+
+    def artifacts(self):
+        rng = self.rng
+        params = dict(page=1 + skewed_index(rng, 5), items_per_page=20)
+        if rng.random() < 0.5:
+            params["published"] = 1
+        self.check(self.request("GET", "/artifacts", params=params))
+
+    def dashboard(self):
+        self.check(self.request("GET", "/dashboard"))
+
+    def import_(self):
+        """
+        Requests an import of a new URL, and polls it until it completes.
+        """
+        url = "https://bench.example.org/import/%d/%d/%d" % (
+            self.seed, int(time.time() * 1000), self._next())
+        headers = self.headers()
+        r = self.check(self.request(
+            "POST", "/artifact/imports", headers=headers,
+            json=dict(url=url, type="software")))
+        id = r.json()["id"]
+        deadline = time.monotonic() + self.import_timeout
+        delay = 0.05
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+            r = self.check(self.request(
+                "GET", "/artifact/import/%d" % (id,), headers=headers))
+            status = r.json()["status"]
+            if status == "completed":
+                return
+            if status == "failed":
+                raise Exception("import %d failed: %s" % (id, r.json().get("message")))
+        raise Exception("import %d timed out" % (id,))
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    i = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[i]
+
+def run_scenario(client, name, count, concurrency, warmup):
+    f = getattr(client, "import_" if name == "import" else name)
+    def timed_call(i):
+        t0 = time.perf_counter()
+        try:
+            f()
+            return (time.perf_counter() - t0, None)
+        except Exception as ex:
+            return (time.perf_counter() - t0, str(ex))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed_call, range(warmup)))
+        t0 = time.perf_counter()
+        results = list(pool.map(timed_call, range(count)))
+        elapsed = time.perf_counter() - t0
+
+    latencies = sorted(t for (t, error) in results if error is None)
+    errors = [ error for (t, error) in results if error is not None ]
+    ms = lambda t: round(t * 1000, 2) if t is not None else None
+    return collections.OrderedDict([
+        ("scenario", name), ("requests", count), ("errors", len(errors)),
+        ("concurrency", concurrency), ("seconds", round(elapsed, 3)),
+        ("throughput", round(len(latencies) / elapsed, 2) if elapsed else None),
+        ("p50_ms", ms(percentile(latencies, 50))),
+        ("p95_ms", ms(percentile(latencies, 95))),
+        ("p99_ms", ms(percentile(latencies, 99))),
+        ("max_ms", ms(latencies[-1] if latencies else None)),
+        ("first_error", errors[0] if errors else None) ])
+
+def compare(result, baseline):
+    """
+    Returns the percent change of each latency and throughput figure
+    from `baseline`.
+    """
+    changes = collections.OrderedDict()
+    for k in ("throughput", "p50_ms", "p95_ms", "p99_ms"):
+        if result.get(k) is not None and baseline.get(k):
+            changes[k] = round(100.0 * (result[k] - baseline[k]) / baseline[k], 1)
+    return changes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:80/v1")
+    parser.add_argument("--api-key", required=True)
+    parser.add_argument("--manifest", default="bench-dataset.json")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--import-requests", type=int, default=50,
+                        help="requests for the (slow) import scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write results to this JSON file")
+    parser.add_argument("--baseline", default=None,
+                        help="compare with results from an earlier --output")
+    args = parser.parse_args()
+
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = dict((r["scenario"], r) for r in json.load(f)["results"])
+
+    client = Client(args.url, args.api_key, manifest, args.seed)
+    results = []
+    for name in args.scenarios.split(","):
+        if name not in SCENARIOS:
+            parser.error("unknown scenario %r" % (name,))
+        count = args.import_requests if name == "import" else args.requests
+        warmup = 0 if name == "import" else args.warmup
+        result = run_scenario(client, name, count, args.concurrency, warmup)
+        if name in baseline:
+            result["change_pct"] = compare(result, baseline[name])
+        results.append(result)
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(dict(url=args.url, artifacts=manifest.get("artifacts"),
+                           time=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                           results=results), f, indent=2)
+
+if __name__ == "__main__":
+    main()
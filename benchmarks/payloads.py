@@ -0,0 +1,99 @@
+
+"""
+Synthetic artifact JSON documents, shaped like importer output, for the
+benchmarks in this directory.  References are drawn from small pools, so a
+large artifact refers to the same persons, organizations, and badges many
+times over, as real imports do.
+"""
+
+import random
+
+ORG_TYPES = ("Institution", "Company", "Institute", "ResearchGroup", "Sponsor", "Other")
+
+# Words for synthetic titles, descriptions, tags, and search keywords.
+WORDS = (
+    "network", "traffic", "dataset", "measurement", "internet", "routing",
+    "security", "malware", "botnet", "anomaly", "detection", "intrusion",
+    "honeypot", "dns", "bgp", "ipv6", "packet", "capture", "flow", "latency",
+    "bandwidth", "congestion", "tcp", "udp", "tls", "certificate", "phishing",
+    "spam", "ddos", "attack", "defense", "firewall", "vulnerability",
+    "exploit", "fuzzing", "binary", "analysis", "static", "dynamic",
+    "symbolic", "execution", "sandbox", "virtualization", "container",
+    "kubernetes", "cloud", "edge", "iot", "sensor", "wireless", "cellular",
+    "5g", "satellite", "topology", "graph", "crawler", "web", "browser",
+    "privacy", "anonymity", "tor", "vpn", "censorship", "geolocation",
+    "simulation", "emulation", "testbed", "benchmark", "performance",
+    "scalability", "distributed", "consensus", "blockchain", "cryptography",
+    "authentication", "password", "biometric", "forensics", "logging",
+    "provenance", "reproducibility", "artifact", "software", "tool",
+    "framework", "library", "model", "learning", "neural", "classifier",
+    "adversarial", "robustness", "fairness", "usability", "survey",
+    "telemetry", "scanner", "census", "outage", "resilience", "policy")
+
+def skewed_index(rng, n, skew=3):
+    """
+    Returns an index in [0, n), with low indices much more likely, as
+    word, tag and user popularity are in real data.
+    """
+    return min(int(n * rng.random() ** skew), n - 1)
+
+def make_words(rng, count, skew=2):
+    return " ".join(WORDS[skewed_index(rng, len(WORDS), skew)] for i in range(count))
+
+def make_person(i):
+    return dict(name="Person %d" % (i,), email="person%d@example.org" % (i,))
+
+def make_org(i):
+    return dict(name="Organization %d" % (i,), type=ORG_TYPES[i % len(ORG_TYPES)],
+                url="https://org%d.example.org" % (i,))
+
+def make_license(i):
+    return dict(short_name="LIC-%d" % (i,), long_name="License %d" % (i,),
+                url="https://licenses.example.org/%d" % (i,))
+
+def make_badge(i):
+    return dict(title="Badge %d" % (i,), url="https://badges.example.org/%d" % (i,),
+                version="1", organization="Badge Org %d" % (i % 3,))
+
+def make_artifact(rng, n, files=10, members=20, affiliations=100, tags=50,
+                  meta=20, badges=5, persons=40, orgs=10, licenses=5):
+    """
+    Returns artifact `n`: `files` files of `members` members each,
+    `affiliations` affiliations among `persons` persons and `orgs`
+    organizations, and `tags` tags, `meta` metadata items, and `badges`
+    badges.
+    """
+    artifact = dict(
+        type="software", url="https://example.org/artifact/%d" % (n,),
+        title="Synthetic artifact %d" % (n,),
+        description="A synthetic artifact for benchmarking. " * 8,
+        ctime="2021-01-01T00:00:00",
+        license=make_license(rng.randrange(licenses)),
+        files=[], affiliations=[], tags=[], meta=[], badges=[])
+    for f in range(files):
+        artifact["files"].append(dict(
+            url="https://example.org/artifact/%d/file/%d" % (n, f),
+            name="file%d.tar.gz" % (f,), filetype="application/gzip",
+            size=rng.randrange(1 << 20),
+            members=[
+                dict(pathname="dir%d/member%d.py" % (m % 5, m),
+                     name="member%d.py" % (m,), filetype="text/x-python",
+                     size=rng.randrange(1 << 16))
+                for m in range(members) ]))
+    for a in range(affiliations):
+        artifact["affiliations"].append(dict(
+            roles="Author" if a % 4 else "ContactPerson",
+            affiliation=dict(
+                person=make_person(rng.randrange(persons)),
+                org=make_org(rng.randrange(orgs)))))
+    for t in range(tags):
+        artifact["tags"].append(dict(tag="tag%d" % (t,), source="keywords"))
+    for m in range(meta):
+        artifact["meta"].append(dict(name="meta%d" % (m,), value="value %d" % (m,)))
+    for b in rng.sample(range(max(badges * 2, 1)), badges):
+        artifact["badges"].append(dict(badge=make_badge(b)))
+    return artifact
+
+def make_artifacts(count, seed=0, **kwargs):
+    rng = random.Random(seed)
+    return [ make_artifact(rng, n, **kwargs) for n in range(count) ]
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+
+"""
+A stand-in importer instance for load tests of the import flow.  It
+registers with the backend, accepts scheduled imports (singly or batched),
+and after a configurable delay reports each one running and then completed,
+with a synthetic artifact (see payloads.py), as a real importer would.
+
+    python benchmarks/stub_importer.py --backend http://localhost/v1 \\
+        --api-key KEY --listen 127.0.0.1:8081 --max-tasks 16
+"""
+
+import argparse
+import datetime
+import http.server
+import json
+import logging
+import queue
+import random
+import socketserver
+import sys
+import threading
+import time
+
+import requests
+
+from payloads import make_artifact
+
+LOG = logging.getLogger("stub_importer")
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+class StubImporter(object):
+
+    def __init__(self, args):
+        self.args = args
+        self.queue = queue.Queue()
+        self.rng = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.counts = dict(accepted=0, completed=0, failed=0)
+
+    def put_import(self, artifact_import_id, **kwargs):
+        kwargs["mtime"] = datetime.datetime.now().isoformat()
+        r = requests.put(
+            "%s/artifact/import/%d" % (self.args.backend, artifact_import_id),
+            headers={ "X-Api-Key": self.args.api_key }, json=kwargs, timeout=60)
+        if r.status_code != requests.codes.ok:
+            LOG.error("update of import %d failed (%d): %s",
+                      artifact_import_id, r.status_code, r.text[:200])
+        return r
+
+    def run_import(self, artifact_import):
+        id = artifact_import["id"]
+        with self.lock:
+            seed = self.rng.random()
+            fail = self.rng.random() < self.args.fail_rate
+        self.put_import(id, status="running", phase="retrieve", progress=0.5)
+        time.sleep(self.args.delay)
+        if fail:
+            self.put_import(id, status="failed", phase="done",
+                            message="stub importer failure")
+            outcome = "failed"
+        else:
+            artifact = make_artifact(
+                random.Random(seed), id, files=self.args.files, members=5,
+                affiliations=5, tags=10, meta=5, badges=1)
+            artifact["url"] = artifact_import["url"]
+            if artifact_import.get("type") not in (None, "unknown"):
+                artifact["type"] = artifact_import["type"]
+            self.put_import(id, status="completed", phase="done", progress=1.0,
+                            artifact=artifact)
+            outcome = "completed"
+        with self.lock:
+            self.counts[outcome] += 1
+
+    def worker(self):
+        while True:
+            artifact_import = self.queue.get()
+            try:
+                self.run_import(artifact_import)
+            except Exception:
+                LOG.exception("import %r failed", artifact_import.get("id"))
+
+    def register(self):
+        r = requests.post(
+            "%s/importers" % (self.args.backend,),
+            headers={ "X-Api-Key": self.args.api_key },
+            json=dict(url=self.args.url, key=self.args.key,
+                      max_tasks=self.args.max_tasks), timeout=60)
+        r.raise_for_status()
+        LOG.info("registered as importer instance %r", r.json().get("id"))
+
+def make_handler(importer):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def reply(self, code, body=None):
+            data = json.dumps(body if body is not None else {}).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def authorized(self):
+            if self.headers.get("X-Api-Key") != importer.args.key:
+                self.reply(401, dict(error="incorrect key"))
+                return False
+            return True
+
+        def do_GET(self):
+            if self.path != "/status":
+                return self.reply(404)
+            if self.authorized():
+                with importer.lock:
+                    counts = dict(importer.counts)
+                self.reply(200, dict(status="up", queued=importer.queue.qsize(), **counts))
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            if self.path != "/artifact/imports":
+                return self.reply(404)
+            if not self.authorized():
+                return
+            try:
+                j = json.loads(body)
+            except ValueError:
+                return self.reply(400, dict(error="malformed JSON"))
+            imports = j if isinstance(j, list) else [ j ]
+            for artifact_import in imports:
+                importer.queue.put(artifact_import)
+            with importer.lock:
+                importer.counts["accepted"] += len(imports)
+            self.reply(200)
+
+        def log_message(self, format, *args):
+            LOG.debug(format, *args)
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", default="http://localhost:80/v1")
+    parser.add_argument("--api-key", required=True, help="the backend's shared secret key")
+    parser.add_argument("--listen", default="127.0.0.1:8081")
+    parser.add_argument("--url", default=None,
+                        help="URL the backend should use (default http://<listen>)")
+    parser.add_argument("--key", default="stub-importer-key",
+                        help="key the backend must send us")
+    parser.add_argument("--max-tasks", type=int, default=16)
+    parser.add_argument("--delay", type=float, default=0.5,
+                        help="seconds each import takes")
+    parser.add_argument("--files", type=int, default=2)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+    args.backend = args.backend.rstrip("/")
+    args.url = args.url or "http://%s" % (args.listen,)
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    importer = StubImporter(args)
+    for i in range(args.max_tasks):
+        threading.Thread(target=importer.worker, daemon=True).start()
+    (host, port) = args.listen.rsplit(":", 1)
+    server = ThreadingHTTPServer((host, int(port)), make_handler(importer))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # The backend checks our /status when we register, so listen first.
+    try:
+        importer.register()
+    except Exception:
+        LOG.exception("registration failed")
+        sys.exit(1)
+    try:
+        while True:
+            time.sleep(60)
+            with importer.lock:
+                LOG.info("imports: %r (queued %d)", importer.counts, importer.queue.qsize())
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
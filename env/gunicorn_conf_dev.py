@@ -1,4 +1,6 @@
 import multiprocessing
+import os
+import shutil
 
 bind = "0.0.0.0:80"
 workers = multiprocessing.cpu_count() * 2 + 1
@@ -20,3 +22,22 @@ daemon = False
 # see exceptions.
 #
 #preload_app = True
+
+#
+# Workers write Prometheus metrics to files in this directory, so that
+# /metrics reports all workers.  It is emptied at startup, and dead
+# workers' live gauges are removed.
+#
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "logs/prometheus")
+
+def on_starting(server):
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
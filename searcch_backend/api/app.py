@@ -80,8 +80,22 @@ if "DB_AUTO_MIGRATE" in app.config and app.config["DB_AUTO_MIGRATE"]:
         # Commit (unlock).
         db.session.commit()
 
+from searcch_backend.api.common.blobstore import init_blob_store
+init_blob_store(app)
+from searcch_backend.api.common.instrumentation import init_instrumentation
+with app.app_context():
+    init_instrumentation(app, db.engine)
+from searcch_backend.api.common.metrics import init_metrics
+with app.app_context():
+    init_metrics(app, db.engine)
+from searcch_backend.api.common.slowquery import init_slow_query_log
+with app.app_context():
+    init_slow_query_log(app, db.engine)
+from searcch_backend.api.common.response import init_compression
+init_compression(app)
+
 from searcch_backend.api.resources.artifact import (
-    ArtifactAPI, ArtifactIndexAPI,
+    ArtifactAPI, ArtifactIndexAPI, ArtifactBulkAPI,
     ArtifactRelationshipResourceRoot, ArtifactRelationshipResource)
 from searcch_backend.api.resources.artifact_search import ArtifactSearchIndexAPI, ArtifactRecommendationAPI
 from searcch_backend.api.resources.organization import OrganizationAPI, OrganizationListAPI
@@ -104,6 +118,14 @@ from searcch_backend.api.resources.schema import (
     SchemaArtifactAPI, SchemaAffiliationAPI)
 from searcch_backend.api.resources.badge import BadgeResourceRoot, BadgeResource
 from searcch_backend.api.resources.license import LicenseResourceRoot, LicenseResource
+from searcch_backend.api.resources.cache import CacheResourceRoot
+from searcch_backend.api.resources.metrics import MetricsAPI
+from searcch_backend.api.resources.slowquery import SlowQueryResourceRoot
+from searcch_backend.api.resources.typeahead import (
+    OrganizationTypeaheadAPI, PersonTypeaheadAPI, BadgeTypeaheadAPI)
+from searcch_backend.api.resources.artifact_file import (
+    ArtifactFileContentAPI, ArtifactFileMemberContentAPI)
+import searcch_backend.api.commands
 
 approot = app.config['APPLICATION_ROOT']
 
@@ -113,11 +135,14 @@ api.add_resource(SessionResourceRoot, approot + '/sessions', endpoint='api.sessi
 api.add_resource(SessionResource, approot + '/session/<int:session_id>', endpoint='api.session')
 
 api.add_resource(ArtifactIndexAPI, approot + '/artifacts', endpoint='api.artifacts')
+api.add_resource(ArtifactBulkAPI, approot + '/artifacts/bulk', endpoint='api.artifacts_bulk')
 api.add_resource(ArtifactAPI, approot + '/artifact/<int:artifact_id>', endpoint='api.artifact')
 api.add_resource(ArtifactSearchIndexAPI, approot + '/artifact/search', endpoint='api.artifact_search')
 api.add_resource(ArtifactRelationshipResourceRoot, approot + '/artifact/relationships', endpoint='api.artifact_relationships')
 api.add_resource(ArtifactRelationshipResource, approot + '/artifact/relationship/<int:artifact_relationship_id>', endpoint='api.artifact_relationship')
 api.add_resource(ArtifactRecommendationAPI, approot + '/artifact/recommendation/<int:artifact_id>', endpoint='api.artifact_recommender')
+api.add_resource(ArtifactFileContentAPI, approot + '/artifact/file/<int:artifact_file_id>/content', endpoint='api.artifact_file_content')
+api.add_resource(ArtifactFileMemberContentAPI, approot + '/artifact/file/member/<int:artifact_file_member_id>/content', endpoint='api.artifact_file_member_content')
 
 api.add_resource(OrganizationListAPI, approot + '/organizations', endpoint='api.organizations')
 api.add_resource(OrganizationAPI, approot + '/organization/<int:org_id>', endpoint='api.organization')
@@ -157,3 +182,11 @@ api.add_resource(BadgeResource, approot + '/badge/<int:badge_id>', endpoint='api
 
 api.add_resource(LicenseResourceRoot, approot + '/licenses', endpoint='api.licenses')
 api.add_resource(LicenseResource, approot + '/license/<int:org_id>', endpoint='api.license')
+
+api.add_resource(CacheResourceRoot, approot + '/caches', endpoint='api.caches')
+api.add_resource(MetricsAPI, approot + '/metrics', endpoint='api.metrics')
+api.add_resource(SlowQueryResourceRoot, approot + '/slowqueries', endpoint='api.slow_queries')
+
+api.add_resource(OrganizationTypeaheadAPI, approot + '/typeahead/organizations', endpoint='api.typeahead_organizations')
+api.add_resource(PersonTypeaheadAPI, approot + '/typeahead/persons', endpoint='api.typeahead_persons')
+api.add_resource(BadgeTypeaheadAPI, approot + '/typeahead/badges', endpoint='api.typeahead_badges')
@@ -0,0 +1,79 @@
+# flask CLI commands (run as `flask <command>`)
+
+import json
+
+import click
+
+from searcch_backend.api.app import app, db
+from searcch_backend.api.common.bulk import ingest_artifacts
+from searcch_backend.api.common.stats import rebuild_artifact_stats
+from searcch_backend.api.common import blobstore
+from searcch_backend.api.common.recommender import (
+    rebuild_recommendations, refresh_recommendations)
+
+@app.cli.command("rebuild-artifact-stats")
+def rebuild_artifact_stats_command():
+    """Rebuild the artifact_stats table from ratings, reviews, and favorites."""
+    count = rebuild_artifact_stats(db.session)
+    db.session.commit()
+    click.echo("rebuilt artifact stats (%d rows corrected)" % (count,))
+
+@app.cli.command("migrate-blobs")
+@click.option("--batch-size", default=100, show_default=True,
+              help="Rows to move per transaction.")
+@click.option("--limit", default=None, type=int,
+              help="Stop after moving this many rows.")
+def migrate_blobs_command(batch_size, limit):
+    """Move artifact file contents from the database into the blob store."""
+    if not blobstore.blob_store:
+        raise click.ClickException("BLOB_STORE_DIR is not configured")
+    count = blobstore.migrate_blobs(db.session, batch_size=batch_size, limit=limit)
+    click.echo("moved %d blobs" % (count,))
+
+@app.cli.command("ingest-artifacts")
+@click.argument("path", type=click.File("r"))
+@click.option("--batch-size", default=None, type=int,
+              help="Artifacts per transaction (default BULK_INGEST_BATCH_SIZE).")
+def ingest_artifacts_command(path, batch_size):
+    """Create artifacts from a JSON array or newline-delimited JSON file."""
+    data = path.read()
+    if data.lstrip().startswith("["):
+        docs = json.loads(data)
+    else:
+        docs = [ json.loads(l) for l in data.splitlines() if l.strip() ]
+    results = ingest_artifacts(
+        db.session, docs, module_name="cli-export",
+        batch_size=batch_size or app.config.get("BULK_INGEST_BATCH_SIZE", 500))
+    failed = 0
+    for result in results:
+        if "error" in result:
+            failed += 1
+            click.echo("artifact %d: %s" % (result["index"], result["error"]), err=True)
+    click.echo("created %d artifacts (%d failed)" % (len(results) - failed, failed))
+
+@app.cli.command("rebuild-recommendations")
+@click.option("--neighbors", default=None, type=int,
+              help="Neighbors per artifact (default RECOMMENDER_NEIGHBORS).")
+def rebuild_recommendations_command(neighbors):
+    """Recompute all artifact term vectors and recommendation neighbors."""
+    count = rebuild_recommendations(
+        db.session, k=neighbors or app.config.get("RECOMMENDER_NEIGHBORS", 10))
+    db.session.commit()
+    click.echo("rebuilt recommendations for %d artifacts" % (count,))
+
+@app.cli.command("refresh-recommendations")
+@click.option("--batch-size", default=None, type=int,
+              help="Changed artifacts per transaction (default RECOMMENDER_REFRESH_BATCH_SIZE).")
+def refresh_recommendations_command(batch_size):
+    """Recompute recommendations for artifacts changed since their last refresh."""
+    batch_size = batch_size or app.config.get("RECOMMENDER_REFRESH_BATCH_SIZE", 500)
+    total = 0
+    while True:
+        (changed, removed) = refresh_recommendations(
+            db.session, k=app.config.get("RECOMMENDER_NEIGHBORS", 10),
+            limit=batch_size, wait=True)
+        db.session.commit()
+        total += changed + removed
+        if changed < batch_size:
+            break
+    click.echo("refreshed recommendations for %d artifacts" % (total,))
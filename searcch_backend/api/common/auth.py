@@ -1,8 +1,25 @@
 from searcch_backend.api.app import app
 from searcch_backend.api.app import db
-from searcch_backend.models.model import Sessions
+from searcch_backend.api.common.cache import make_cache
+from searcch_backend.models.model import Sessions, User
 from datetime import datetime
 from flask import abort
+import sqlalchemy.orm
+import hashlib
+import time
+
+#
+# Validated sessions, keyed by a hash of their token.  Entries are column
+# snapshots of the Sessions row and its User; a hit rebuilds them and merges
+# them into the request's db.session without a query.
+#
+session_cache = None
+if app.config.get("SESSION_CACHE_ENABLED", False):
+    session_cache = make_cache(
+        app, "sessions", "SESSION_CACHE", maxsize=4096, ttl=60)
+
+SESSION_CACHE_SESSION_FIELDS = ( "id", "user_id", "sso_token", "expires_on", "is_admin" )
+SESSION_CACHE_USER_FIELDS = ( "id", "person_id", "can_admin" )
 
 
 def has_api_key(request):
@@ -23,11 +40,51 @@ def has_token(request):
         return True
     return False
 
+def token_cache_key(sso_token):
+    return hashlib.sha256(sso_token.encode("utf-8")).hexdigest()
+
+def invalidate_token(sso_token):
+    """
+    Drops a session from the session cache (in all workers, if the cache
+    backend is shared).  Call after committing any change to a session or
+    its user.
+    """
+    if session_cache and sso_token:
+        session_cache.invalidate(token_cache_key(sso_token))
+
+def _cache_session(login_session, cached_at):
+    expires = (login_session.expires_on - datetime.now()).total_seconds()
+    value = (
+        { k: getattr(login_session, k) for k in SESSION_CACHE_SESSION_FIELDS },
+        { k: getattr(login_session.user, k) for k in SESSION_CACHE_USER_FIELDS })
+    session_cache.put(
+        token_cache_key(login_session.sso_token), value, ttl=expires,
+        cached_at=cached_at)
+
+def _cached_session(sso_token):
+    value = session_cache.get(token_cache_key(sso_token))
+    if not value:
+        return None
+    (session_fields, user_fields) = value
+    if session_fields["expires_on"] < datetime.now():
+        return None
+    login_session = Sessions(**session_fields)
+    login_session.user = User(**user_fields)
+    sqlalchemy.orm.make_transient_to_detached(login_session.user)
+    sqlalchemy.orm.make_transient_to_detached(login_session)
+    return db.session.merge(login_session, load=False)
+
 def lookup_token(sso_token):
     # sanity check input
     if not sso_token:
         abort(403, description="missing SSO token from auth provider")
 
+    if session_cache:
+        login_session = _cached_session(sso_token)
+        if login_session:
+            return login_session
+        cached_at = time.time()
+
     # check for token in sessions table
     login_session = db.session.query(Sessions).filter(Sessions.sso_token == sso_token).first()
     if login_session:
@@ -35,10 +92,13 @@ def lookup_token(sso_token):
             # delete token from sessions table
             db.session.delete(login_session)
             db.session.commit()
+            invalidate_token(sso_token)
 
             # send back for relogin
             abort(401, description="session token has expired. please re-login")
         else:
+            if session_cache:
+                _cache_session(login_session, cached_at)
             return login_session
     else:
         return None
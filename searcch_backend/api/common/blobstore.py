@@ -0,0 +1,200 @@
+
+import hashlib
+import logging
+import mmap
+import os
+import re
+import tempfile
+
+LOG = logging.getLogger(__name__)
+
+DIGEST_RE = re.compile("^[0-9a-f]{64}$")
+
+class BlobStore(object):
+    """
+    A content-addressed store of immutable blobs on local disk.  Blobs are
+    named by the hex SHA-256 of their contents, and sharded two levels deep
+    (ab/cd/abcd...), so identical contents are stored once no matter how many
+    files reference them.  Writes go to a temporary file in the destination
+    directory and are renamed into place, so readers never see a partial
+    blob, and concurrent writers of the same blob are harmless.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, digest):
+        if not DIGEST_RE.match(digest or ""):
+            raise ValueError("invalid blob digest %r" % (digest,))
+        return os.path.join(self.root, digest[0:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def put(self, data):
+        """
+        Stores `data` (bytes) and returns its (digest, size).
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if os.path.exists(path):
+            return (digest, len(data))
+        dirname = os.path.dirname(path)
+        os.makedirs(dirname, exist_ok=True)
+        (fd, tmppath) = tempfile.mkstemp(dir=dirname, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmppath, path)
+        except:
+            try:
+                os.unlink(tmppath)
+            except OSError:
+                pass
+            raise
+        return (digest, len(data))
+
+    def get(self, digest):
+        with open(self.path(digest), "rb") as f:
+            return f.read()
+
+    def open(self, digest):
+        """
+        Returns a read-only mmap of the blob, and its size.  The caller must
+        close the mmap.  Empty blobs cannot be mapped, so they return
+        (None, 0).
+        """
+        with open(self.path(digest), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return (None, 0)
+            return (mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), size)
+
+blob_store = None
+
+def _blob_models():
+    """
+    Returns the models whose `content` column is offloaded to the blob
+    store.  Each has content_digest and content_size columns recording the
+    stored blob.  (The models, and sqlalchemy, are imported only where they
+    are used, so that BlobStore itself needs neither the app nor a database.)
+    """
+    from searcch_backend.models.model import ArtifactFile, ArtifactFileMember
+    return (ArtifactFile, ArtifactFileMember)
+
+def _offload_content(target, value, oldvalue, initiator):
+    """
+    Attribute set listener: moves content into the blob store and records
+    its digest and size instead.  This covers both construction (e.g.,
+    object_from_json) and assignment.  Clearing the content clears the
+    digest and size too.
+    """
+    if blob_store is None:
+        return value
+    if value is None:
+        target.content_digest = None
+        target.content_size = None
+        return value
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    (target.content_digest, target.content_size) = blob_store.put(value)
+    return None
+
+def get_content(obj):
+    """
+    Returns an object's content, whether it is in the row or in the store.
+    """
+    if obj.content is not None:
+        return obj.content
+    if obj.content_digest and blob_store:
+        try:
+            return blob_store.get(obj.content_digest)
+        except FileNotFoundError:
+            LOG.error("missing blob %s for %r", obj.content_digest, obj)
+    return None
+
+def init_blob_store(app):
+    """
+    Enables the blob store if BLOB_STORE_DIR is configured.  Otherwise,
+    contents stay in the database, as before.
+    """
+    import sqlalchemy
+    global blob_store
+    root = app.config.get("BLOB_STORE_DIR")
+    if not root:
+        return
+    blob_store = BlobStore(root)
+    for model in _blob_models():
+        sqlalchemy.event.listen(
+            model.content, "set", _offload_content, retval=True)
+    LOG.info("blob store enabled at %s", root)
+
+def _migrate_pass(session, table, batch_size, limit):
+    """
+    Moves the contents of `table`'s rows, in id order, up to `limit` rows
+    (if not None).  Rows locked by other transactions are skipped.  Returns
+    the number of rows moved.
+    """
+    import sqlalchemy
+    moved = 0
+    last_id = 0
+    while limit is None or moved < limit:
+        count = batch_size
+        if limit is not None:
+            count = min(count, limit - moved)
+        rows = session.execute(
+            sqlalchemy.select([table.c.id, table.c.content])\
+              .where(table.c.content != None)\
+              .where(table.c.id > last_id)\
+              .order_by(table.c.id)\
+              .limit(count)\
+              .with_for_update(skip_locked=True)).fetchall()
+        if not rows:
+            break
+        for (id, content) in rows:
+            (digest, size) = blob_store.put(bytes(content))
+            session.execute(
+                table.update().where(table.c.id == id).values(
+                    content=None, content_digest=digest, content_size=size))
+            last_id = id
+        session.commit()
+        moved += len(rows)
+        LOG.info("moved %d %s blobs (through id %d)",
+                 len(rows), table.name, last_id)
+    return moved
+
+def migrate_blobs(session, batch_size=100, limit=None):
+    """
+    Moves existing contents out of the database into the blob store, in
+    batches of batch_size rows, committing after each batch so that the
+    tables are never locked for long.  Rows locked by other transactions
+    are skipped, so each table gets passes until one moves nothing; rows
+    that are still locked then are left, and reported.  Returns the number
+    of rows moved.
+    """
+    import sqlalchemy
+    if blob_store is None:
+        raise RuntimeError("BLOB_STORE_DIR is not configured")
+    moved = 0
+    for model in _blob_models():
+        table = model.__table__
+        while limit is None or moved < limit:
+            count = _migrate_pass(
+                session, table, batch_size,
+                None if limit is None else limit - moved)
+            moved += count
+            if not count:
+                break
+        if limit is not None and moved >= limit:
+            break
+        remaining = session.execute(
+            sqlalchemy.select([sqlalchemy.func.count()])\
+              .where(table.c.content != None)).scalar()
+        session.commit()
+        if remaining:
+            LOG.warning("%d %s rows were locked and not moved; run again",
+                        remaining, table.name)
+    return moved
@@ -0,0 +1,197 @@
+
+import collections
+import contextlib
+import datetime
+import logging
+import sys
+
+import sqlalchemy
+from sqlalchemy.orm import scoped_session
+
+from searcch_backend.api.common.sql import (object_from_json, NaturalKeyResolver)
+from searcch_backend.models.model import Artifact, ArtifactImport
+
+LOG = logging.getLogger(__name__)
+
+_sequences = {}
+
+def _sequence_for(session, table, column):
+    key = (table.fullname, column.name)
+    if key not in _sequences:
+        _sequences[key] = session.execute(
+            "select pg_get_serial_sequence(:table, :column)",
+            dict(table=table.fullname, column=column.name)).scalar()
+    return _sequences[key]
+
+def assign_primary_keys(session, objs):
+    """
+    Assigns serial primary keys to new objects from their tables' sequences,
+    with one nextval() round trip per table.  The ORM can only batch INSERTs
+    into a single executemany when it need not fetch each new row's key, so
+    this lets a flush of many new objects issue one executemany per table,
+    rather than one INSERT ... RETURNING per object.  With the engine's
+    executemany_mode (see SQLALCHEMY_ENGINE_OPTIONS), each executemany goes
+    to the database as a few multi-row INSERTs, not one per row.
+    """
+    by_table = collections.OrderedDict()
+    for obj in objs:
+        mapper = sqlalchemy.inspect(obj).mapper
+        if len(mapper.primary_key) != 1:
+            continue
+        col = mapper.primary_key[0]
+        if col.foreign_keys or col.autoincrement is False \
+          or not isinstance(col.type, sqlalchemy.Integer):
+            continue
+        attr = mapper.get_property_by_column(col).key
+        if getattr(obj, attr) is not None:
+            continue
+        by_table.setdefault((mapper.local_table, col, attr), []).append(obj)
+    for ((table, col, attr), table_objs) in by_table.items():
+        seq = _sequence_for(session, table, col)
+        if not seq:
+            continue
+        ids = session.execute(
+            "select nextval(:seq) from generate_series(1, :count)",
+            dict(seq=seq, count=len(table_objs))).fetchall()
+        for (obj, (id,)) in zip(table_objs, ids):
+            setattr(obj, attr, id)
+
+def _artifact_from_json(session, doc, owner, module_name, now, resolver):
+    if isinstance(doc, dict) and "artifact" in doc:
+        doc = doc["artifact"]
+    if not isinstance(doc, dict):
+        raise ValueError("artifact must be a JSON object")
+    artifact = object_from_json(
+        session, Artifact, doc, skip_primary_keys=True,
+        error_on_primary_key=False, allow_fk=True, resolver=resolver)
+    if not artifact.ctime:
+        artifact.ctime = now
+    if owner:
+        artifact.owner = owner
+    session.add(artifact)
+    session.add(ArtifactImport(
+        type=artifact.type, url=artifact.url, importer_module_name=module_name,
+        owner=artifact.owner, ctime=artifact.ctime, status="completed",
+        phase="done", artifact=artifact))
+    return artifact
+
+@contextlib.contextmanager
+def _tracking_pending(session):
+    """
+    Yields a list to which each object that becomes pending in `session`
+    (by add() or by cascade) is appended, while in the context.
+    """
+    if isinstance(session, scoped_session):
+        session = session()
+    pending = []
+    def transient_to_pending(session, obj):
+        pending.append(obj)
+    sqlalchemy.event.listen(session, "transient_to_pending", transient_to_pending)
+    try:
+        yield pending
+    finally:
+        sqlalchemy.event.remove(
+            session, "transient_to_pending", transient_to_pending)
+
+def _discard(session, objs, resolver):
+    """
+    Expunges the still-pending objects in `objs` (those a failed document
+    brought into the session), and forgets them in `resolver`, so that they
+    are neither inserted nor shared with the batch's other documents.
+    """
+    discarded = set()
+    for obj in objs:
+        if sqlalchemy.inspect(obj).pending:
+            session.expunge(obj)
+            discarded.add(id(obj))
+    if resolver is not None and discarded:
+        for (k, obj) in list(resolver.objects.items()):
+            if id(obj) in discarded:
+                del resolver.objects[k]
+
+def _error_message(ex):
+    msg = None
+    try:
+        msg = "%r" % (ex.args,)
+    except:
+        pass
+    return msg or "malformed object"
+
+def _ingest_batch(session, docs, indices, owner, module_name, results,
+                  resolve=True):
+    resolver = None
+    if resolve:
+        resolver = NaturalKeyResolver(
+            session, skip_primary_keys=True, error_on_primary_key=False,
+            allow_fk=True)
+        for i in indices:
+            doc = docs[i]
+            if isinstance(doc, dict) and "artifact" in doc:
+                doc = doc["artifact"]
+            resolver.collect(Artifact, doc)
+        resolver.resolve()
+
+    now = datetime.datetime.now()
+    created = []
+    savepoint = session.begin_nested()
+    try:
+        with session.no_autoflush, _tracking_pending(session) as pending:
+            for i in indices:
+                mark = len(pending)
+                try:
+                    artifact = _artifact_from_json(
+                        session, docs[i], owner, module_name, now, resolver)
+                except (ValueError, TypeError):
+                    results[i] = dict(index=i, error=str(sys.exc_info()[1]))
+                    # A document can fail partway, after some of its objects
+                    # have been cascaded into the session.
+                    _discard(session, pending[mark:], resolver)
+                    continue
+                created.append((i, artifact))
+            assign_primary_keys(session, list(session.new))
+        session.flush()
+        created = [ (i, artifact.id) for (i, artifact) in created ]
+        savepoint.commit()
+    except sqlalchemy.exc.SQLAlchemyError:
+        savepoint.rollback()
+        ex = sys.exc_info()[1]
+        if len(created) == 1:
+            LOG.exception(ex)
+            results[created[0][0]] = dict(index=created[0][0], error=_error_message(ex))
+        else:
+            LOG.warning("bulk insert of %d artifacts failed (%s); retrying singly",
+                        len(created), _error_message(ex))
+        return False
+
+    if resolver:
+        LOG.debug("inserted %d artifacts (%d reference queries)",
+                  len(created), resolver.queries)
+    for (i, id) in created:
+        results[i] = dict(index=i, id=id)
+    return True
+
+def ingest_artifacts(session, docs, owner=None, module_name="bulk",
+                     batch_size=500):
+    """
+    Creates artifacts from a list of JSON documents, as POST /artifacts
+    would, but `batch_size` at a time: the references in each batch are
+    resolved with one query per class (see NaturalKeyResolver), and the new
+    rows are inserted with one executemany per table (sent as multi-row
+    INSERTs; see assign_primary_keys()).  Each batch is
+    committed.  If a batch cannot be inserted (e.g., one of its artifacts
+    violates a constraint), its artifacts are retried one at a time, so only
+    the bad ones fail.
+
+    Returns a list with one result per document: a dict with its `index`,
+    and either the new artifact's `id`, or an `error` message.
+    """
+    results = [ None ] * len(docs)
+    for start in range(0, len(docs), batch_size):
+        indices = list(range(start, min(start + batch_size, len(docs))))
+        if not _ingest_batch(session, docs, indices, owner, module_name, results):
+            for i in indices:
+                if results[i] is None:
+                    _ingest_batch(session, docs, [i], owner, module_name, results,
+                                  resolve=False)
+        session.commit()
+    return results
@@ -0,0 +1,187 @@
+
+import collections
+import threading
+import logging
+import tempfile
+import time
+import os
+
+LOG = logging.getLogger(__name__)
+
+#
+# All caches, by name, so their counters can be reported in one place.
+#
+CACHES = collections.OrderedDict()
+
+def get_cache_stats():
+    return [ c.stats() for c in CACHES.values() ]
+
+class MemoryInvalidationBackend(object):
+    """
+    Invalidations are only seen by the worker that makes them.  Other
+    workers see the change when their entries expire.
+    """
+
+    def invalidate(self, key):
+        pass
+
+    def invalidate_all(self):
+        pass
+
+    def is_valid(self, key, cached_at):
+        return True
+
+class FileInvalidationBackend(object):
+    """
+    Invalidations are shared between workers on the same host through marker
+    files in a common directory: an entry is stale if its key's marker (or
+    the global marker) was touched at or after the time the entry's value was
+    read.  Checking an entry costs a stat(), which is far cheaper than the
+    database round trip the cache saves.  Markers older than the cache TTL
+    cannot affect any entry, so they are pruned.
+    """
+    ALL = "__all__"
+
+    def __init__(self, directory, ttl):
+        self.directory = directory
+        self.ttl = ttl
+        self.last_prune = time.time()
+        os.makedirs(directory, exist_ok=True)
+
+    def _touch(self, name):
+        path = os.path.join(self.directory, name)
+        with open(path, "a"):
+            pass
+        os.utime(path)
+
+    def _prune(self):
+        now = time.time()
+        if now - self.last_prune < self.ttl:
+            return
+        self.last_prune = now
+        try:
+            for de in os.scandir(self.directory):
+                try:
+                    if de.stat().st_mtime < now - self.ttl:
+                        os.unlink(de.path)
+                except FileNotFoundError:
+                    pass
+        except OSError:
+            LOG.exception("failed to prune cache markers in %s", self.directory)
+
+    def invalidate(self, key):
+        self._touch(key)
+        self._prune()
+
+    def invalidate_all(self):
+        self._touch(self.ALL)
+
+    def is_valid(self, key, cached_at):
+        for name in (key, self.ALL):
+            try:
+                if os.stat(os.path.join(self.directory, name)).st_mtime >= cached_at:
+                    return False
+            except FileNotFoundError:
+                pass
+        return True
+
+class TTLCache(object):
+    """
+    A bounded, thread-safe LRU cache whose entries expire after `ttl`
+    seconds (or earlier, if put() is given a shorter ttl).  Keys must be
+    strings if a shared invalidation backend is used.
+    """
+
+    def __init__(self, name, maxsize=1024, ttl=60, backend=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend or MemoryInvalidationBackend()
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        CACHES[name] = self
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            (value, cached_at, expires) = entry
+            if expires <= now:
+                del self.entries[key]
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+        # Check outside the lock; it may touch the filesystem.
+        if not self.backend.is_valid(key, cached_at):
+            with self.lock:
+                self.entries.pop(key, None)
+                self.misses += 1
+            return default
+        with self.lock:
+            self.hits += 1
+        return value
+
+    def put(self, key, value, ttl=None, cached_at=None):
+        """
+        Caches `value`.  `cached_at` should be the time the value was read
+        from its source (default now); shared invalidations made after that
+        time make the entry stale.
+        """
+        now = time.time()
+        if ttl is None or ttl > self.ttl:
+            ttl = self.ttl
+        if ttl <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (value, cached_at or now, now + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.invalidations += 1
+        self.backend.invalidate(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.invalidations += 1
+        self.backend.invalidate_all()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return dict(
+                name=self.name, size=len(self.entries), maxsize=self.maxsize,
+                ttl=self.ttl, hits=self.hits, misses=self.misses,
+                hit_rate=round(self.hits / lookups, 4) if lookups else None,
+                evictions=self.evictions, invalidations=self.invalidations,
+                backend=self.backend.__class__.__name__)
+
+def make_cache(app, name, prefix, maxsize=1024, ttl=60):
+    """
+    Creates a TTLCache configured by the app's <prefix>_SIZE, <prefix>_TTL,
+    <prefix>_BACKEND ("memory" or "file") and <prefix>_DIR config keys.
+    """
+    maxsize = app.config.get(prefix + "_SIZE", maxsize)
+    ttl = app.config.get(prefix + "_TTL", ttl)
+    backend = app.config.get(prefix + "_BACKEND", "memory")
+    if backend == "file":
+        directory = app.config.get(prefix + "_DIR") \
+          or os.path.join(tempfile.gettempdir(), "searcch-cache", name)
+        backend = FileInvalidationBackend(directory, ttl)
+    elif backend == "memory":
+        backend = MemoryInvalidationBackend()
+    else:
+        raise ValueError("unknown %s_BACKEND %r" % (prefix, backend))
+    return TTLCache(name, maxsize=maxsize, ttl=ttl, backend=backend)
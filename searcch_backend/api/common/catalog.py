@@ -0,0 +1,51 @@
+
+import logging
+
+from flask import jsonify, request, Response
+
+from searcch_backend.api.app import app, db
+from searcch_backend.api.common.cache import make_cache
+from searcch_backend.api.common.response import (
+    make_etag, not_modified, get_table_versions, request_args_key)
+
+LOG = logging.getLogger(__name__)
+
+#
+# Serialized responses of the reference catalogs (organizations, badges,
+# licenses), keyed by endpoint, the versions of the tables they are read
+# from, and the request arguments.  A change to a table bumps its version
+# (see table_versions), so entries are never stale; superseded ones are
+# simply never hit again and age out.
+#
+catalog_cache = None
+if app.config.get("CATALOG_CACHE_ENABLED", False):
+    catalog_cache = make_cache(
+        app, "catalogs", "CATALOG_CACHE", maxsize=128, ttl=3600)
+
+def json_bytes_response(body, etag=None):
+    response = Response(body, status=200, mimetype=app.config["JSONIFY_MIMETYPE"])
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    if etag:
+        response.set_etag(etag)
+    return response
+
+def catalog_response(tables, build):
+    """
+    Returns the response for a catalog read from `tables`: a 304 if the
+    client has it, else its cached bytes, else the JSON-serialized result
+    of `build()`, which is cached.
+    """
+    key = (request.endpoint, get_table_versions(db.session, tables),
+           request_args_key())
+    etag = make_etag(*key)
+    response = not_modified(etag)
+    if response:
+        return response
+    body = None
+    if catalog_cache:
+        body = catalog_cache.get(key)
+    if body is None:
+        body = jsonify(build()).get_data()
+        if catalog_cache:
+            catalog_cache.put(key, body)
+    return json_bytes_response(body, etag)
@@ -2,8 +2,6 @@ import datetime
 import logging
 import sys
 import threading
-import requests
-import logging
 
 from sqlalchemy import ( asc, desc, func )
 from flask import abort, jsonify, request, Response, Blueprint
@@ -14,154 +12,168 @@ from searcch_backend.models.model import (
     ImporterInstance )
 from searcch_backend.models.schema import (
     ArtifactImportSchema )
-from searcch_backend.api.app import db
+from searcch_backend.api.app import app, db
 from searcch_backend.api.common.auth import verify_api_key
+from searcch_backend.api.common.importer_client import importer_client
 
 
 LOG = logging.getLogger(__name__)
 
-def notify_importer(artifact_import,importer_instance,importer_schedule,
-                    session):
+def deschedule_import(session,importer_schedule_id,importer_instance_id):
     """
-    Posts an artifact_import to the given importer_instance.  If this
-    fails for any reason, we immediately deschedule the import (unlink
-    the artifact_import from the importer_schedule), and allow a
-    future state mutation to reschedule it.
+    Unlinks an artifact_import from the importer_instance it was scheduled
+    to, if it still is, and returns it to pending so that a later pass can
+    reschedule it.
     """
-    # XXX: do a better job tracking failure cause, e.g. connection error vs
-    # http error status.  If the importer fails to accept our artifact_import,
-    # something may be wrong with our POST request or the artifact_import
-    # object.
-    try:
-        ais = ArtifactImportSchema(
-            only=("id","type","url","importer_module_name","ctime"))
-        aid = ais.dumps(artifact_import)
-        LOG.debug("notifying importer %r of scheduled import %r (data=%r)" % (
-            importer_instance, artifact_import,aid))
-        r = requests.post(
-            importer_instance.url + "/artifact/imports",
-            headers={"Content-type":"application/json",
-                     "X-Api-Key":importer_instance.key},
-            data=aid)
-        if r.status_code == requests.codes.ok:
-            LOG.debug("notified importer %r of scheduled import %r" % (
-                importer_instance, artifact_import))
-            return
-        else:
-            LOG.error("failed to notify importer %r of scheduled import %r (status=%d); descheduling" % (
-                importer_instance, artifact_import, r.status_code))
-    except:
-        LOG.error("failed to notify %r of scheduled import %r; descheduling" % (
-            importer_instance,artifact_import))
-        LOG.exception(sys.exc_info()[1])
-
-    # If we arrive here, there was an error, so deschedule.
+    importer_schedule = session.query(ImporterSchedule)\
+      .filter(ImporterSchedule.id == importer_schedule_id)\
+      .filter(ImporterSchedule.importer_instance_id == importer_instance_id)\
+      .with_for_update().first()
+    if not importer_schedule:
+        session.rollback()
+        return
     importer_schedule.importer_instance_id = None
     importer_schedule.schedule_time = None
-    artifact_import.status = "pending"
-    artifact_import.mtime = datetime.datetime.now()
-    session.flush()
+    artifact_import = importer_schedule.artifact_import
+    if artifact_import.status == "scheduled":
+        artifact_import.status = "pending"
+        artifact_import.mtime = datetime.datetime.now()
     session.commit()
 
-#
-# We do not keep a scheduler thread running in the background.  Instead, this
-# function is invoked every time an ArtifactImport or ImporterInstance changes
-# state.
-#
-# NB: we also assume that all importer instances *do* keep a simple background
-# thread that pushes state updates to us at regular, reasonable intervals (e.g.
-# one minute).  We'll flip this around later so that the backend polls for
-# status.
-#
-def schedule_import(*args,**kwargs):
+def schedule_pass(session):
     """
-    Schedule an artifact_import to an importer_instance, if any
-    importer_instance slots are available.  If the argument is None,
-    look for the oldest unscheduled artifact_import.  This must be run
-    in a separate thread.  Note that it creates its own scoped session
-    and closes it before returning so that it doesn't leak sqlalchemy
-    connections.
+    Assigns as many pending artifact_imports as there are free importer
+    slots, oldest first, each to the least-loaded up/enabled importer
+    instance, in one transaction; then notifies the importers.  Returns the
+    number of imports scheduled.
+
+    Passes may run concurrently in several processes.  Locking the
+    candidate importer_instances rows serializes their slot accounting, and
+    pending schedules are claimed with FOR UPDATE SKIP LOCKED, so no import
+    is ever assigned twice and no pass waits on rows another pass claimed.
     """
-    LOG.debug("schedule_import (thread=%r, threads=%r)" % (
-        threading.current_thread().getName(),threading.active_count()))
-
-    session = db.create_scoped_session()
-    #session = db.session
-    LOG.debug("session: %r" % (session,))
-    #session.begin_nested()
-    #session.begin()
-
-    # Ensure there is at least one artifact_import to schedule:
-    res = session.query(ImporterSchedule)\
-      .filter(ImporterSchedule.importer_instance_id == None).all()
-    if not res:
-        LOG.debug("nothing to schedule")
-        session.close()
-        return
-
-    # Unfortunately, we must lock to avoid races.
-    #session.begin(subtransactions=True)
-    #session.execute("BEGIN")
-    #session.execute("LOCK TABLE ONLY importer_instances, importer_schedules")
-    #session.execute("LOCK TABLE ONLY importer_schedules IN ACCESS EXCLUSIVE MODE")
-    (artifact_import,importer_schedule,importer_instance) = (None,None,None)
-    try:
-        res = session.query(
-            ImporterInstance.id.label("id"),
-            ImporterInstance.max_tasks.label("max_tasks"),
-            func.count(ImporterSchedule.id).label("current_tasks"))\
-          .join(ImporterSchedule,
-                ImporterInstance.id == ImporterSchedule.importer_instance_id,
-                isouter=True)\
-          .filter(ImporterInstance.status == "up")\
-          .filter(ImporterInstance.admin_status == "enabled")\
-          .group_by(ImporterInstance.id)\
-          .order_by(desc(ImporterInstance.status_time)).all()
-        if not res:
-            LOG.warn("no up/enabled importers; cannot schedule")
-            session.rollback()
-            session.close()
-            return
-
-        (least_id,least_percent) = (None,100.0)
-        for (id,max_tasks,current_tasks) in res:
-            if current_tasks == max_tasks:
-                continue
-            pct = current_tasks/float(max_tasks)
-            if pct < least_percent:
-                least_percent = pct
-                least_id = id
-        if not least_id:
-            LOG.warn("all importers are busy")
-            session.rollback()
-            session.close()
-            return
-
-        importer_instance = session.query(ImporterInstance)\
-          .filter(ImporterInstance.id == least_id).one()
-        LOG.debug("using importer %r" % (importer_instance,))
-
-        (importer_schedule,artifact_import) = session.query(
-            ImporterSchedule,ArtifactImport)\
-          .join(ArtifactImport,ImporterSchedule.artifact_import_id == ArtifactImport.id)\
-          .filter(ImporterSchedule.importer_instance_id == None)\
-          .order_by(asc(ArtifactImport.ctime)).first()
-        LOG.debug("scheduling %r" % (artifact_import,))
-
-        dt = datetime.datetime.now()
-        importer_schedule.importer_instance_id = importer_instance.id
+    instances = session.query(ImporterInstance)\
+      .filter(ImporterInstance.status == "up")\
+      .filter(ImporterInstance.admin_status == "enabled")\
+      .order_by(ImporterInstance.id)\
+      .with_for_update(of=ImporterInstance).all()
+    if not instances:
+        session.rollback()
+        LOG.debug("no up/enabled importers; cannot schedule")
+        return 0
+    counts = dict(session.query(
+        ImporterSchedule.importer_instance_id, func.count(ImporterSchedule.id))\
+      .filter(ImporterSchedule.importer_instance_id.in_([ i.id for i in instances ]))\
+      .group_by(ImporterSchedule.importer_instance_id).all())
+    load = []
+    free = 0
+    for instance in instances:
+        current = counts.get(instance.id, 0)
+        if current < instance.max_tasks:
+            load.append([current, instance])
+            free += instance.max_tasks - current
+    if not free:
+        session.rollback()
+        LOG.debug("all importers are busy")
+        return 0
+
+    claimed = session.query(ImporterSchedule, ArtifactImport)\
+      .join(ArtifactImport, ImporterSchedule.artifact_import_id == ArtifactImport.id)\
+      .filter(ImporterSchedule.importer_instance_id == None)\
+      .order_by(asc(ArtifactImport.ctime))\
+      .limit(free)\
+      .with_for_update(of=ImporterSchedule, skip_locked=True).all()
+    if not claimed:
+        session.rollback()
+        return 0
+
+    ais = ArtifactImportSchema(
+        only=("id","type","url","importer_module_name","ctime"))
+    dt = datetime.datetime.now()
+    notifications = {}
+    count = 0
+    for (importer_schedule, artifact_import) in claimed:
+        # Least-loaded by fraction of slots in use.
+        entry = min(
+            (e for e in load if e[0] < e[1].max_tasks),
+            key=lambda e: e[0] / float(e[1].max_tasks))
+        instance = entry[1]
+        entry[0] += 1
+        importer_schedule.importer_instance_id = instance.id
         importer_schedule.schedule_time = dt
         artifact_import.status = "scheduled"
         artifact_import.mtime = dt
-        session.commit()
-    except:
-        session.rollback()
-        session.close()
-        LOG.error("error in schedule_import:")
-        LOG.exception(sys.exc_info()[1])
-        return
+        if instance.id not in notifications:
+            notifications[instance.id] = (instance.url, instance.key, [], [])
+        notifications[instance.id][2].append(importer_schedule.id)
+        notifications[instance.id][3].append(ais.dumps(artifact_import))
+        count += 1
+        LOG.debug("scheduling %r on %r" % (artifact_import, instance))
+    session.commit()
 
-    # Notify the importer instance now that we've scheduled and released locks:
-    notify_importer(artifact_import,importer_instance,importer_schedule,session)
+    # Notify the importer instances now that we've released locks.
+    for (instance_id, (url, key, schedule_ids, payloads)) in notifications.items():
+        results = importer_client.dispatch(instance_id, url, key, payloads)
+        for (schedule_id, ok) in zip(schedule_ids, results):
+            if not ok:
+                LOG.error("descheduling import (schedule %r) from %r" % (
+                    schedule_id, url))
+                deschedule_import(session, schedule_id, instance_id)
+    return count
+
+class ImportScheduler(threading.Thread):
+    """
+    A long-lived scheduler thread.  It runs a scheduling pass whenever it
+    is woken (every time an ArtifactImport or ImporterInstance changes state
+    in this process), and every IMPORT_SCHEDULER_INTERVAL seconds regardless,
+    which picks up state changes made by other processes.  Wakeups that
+    arrive during a pass coalesce into one more pass.
+    """
 
-    session.close()
+    def __init__(self, interval=30):
+        super(ImportScheduler, self).__init__(name="import_scheduler", daemon=True)
+        self.interval = interval
+        self.wakeup = threading.Event()
+
+    def wake(self):
+        self.wakeup.set()
+
+    def run(self):
+        LOG.info("import scheduler running (interval=%r)" % (self.interval,))
+        session = db.create_scoped_session()
+        while True:
+            self.wakeup.wait(timeout=self.interval)
+            self.wakeup.clear()
+            try:
+                with app.app_context():
+                    schedule_pass(session)
+            except:
+                session.rollback()
+                LOG.error("error in import scheduler pass:")
+                LOG.exception(sys.exc_info()[1])
+            finally:
+                # Do not hold a connection between passes.
+                session.remove()
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ImportScheduler(
+                interval=app.config.get("IMPORT_SCHEDULER_INTERVAL", 30))
+            _scheduler.start()
+    return _scheduler
+
+@app.before_first_request
+def start_scheduler():
+    get_scheduler().wake()
+
+def schedule_import(*args,**kwargs):
+    """
+    Wakes this process's scheduler; call after any ArtifactImport or
+    ImporterInstance state change.  Returns immediately.
+    """
+    get_scheduler().wake()
@@ -0,0 +1,216 @@
+
+import datetime
+import logging
+import sys
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from searcch_backend.models.model import ImporterInstance
+from searcch_backend.api.app import app, db
+
+LOG = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker(object):
+    """
+    Counts consecutive failures talking to one importer instance.  After
+    `threshold` of them the circuit opens, and calls fail fast for
+    `reset_timeout` seconds; then one trial call is let through (half-open),
+    which either closes the circuit or reopens it.
+    """
+
+    def __init__(self, threshold=3, reset_timeout=60):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Half-open: let this call through, but fail fast on the rest
+                # until it completes.
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self):
+        """
+        Records a failure; returns True if this failure opened the circuit.
+        """
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                opened = self.opened_at is None
+                self.opened_at = time.monotonic()
+                return opened
+            return False
+
+def mark_importer_stale(importer_instance_id):
+    """
+    Marks an importer instance stale, so the scheduler stops assigning it
+    imports until it next reports itself up.  Uses its own session, since it
+    may be called from any thread.
+    """
+    session = db.create_scoped_session()
+    try:
+        with app.app_context():
+            dt = datetime.datetime.now()
+            session.query(ImporterInstance)\
+              .filter(ImporterInstance.id == importer_instance_id)\
+              .filter(ImporterInstance.status == "up")\
+              .update({ "status": "stale", "status_time": dt },
+                      synchronize_session=False)
+            session.commit()
+        LOG.warning("marked importer instance %r stale" % (importer_instance_id,))
+    except:
+        session.rollback()
+        LOG.exception(sys.exc_info()[1])
+    finally:
+        session.remove()
+
+class ImporterClient(object):
+    """
+    HTTP client for all backend-to-importer traffic.  Each importer instance
+    gets its own requests.Session, and so its own keep-alive connection pool.
+    Every request has connect and read timeouts.  Connection failures and
+    502/503/504 responses are retried with exponential backoff.  A request
+    that times out while reading is never retried, because the importer may
+    already have acted on it.  Repeated failures open a per-instance circuit
+    breaker and mark the instance stale.
+    """
+
+    def __init__(self, config):
+        self.timeout = (config.get("IMPORTER_CONNECT_TIMEOUT", 3.05),
+                        config.get("IMPORTER_READ_TIMEOUT", 10))
+        self.pool_size = config.get("IMPORTER_POOL_SIZE", 4)
+        self.retries = config.get("IMPORTER_RETRIES", 2)
+        self.backoff = config.get("IMPORTER_RETRY_BACKOFF", 0.5)
+        self.circuit_threshold = config.get("IMPORTER_CIRCUIT_FAILURES", 3)
+        self.circuit_reset = config.get("IMPORTER_CIRCUIT_RESET", 60)
+        self.batch = config.get("IMPORTER_BATCH_DISPATCH", False)
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.breakers = {}
+        # Instances that rejected a batched dispatch.
+        self.no_batch = set()
+
+    def _session(self, instance_id, url):
+        with self.lock:
+            key = (instance_id, url)
+            s = self.sessions.get(key)
+            if s is None:
+                retry = Retry(
+                    total=self.retries, connect=self.retries, read=0,
+                    status=self.retries, status_forcelist=(502, 503, 504),
+                    allowed_methods=frozenset(["GET", "POST"]),
+                    backoff_factor=self.backoff, raise_on_status=False)
+                adapter = HTTPAdapter(
+                    pool_connections=1, pool_maxsize=self.pool_size,
+                    max_retries=retry)
+                s = requests.Session()
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                self.sessions[key] = s
+            return s
+
+    def breaker(self, instance_id):
+        with self.lock:
+            b = self.breakers.get(instance_id)
+            if b is None:
+                b = self.breakers[instance_id] = CircuitBreaker(
+                    self.circuit_threshold, self.circuit_reset)
+            return b
+
+    def reset(self, instance_id):
+        """
+        Closes an instance's circuit, e.g. when it reports itself up.
+        """
+        self.breaker(instance_id).success()
+
+    def request(self, instance_id, url, key, method, path, **kwargs):
+        """
+        Makes a request to an importer instance and returns the response.
+        Raises CircuitOpenError if the instance's circuit is open, or the
+        requests exception on failure.  Responses with 5xx status count as
+        failures, but are returned.
+        """
+        breaker = self.breaker(instance_id)
+        if not breaker.allow():
+            raise CircuitOpenError("importer instance %r circuit open" % (instance_id,))
+        headers = kwargs.pop("headers", {})
+        headers["X-Api-Key"] = key
+        try:
+            r = self._session(instance_id, url).request(
+                method, url + path, headers=headers, timeout=self.timeout,
+                **kwargs)
+        except requests.exceptions.RequestException:
+            if breaker.failure():
+                mark_importer_stale(instance_id)
+            raise
+        if r.status_code >= 500:
+            if breaker.failure():
+                mark_importer_stale(instance_id)
+        else:
+            breaker.success()
+        return r
+
+    def get_status(self, instance_id, url, key):
+        return self.request(instance_id, url, key, "GET", "/status")
+
+    def _post_imports(self, instance_id, url, key, data):
+        try:
+            return self.request(
+                instance_id, url, key, "POST", "/artifact/imports",
+                headers={"Content-type": "application/json"}, data=data)
+        except CircuitOpenError as ex:
+            LOG.warning("not notifying importer %r: %s" % (url, ex))
+        except:
+            LOG.error("failed to notify importer %r of scheduled import(s)" % (url,))
+            LOG.exception(sys.exc_info()[1])
+        return None
+
+    def dispatch(self, instance_id, url, key, payloads):
+        """
+        Delivers scheduled imports (each a JSON-serialized artifact_import)
+        to an importer instance.  With IMPORTER_BATCH_DISPATCH, several are
+        sent as one JSON array; if the importer rejects the array, it is sent
+        them one at a time from then on.  Returns a list of booleans, one per
+        payload, indicating which were accepted.
+        """
+        if self.batch and len(payloads) > 1 and instance_id not in self.no_batch:
+            r = self._post_imports(
+                instance_id, url, key, "[" + ",".join(payloads) + "]")
+            if r is not None and r.status_code == requests.codes.ok:
+                return [True] * len(payloads)
+            if r is None or r.status_code >= 500:
+                return [False] * len(payloads)
+            LOG.info("importer %r rejected batched dispatch (status=%d); sending singly" % (
+                url, r.status_code))
+            self.no_batch.add(instance_id)
+
+        results = []
+        for payload in payloads:
+            r = self._post_imports(instance_id, url, key, payload)
+            ok = r is not None and r.status_code == requests.codes.ok
+            if r is not None and not ok:
+                LOG.error("importer %r refused scheduled import (status=%d)" % (
+                    url, r.status_code))
+            results.append(ok)
+        return results
+
+importer_client = ImporterClient(app.config)
@@ -0,0 +1,144 @@
+
+import collections
+import contextlib
+import json
+import logging
+import random
+import time
+
+import marshmallow
+import sqlalchemy
+from flask import g, has_request_context, request
+
+LOG = logging.getLogger(__name__)
+
+class RequestMetrics(object):
+    """
+    Counters and phase timings for one (sampled) request.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.statements = 0
+        self.rows = 0
+        self.db_time = 0.0
+        self.phases = collections.OrderedDict()
+        self.active = set()
+
+def current_metrics():
+    """
+    Returns the current request's RequestMetrics, or None if there is no
+    request, or it is not sampled.
+    """
+    if not has_request_context():
+        return None
+    return g.get("request_metrics")
+
+@contextlib.contextmanager
+def timed(phase):
+    """
+    Adds the time spent in the block to the current request's `phase`.
+    Nested blocks of the same phase are only counted once.
+    """
+    metrics = current_metrics()
+    if metrics is None or phase in metrics.active:
+        yield
+        return
+    metrics.active.add(phase)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.active.discard(phase)
+        metrics.phases[phase] = metrics.phases.get(phase, 0.0) \
+          + time.perf_counter() - t0
+
+# The start time is kept on the statement's execution context, not the
+# connection, so that a statement that fails leaves nothing behind.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and current_metrics() is not None:
+        context._request_metrics_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics = current_metrics()
+    start = getattr(context, "_request_metrics_start", None)
+    if metrics is None or start is None:
+        return
+    metrics.statements += 1
+    metrics.db_time += time.perf_counter() - start
+    if cursor.rowcount and cursor.rowcount > 0:
+        metrics.rows += cursor.rowcount
+
+def _instrument_schema_dump():
+    # marshmallow has no global hooks, and all our schemas share only its
+    # Schema base class, so time its dump() there.
+    dump = marshmallow.Schema.dump
+    if getattr(dump, "instrumented", False):
+        return
+    def instrumented_dump(self, *args, **kwargs):
+        with timed("serialize"):
+            return dump(self, *args, **kwargs)
+    instrumented_dump.instrumented = True
+    marshmallow.Schema.dump = instrumented_dump
+
+def _instrumented_json_encoder(base):
+    class InstrumentedJSONEncoder(base):
+        def encode(self, o):
+            with timed("jsonify"):
+                return super(InstrumentedJSONEncoder, self).encode(o)
+    return InstrumentedJSONEncoder
+
+def server_timing(metrics, total):
+    parts = [ 'db;dur=%.2f;desc="%d statements, %d rows"' % (
+        metrics.db_time * 1000, metrics.statements, metrics.rows) ]
+    for (phase, t) in metrics.phases.items():
+        parts.append("%s;dur=%.2f" % (phase, t * 1000))
+    parts.append("total;dur=%.2f" % (total * 1000,))
+    return ", ".join(parts)
+
+def init_instrumentation(app, engine):
+    """
+    Instruments a sampled fraction (INSTRUMENTATION_SAMPLE_RATE) of
+    requests: counts their statements and rows, sums their database time,
+    and times marshmallow serialization and JSON encoding.  Each sampled
+    response gets a Server-Timing header, and (if INSTRUMENTATION_LOG) one
+    JSON log line.  Call this before registering other after_request
+    hooks, so that their time is included.
+    """
+    rate = app.config.get("INSTRUMENTATION_SAMPLE_RATE", 0)
+    if not app.config.get("INSTRUMENTATION_ENABLED") or rate <= 0:
+        return
+    log = app.config.get("INSTRUMENTATION_LOG", True)
+
+    sqlalchemy.event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    sqlalchemy.event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    _instrument_schema_dump()
+    app.json_encoder = _instrumented_json_encoder(app.json_encoder)
+
+    @app.before_request
+    def start_request_metrics():
+        if rate >= 1 or random.random() < rate:
+            g.request_metrics = RequestMetrics()
+
+    @app.after_request
+    def finish_request_metrics(response):
+        metrics = current_metrics()
+        if metrics is None:
+            return response
+        total = time.perf_counter() - metrics.start
+        response.headers.add("Server-Timing", server_timing(metrics, total))
+        response.headers.add("Timing-Allow-Origin", "*")
+        if log:
+            record = collections.OrderedDict([
+                ("event", "request"), ("method", request.method),
+                ("path", request.path), ("endpoint", request.endpoint),
+                ("status", response.status_code),
+                ("ms", round(total * 1000, 2)),
+                ("db_ms", round(metrics.db_time * 1000, 2)),
+                ("statements", metrics.statements), ("rows", metrics.rows) ])
+            for (phase, t) in metrics.phases.items():
+                record[phase + "_ms"] = round(t * 1000, 2)
+            LOG.info("%s", json.dumps(record))
+        return response
+
+    LOG.info("request instrumentation enabled (sample rate %r)", rate)
@@ -0,0 +1,180 @@
+
+import logging
+import os
+import time
+
+from flask import g, request
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:
+    prometheus_client = None
+
+from searcch_backend.api.common.cache import get_cache_stats
+from searcch_backend.models.model import ImporterSchedule
+
+LOG = logging.getLogger(__name__)
+
+#
+# Metrics are aggregated across gunicorn workers by prometheus_client's
+# multiprocess mode, if PROMETHEUS_MULTIPROC_DIR is set (env/gunicorn_conf.py
+# sets it, and removes dead workers' files); otherwise they are this
+# process's alone.
+#
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+POOL_WAIT_BUCKETS = (
+    0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+# Per-process gauges (pool, caches) are refreshed at most this often.
+PROCESS_STATS_INTERVAL = 1.0
+
+request_latency = None
+request_errors = None
+pool_wait = None
+pool_gauges = None
+cache_gauges = None
+
+_process_stats_time = 0.0
+_engine = None
+
+def multiprocess_dir():
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") \
+      or os.environ.get("prometheus_multiproc_dir")
+
+def _define_metrics():
+    global request_latency, request_errors, pool_wait, pool_gauges, cache_gauges
+    request_latency = prometheus_client.Histogram(
+        "searcch_request_duration_seconds", "Request latency, by endpoint.",
+        ["endpoint", "method"], buckets=LATENCY_BUCKETS)
+    request_errors = prometheus_client.Counter(
+        "searcch_request_errors_total", "Error (4xx and 5xx) responses, by endpoint.",
+        ["endpoint", "method", "status"])
+    pool_wait = prometheus_client.Histogram(
+        "searcch_db_pool_wait_seconds", "Time spent waiting for a pooled connection.",
+        buckets=POOL_WAIT_BUCKETS)
+    pool_gauges = dict([
+        (name, prometheus_client.Gauge(
+            "searcch_db_pool_%s" % (name,), doc, multiprocess_mode="livesum"))
+        for (name, doc) in (
+            ("size", "Pool size, summed over live workers."),
+            ("checked_out", "Connections checked out, summed over live workers."),
+            ("overflow", "Overflow connections, summed over live workers.")) ])
+    cache_gauges = dict([
+        (name, prometheus_client.Gauge(
+            "searcch_cache_%s" % (name,), doc, ["cache"], multiprocess_mode="livesum"))
+        for (name, doc) in (
+            ("size", "Cache entries, summed over live workers."),
+            ("hits", "Cache hits, summed over live workers."),
+            ("misses", "Cache misses, summed over live workers."),
+            ("evictions", "Cache evictions, summed over live workers."),
+            ("invalidations", "Cache invalidations, summed over live workers.")) ])
+
+def _instrument_pool(pool):
+    # QueuePool blocks in _do_get() when the pool is exhausted; time it.
+    do_get = pool._do_get
+    def timed_do_get():
+        t0 = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            pool_wait.observe(time.perf_counter() - t0)
+    pool._do_get = timed_do_get
+
+def update_process_stats(force=False):
+    """
+    Copies this process's pool and cache counters into the gauges.
+    """
+    global _process_stats_time
+    now = time.monotonic()
+    if not force and now - _process_stats_time < PROCESS_STATS_INTERVAL:
+        return
+    _process_stats_time = now
+    pool = _engine.pool
+    for (name, f) in (("size", "size"), ("checked_out", "checkedout"),
+                      ("overflow", "overflow")):
+        if hasattr(pool, f):
+            pool_gauges[name].set(max(getattr(pool, f)(), 0))
+    for stats in get_cache_stats():
+        for (name, gauge) in cache_gauges.items():
+            gauge.labels(stats["name"]).set(stats[name])
+
+class ImporterQueueCollector(object):
+    """
+    Reports importer queue depth (ImporterSchedule rows, pending and
+    dispatched) when scraped.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            "searcch_importer_queue_depth", "Scheduled imports, by state.",
+            labels=["state"])
+        try:
+            pending = self.session.query(ImporterSchedule)\
+              .filter(ImporterSchedule.importer_instance_id == None).count()
+            dispatched = self.session.query(ImporterSchedule)\
+              .filter(ImporterSchedule.importer_instance_id != None).count()
+            gauge.add_metric(["pending"], pending)
+            gauge.add_metric(["dispatched"], dispatched)
+        except Exception:
+            LOG.exception("failed to collect importer queue depth")
+            self.session.rollback()
+        yield gauge
+
+def generate_metrics(session):
+    """
+    Returns (body, content type) of the metrics exposition for all workers.
+    """
+    update_process_stats(force=True)
+    if multiprocess_dir():
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    queue_registry = prometheus_client.CollectorRegistry()
+    queue_registry.register(ImporterQueueCollector(session))
+    body = prometheus_client.generate_latest(registry) \
+      + prometheus_client.generate_latest(queue_registry)
+    return (body, prometheus_client.CONTENT_TYPE_LATEST)
+
+def metrics_enabled():
+    return prometheus_client is not None and request_latency is not None
+
+def init_metrics(app, engine):
+    """
+    Records request latency and error metrics by endpoint, and database
+    pool metrics, if METRICS_ENABLED and prometheus_client is installed.
+    """
+    global _engine
+    if not app.config.get("METRICS_ENABLED"):
+        return
+    if prometheus_client is None:
+        LOG.warning("METRICS_ENABLED, but prometheus_client is not installed")
+        return
+    _engine = engine
+    _define_metrics()
+    _instrument_pool(engine.pool)
+
+    @app.before_request
+    def start_metrics():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_metrics(response):
+        start = g.get("metrics_start")
+        if start is None:
+            return response
+        endpoint = request.endpoint or "unknown"
+        request_latency.labels(endpoint, request.method)\
+          .observe(time.perf_counter() - start)
+        if response.status_code >= 400:
+            request_errors.labels(endpoint, request.method, response.status_code).inc()
+        update_process_stats()
+        return response
+
+    LOG.info("metrics enabled (%s)",
+             "multiprocess" if multiprocess_dir() else "single process")
@@ -0,0 +1,260 @@
+
+import logging
+
+import sqlalchemy
+import sqlalchemy.orm
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from marshmallow import fields as ma_fields
+
+LOG = logging.getLogger(__name__)
+
+#
+# Columns that are never loaded unless they are explicitly requested (by a
+# `fields=` path naming them), or that are loaded by default only where the
+# caller asks for blobs.
+#
+DEFERRED_COLUMN_TYPES = (sqlalchemy.LargeBinary, TSVECTOR)
+
+class ProjectionError(ValueError):
+    pass
+
+class SchemaShape(object):
+    """
+    The serialized shape of a schema: which of its fields are model columns,
+    and which are relationships (and, if nested, the shape of the nested
+    schema).  Also records the large columns of the model.
+    """
+
+    def __init__(self, schema):
+        self.schema_class = schema.__class__
+        self.model = schema.opts.model
+        mapper = sqlalchemy.inspect(self.model)
+        self.columns = []
+        self.relations = {}
+        for (name, field) in schema.fields.items():
+            attr = field.attribute or name
+            if attr in mapper.relationships:
+                nested = None
+                if isinstance(field, ma_fields.Nested):
+                    nested = get_schema_shape(field.schema)
+                self.relations[name] = (getattr(self.model, attr), nested)
+            elif attr in mapper.column_attrs:
+                self.columns.append(name)
+        self.keys = []
+        self.blobs = []
+        self.hidden = []
+        for prop in mapper.column_attrs:
+            col = prop.columns[0]
+            if col.primary_key or col.foreign_keys:
+                self.keys.append(prop.key)
+            if isinstance(col.type, DEFERRED_COLUMN_TYPES):
+                if prop.key in self.columns:
+                    self.blobs.append(prop.key)
+                else:
+                    self.hidden.append(prop.key)
+
+_shapes = {}
+
+def get_schema_shape(schema):
+    key = (schema.__class__,
+           frozenset(schema.only) if schema.only else None,
+           frozenset(schema.exclude))
+    shape = _shapes.get(key)
+    if shape is None:
+        shape = _shapes[key] = SchemaShape(schema)
+    return shape
+
+class _Node(object):
+    """
+    A selection over a SchemaShape: `full` selects every field (and every
+    nested relation, recursively); otherwise only `columns` and the relations
+    in `children` are selected.  `blobs` are large columns explicitly named.
+    """
+
+    def __init__(self, shape, full=False):
+        self.shape = shape
+        self.full = full
+        self.columns = set()
+        self.blobs = set()
+        self.children = {}
+
+    def child(self, name, full=False):
+        (_, nested) = self.shape.relations[name]
+        node = self.children.get(name)
+        if node is None:
+            node = self.children[name] = _Node(nested, full=full)
+        elif full:
+            node.full = True
+        return node
+
+    def selected_relations(self):
+        if self.full:
+            return self.shape.relations.keys()
+        return self.children.keys()
+
+def _walk(root, path, expand=False):
+    node = root
+    segments = path.split(".")
+    for (i, name) in enumerate(segments):
+        last = (i == len(segments) - 1)
+        prefix = ".".join(segments[:i])
+        if node.shape is None:
+            raise ProjectionError("field %r has no subfields" % (prefix,))
+        if name in node.shape.relations:
+            if node.shape.relations[name][1] is None and not last:
+                raise ProjectionError("field %r has no subfields" % (path,))
+            node = node.child(name, full=last)
+        elif name in node.shape.columns and not expand and last:
+            if name in node.shape.blobs:
+                node.blobs.add(name)
+            else:
+                node.columns.add(name)
+        else:
+            raise ProjectionError("invalid field %r" % (path,))
+
+def _select_columns(node, include_blobs):
+    for name in node.shape.columns:
+        if name not in node.shape.blobs:
+            node.columns.add(name)
+        elif include_blobs:
+            node.blobs.add(name)
+
+def _dump_paths(node, prefix, include_blobs, only, exclude):
+    shape = node.shape
+    for name in shape.columns:
+        if name in shape.blobs:
+            if not node.full:
+                if name in node.blobs:
+                    only.append(prefix + name)
+            elif not include_blobs and name not in node.blobs:
+                exclude.append(prefix + name)
+        elif not node.full and name in node.columns:
+            only.append(prefix + name)
+    for name in node.selected_relations():
+        (_, nested) = shape.relations[name]
+        if not node.full:
+            only.append(prefix + name)
+        if nested is None:
+            continue
+        child = node.children.get(name) or _Node(nested, full=True)
+        _dump_paths(child, prefix + name + ".", include_blobs, only, exclude)
+
+def _chain(path):
+    opt = None
+    for attr in path:
+        if opt is None:
+            opt = sqlalchemy.orm.selectinload(attr)
+        else:
+            opt = opt.selectinload(attr)
+    return opt
+
+def _loader_options(node, path, include_blobs, options):
+    shape = node.shape
+    prefix = _chain(path)
+    deferred = list(shape.hidden)
+    for name in shape.blobs:
+        if not include_blobs and name not in node.blobs:
+            deferred.append(name)
+    if not node.full:
+        load = set(shape.keys) | node.columns | node.blobs
+        companions = getattr(shape.model, "__blob_columns__", {})
+        for name in node.blobs:
+            load.update(companions.get(name, ()))
+        load = [ getattr(shape.model, c) for c in sorted(load) ]
+        if prefix is None:
+            options.append(sqlalchemy.orm.load_only(*load))
+        else:
+            options.append(prefix.load_only(*load))
+        # load_only already defers everything else.
+        deferred = []
+    for name in deferred:
+        attr = getattr(shape.model, name)
+        if prefix is None:
+            options.append(sqlalchemy.orm.defer(attr))
+        else:
+            options.append(prefix.defer(attr))
+    for name in node.selected_relations():
+        (attr, nested) = shape.relations[name]
+        if nested is None:
+            options.append(_chain(path + [attr]))
+            continue
+        child = node.children.get(name) or _Node(nested, full=True)
+        _loader_options(child, path + [attr], include_blobs, options)
+
+class Projection(object):
+    """
+    Compiles `fields=` and `expand=` request arguments against a schema.
+
+    `fields` is a list of (possibly dotted) field paths to serialize, e.g.
+    `id,title,files.name`; naming a relation selects all of it.  `expand`
+    is a list of relation paths to include in full.  If `fields` is not
+    given, all columns are selected, and relations are selected only if
+    expanded (or if `default_full`, when neither argument is given).  Large
+    binary columns are only loaded and serialized if named in `fields`, or
+    if `include_blobs` is set.
+
+    `schema_kwargs` are the `only`/`exclude` arguments for the schema, and
+    `options` are the matching loader options for the query: each selected
+    relation is loaded with one SELECT ... IN per relation path, regardless
+    of the number of rows.
+    """
+
+    def __init__(self, schema_class, fields=None, expand=None,
+                 default_full=True, include_blobs=False):
+        shape = get_schema_shape(schema_class())
+        fields = parse_projection_arg(fields)
+        expand = parse_projection_arg(expand)
+        if not fields and not expand:
+            root = _Node(shape, full=default_full)
+            if not default_full:
+                _select_columns(root, include_blobs)
+        else:
+            root = _Node(shape)
+            if fields:
+                for path in fields:
+                    _walk(root, path)
+            else:
+                _select_columns(root, include_blobs)
+            for path in expand or []:
+                _walk(root, path, expand=True)
+        self.root = root
+
+        only = []
+        exclude = []
+        _dump_paths(root, "", include_blobs, only, exclude)
+        self.schema_kwargs = {}
+        if not root.full:
+            self.schema_kwargs["only"] = only
+        if exclude:
+            self.schema_kwargs["exclude"] = exclude
+
+        self.options = []
+        _loader_options(root, [], include_blobs, self.options)
+
+    def schema(self, schema_class, **kwargs):
+        kwargs.update(self.schema_kwargs)
+        return schema_class(**kwargs)
+
+    def apply(self, query):
+        return query.options(*self.options)
+
+def parse_projection_arg(value):
+    """
+    Splits a (list of) comma-separated field lists into a list of fields.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [ value ]
+    ret = []
+    for v in value:
+        ret.extend([ x.strip() for x in v.split(",") if x.strip() ])
+    return ret
+
+def add_projection_arguments(parser):
+    parser.add_argument(
+        name="fields", type=str, required=False, action="append", location="args",
+        help="comma-separated (dotted) fields to return")
+    parser.add_argument(
+        name="expand", type=str, required=False, action="append", location="args",
+        help="comma-separated (dotted) relations to return in full")
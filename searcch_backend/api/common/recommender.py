@@ -0,0 +1,346 @@
+
+import collections
+import datetime
+import heapq
+import logging
+import math
+import operator
+import re
+import sys
+import threading
+import time
+
+import sqlalchemy
+from sqlalchemy import func
+
+from searcch_backend.api.app import app, db
+from searcch_backend.models.model import (
+    Artifact, ArtifactPublication, ArtifactTag, ArtifactMetadata, ArtifactStats,
+    ArtifactTerm, ArtifactNeighbor, ArtifactRecommendationState)
+
+LOG = logging.getLogger(__name__)
+
+#
+# Artifacts are compared by the cosine similarity of TF-IDF vectors of their
+# terms: whole tags, topic-like metadata values, and words from their titles
+# and descriptions, weighted by source.
+#
+TAG_WEIGHT = 3.0
+TOPIC_WEIGHT = 2.0
+TITLE_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+TOPIC_METADATA_NAMES = ("topics", "topic", "keywords", "subjects", "languages")
+# Terms kept per artifact (the highest-weighted).
+MAX_TERMS = 128
+# In collections at least this large, terms in more than MAX_DF_FRACTION of
+# artifacts say little and make the similarity joins expensive; drop them.
+MIN_DOCS_FOR_DF_CUTOFF = 50
+MAX_DF_FRACTION = 0.3
+CHUNK_SIZE = 1000
+# The advisory lock key that serializes refreshes across processes.
+REFRESH_LOCK_KEY = 0x5eacc4ec
+
+TERM_RE = re.compile(r"[a-z][a-z0-9+#]*(?:[-.][a-z0-9+#]+)*")
+TOPIC_SPLIT_RE = re.compile(r"[,;\n]+")
+STOPWORDS = frozenset("""
+a about above after again against all also an and any are as at be because
+been before being below between both but by can could did do does doing down
+during each few for from further had has have having here how however if in
+into is it its itself just more most no nor not now of off on once only or
+other our out over own same should so some such than that the their them then
+there these they this those through to too under until up use used uses using
+very via was we were what when where which while who whom why will with would
+you your
+""".split())
+
+def _tokens(text):
+    if not text:
+        return []
+    return [ t for t in TERM_RE.findall(text.lower())
+             if len(t) > 2 and len(t) <= 64 and t not in STOPWORDS ]
+
+def _phrase(text):
+    text = " ".join(text.lower().split())
+    if not text or len(text) > 64:
+        return None
+    return text
+
+def _chunks(l, size=CHUNK_SIZE):
+    l = list(l)
+    for i in range(0, len(l), size):
+        yield l[i:i+size]
+
+def published_artifact_ids(session):
+    return set([ id for (id,) in session.query(Artifact.id).join(
+        ArtifactPublication, ArtifactPublication.artifact_id == Artifact.id) ])
+
+def artifact_term_counts(session, artifact_ids):
+    """
+    Returns the weighted term counts of each artifact, as a dict of
+    artifact_id -> Counter.
+    """
+    counts = dict([ (id, collections.Counter()) for id in artifact_ids ])
+    for chunk in _chunks(artifact_ids):
+        for (id, title, description) in session.query(
+              Artifact.id, Artifact.title, Artifact.description)\
+              .filter(Artifact.id.in_(chunk)):
+            for t in _tokens(title):
+                counts[id][t] += TITLE_WEIGHT
+            for t in _tokens(description):
+                counts[id][t] += DESCRIPTION_WEIGHT
+        for (id, tag) in session.query(ArtifactTag.artifact_id, ArtifactTag.tag)\
+              .filter(ArtifactTag.artifact_id.in_(chunk)):
+            t = _phrase(tag)
+            if t:
+                counts[id][t] += TAG_WEIGHT
+        for (id, value) in session.query(
+              ArtifactMetadata.artifact_id, ArtifactMetadata.value)\
+              .filter(ArtifactMetadata.artifact_id.in_(chunk))\
+              .filter(func.lower(ArtifactMetadata.name).in_(TOPIC_METADATA_NAMES)):
+            for topic in TOPIC_SPLIT_RE.split(value or ""):
+                t = _phrase(topic.strip(" \t\"'[]"))
+                if t:
+                    counts[id][t] += TOPIC_WEIGHT
+    return counts
+
+def term_vector(counts, df, n):
+    """
+    Returns the unit-length TF-IDF vector (a dict of term -> weight) of an
+    artifact with term `counts`, in a collection of `n` artifacts whose
+    document frequencies are `df`.
+    """
+    cutoff = None
+    if n >= MIN_DOCS_FOR_DF_CUTOFF:
+        cutoff = MAX_DF_FRACTION * n
+    vector = {}
+    for (term, tf) in counts.items():
+        d = df.get(term, 1)
+        if cutoff and d > cutoff:
+            continue
+        vector[term] = (1 + math.log(tf)) * (math.log((1 + n) / (1 + d)) + 1)
+    if len(vector) > MAX_TERMS:
+        vector = dict(heapq.nlargest(
+            MAX_TERMS, vector.items(), key=operator.itemgetter(1)))
+    norm = math.sqrt(sum([ w * w for w in vector.values() ]))
+    if not norm:
+        return {}
+    return dict([ (t, w / norm) for (t, w) in vector.items() ])
+
+def _artifact_generations(session):
+    return dict(session.query(ArtifactStats.artifact_id, ArtifactStats.generation).all())
+
+def _write_terms(session, vectors):
+    table = ArtifactTerm.__table__
+    for chunk in _chunks(vectors.keys()):
+        session.execute(table.delete().where(table.c.artifact_id.in_(chunk)))
+    rows = [ dict(artifact_id=id, term=t, weight=w)
+             for (id, vector) in vectors.items() for (t, w) in vector.items() ]
+    for chunk in _chunks(rows, 5000):
+        session.execute(table.insert(), chunk)
+
+def _write_neighbors(session, neighbors):
+    table = ArtifactNeighbor.__table__
+    for chunk in _chunks(neighbors.keys()):
+        session.execute(table.delete().where(table.c.artifact_id.in_(chunk)))
+    rows = [ dict(artifact_id=id, neighbor_id=nid, score=score)
+             for (id, l) in neighbors.items() for (nid, score) in l ]
+    for chunk in _chunks(rows, 5000):
+        session.execute(table.insert(), chunk)
+
+def _write_state(session, generations, now):
+    table = ArtifactRecommendationState.__table__
+    for chunk in _chunks(generations.keys()):
+        session.execute(table.delete().where(table.c.artifact_id.in_(chunk)))
+    rows = [ dict(artifact_id=id, generation=g, mtime=now)
+             for (id, g) in generations.items() ]
+    for chunk in _chunks(rows, 5000):
+        session.execute(table.insert(), chunk)
+
+def _lock(session, wait):
+    if wait:
+        session.execute("select pg_advisory_xact_lock(:key)",
+                        dict(key=REFRESH_LOCK_KEY))
+        return True
+    return session.execute("select pg_try_advisory_xact_lock(:key)",
+                           dict(key=REFRESH_LOCK_KEY)).scalar()
+
+def rebuild_recommendations(session, k=10):
+    """
+    Recomputes every published artifact's term vector and neighbors.
+    Returns the number of artifacts; the caller commits.
+    """
+    _lock(session, True)
+    now = datetime.datetime.now()
+    # Read generations first: a change made while we read contents bumps
+    # the generation again, so the next refresh picks it up.
+    generations = _artifact_generations(session)
+    ids = published_artifact_ids(session)
+    counts = artifact_term_counts(session, ids)
+    df = collections.Counter()
+    for c in counts.values():
+        df.update(c.keys())
+    vectors = dict([ (id, term_vector(c, df, len(ids))) for (id, c) in counts.items() ])
+
+    postings = collections.defaultdict(list)
+    for (id, vector) in vectors.items():
+        for (t, w) in vector.items():
+            postings[t].append((id, w))
+    neighbors = {}
+    for (id, vector) in vectors.items():
+        scores = collections.defaultdict(float)
+        for (t, w) in vector.items():
+            for (nid, nw) in postings[t]:
+                if nid != id:
+                    scores[nid] += w * nw
+        neighbors[id] = heapq.nlargest(k, scores.items(), key=operator.itemgetter(1))
+
+    session.execute(ArtifactTerm.__table__.delete())
+    session.execute(ArtifactNeighbor.__table__.delete())
+    session.execute(ArtifactRecommendationState.__table__.delete())
+    _write_terms(session, vectors)
+    _write_neighbors(session, neighbors)
+    _write_state(session, dict([ (id, generations.get(id, 0)) for id in ids ]), now)
+    LOG.info("rebuilt recommendations for %d artifacts", len(ids))
+    return len(ids)
+
+NEIGHBORS_SQL = \
+    "select T2.artifact_id, sum(T1.weight * T2.weight) as score" \
+    " from artifact_terms T1" \
+    " join artifact_terms T2 on T1.term = T2.term" \
+    " where T1.artifact_id = :artifact_id and T2.artifact_id <> :artifact_id" \
+    " group by T2.artifact_id" \
+    " order by score desc, T2.artifact_id" \
+    " limit :k"
+
+def refresh_recommendations(session, k=10, limit=500, wait=False):
+    """
+    Incrementally refreshes recommendations: recomputes the term vectors of
+    up to `limit` published artifacts that changed (by artifact_stats
+    generation) since they were last computed, drops unpublished
+    artifacts, and recomputes the neighbors of the changed artifacts and of
+    the artifacts whose neighbors they are or become.  (Deleted artifacts'
+    rows go with them; delete_artifacts() marks the artifacts that listed
+    them stale.)
+    Returns the numbers of changed and of removed artifacts (there is more
+    to do if the former is `limit`), or None if another refresh is running
+    (unless `wait`); the caller commits.
+    """
+    if not _lock(session, wait):
+        return None
+    now = datetime.datetime.now()
+    state = ArtifactRecommendationState
+    stale = dict(session.query(ArtifactStats.artifact_id, ArtifactStats.generation)\
+      .join(ArtifactPublication,
+            ArtifactPublication.artifact_id == ArtifactStats.artifact_id)\
+      .outerjoin(state, state.artifact_id == ArtifactStats.artifact_id)\
+      .filter(sqlalchemy.or_(state.generation == None,
+                             state.generation != ArtifactStats.generation))\
+      .order_by(ArtifactStats.artifact_id).limit(limit).all())
+    removed = [ id for (id,) in session.query(state.artifact_id)\
+      .outerjoin(ArtifactPublication,
+                 ArtifactPublication.artifact_id == state.artifact_id)\
+      .filter(ArtifactPublication.id == None) ]
+    if not stale and not removed:
+        return (0, 0)
+
+    changed = list(stale.keys()) + removed
+    affected = set(stale.keys())
+    for chunk in _chunks(changed):
+        affected.update([ id for (id,) in session.query(ArtifactNeighbor.artifact_id)\
+          .filter(ArtifactNeighbor.neighbor_id.in_(chunk)) ])
+    affected.difference_update(removed)
+
+    # Drop removed artifacts entirely.
+    for chunk in _chunks(removed):
+        for (model, col) in ((ArtifactTerm, ArtifactTerm.artifact_id),
+                             (ArtifactNeighbor, ArtifactNeighbor.artifact_id),
+                             (ArtifactNeighbor, ArtifactNeighbor.neighbor_id),
+                             (state, state.artifact_id)):
+            session.execute(model.__table__.delete().where(col.in_(chunk)))
+
+    # Recompute the changed artifacts' vectors, with document frequencies
+    # from the other artifacts' current vectors plus their own.
+    counts = artifact_term_counts(session, stale.keys())
+    n = session.query(func.count(ArtifactPublication.id)).scalar()
+    terms = set()
+    for c in counts.values():
+        terms.update(c.keys())
+    df = collections.Counter()
+    for chunk in _chunks(terms):
+        df.update(dict(session.query(ArtifactTerm.term, func.count())\
+          .filter(ArtifactTerm.term.in_(chunk))\
+          .filter(~ArtifactTerm.artifact_id.in_(list(stale.keys())))\
+          .group_by(ArtifactTerm.term).all()))
+    for c in counts.values():
+        df.update(c.keys())
+    vectors = dict([ (id, term_vector(c, df, n)) for (id, c) in counts.items() ])
+    _write_terms(session, vectors)
+    session.flush()
+
+    # Changed artifacts may now belong in others' neighbor lists.
+    neighbors = {}
+    for id in stale.keys():
+        neighbors[id] = session.execute(
+            NEIGHBORS_SQL, dict(artifact_id=id, k=k)).fetchall()
+        affected.update([ nid for (nid, score) in neighbors[id] ])
+    for id in affected:
+        if id not in neighbors:
+            neighbors[id] = session.execute(
+                NEIGHBORS_SQL, dict(artifact_id=id, k=k)).fetchall()
+    _write_neighbors(session, neighbors)
+    _write_state(session, stale, now)
+    LOG.info("refreshed recommendations: %d changed, %d removed, %d neighbor lists",
+             len(stale), len(removed), len(neighbors))
+    return (len(stale), len(removed))
+
+class RecommendationRefresher(threading.Thread):
+    """
+    Refreshes recommendations every RECOMMENDER_REFRESH_INTERVAL seconds.
+    Every worker runs one, but an advisory lock lets only one refresh run
+    at a time.
+    """
+
+    def __init__(self, interval=300, k=10, limit=500):
+        super(RecommendationRefresher, self).__init__(
+            name="recommendation_refresher", daemon=True)
+        self.interval = interval
+        self.k = k
+        self.limit = limit
+
+    def run(self):
+        LOG.info("recommendation refresher running (interval=%r)", self.interval)
+        session = db.create_scoped_session()
+        while True:
+            try:
+                with app.app_context():
+                    # Keep going while there is a backlog.
+                    while True:
+                        counts = refresh_recommendations(
+                            session, k=self.k, limit=self.limit)
+                        session.commit()
+                        if counts is None or counts[0] < self.limit:
+                            break
+            except:
+                session.rollback()
+                LOG.error("error refreshing recommendations:")
+                LOG.exception(sys.exc_info()[1])
+            finally:
+                session.remove()
+            time.sleep(self.interval)
+
+_refresher = None
+_refresher_lock = threading.Lock()
+
+@app.before_first_request
+def start_refresher():
+    global _refresher
+    interval = app.config.get("RECOMMENDER_REFRESH_INTERVAL")
+    if not interval:
+        return
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = RecommendationRefresher(
+                interval=interval,
+                k=app.config.get("RECOMMENDER_NEIGHBORS", 10),
+                limit=app.config.get("RECOMMENDER_REFRESH_BATCH_SIZE", 500))
+            _refresher.start()
@@ -0,0 +1,125 @@
+
+import gzip
+import hashlib
+import logging
+
+from flask import request, Response
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+from searcch_backend.api.common.instrumentation import timed
+from searcch_backend.models.model import TableVersion
+
+LOG = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = (
+    "application/json", "application/schema+json", "text/plain",
+    "text/html", "text/csv",
+)
+# Content codings we append to a compressed response's ETag, so that caches
+# never confuse the encoded and identity representations.
+ETAG_CODING_SUFFIXES = ("", "-gzip", "-br")
+
+def make_etag(*parts):
+    """
+    Returns a strong ETag value for a response that is fully determined by
+    `parts` (versions, ids, normalized arguments).
+    """
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(repr(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def request_args_key():
+    """
+    Returns the request's query arguments in a stable order, for ETags.
+    """
+    return tuple(sorted(request.args.items(multi=True)))
+
+def get_table_versions(session, names):
+    """
+    Returns the table_versions counters of the named tables, in order.
+    """
+    versions = dict(session.query(TableVersion.name, TableVersion.version)\
+      .filter(TableVersion.name.in_(names)).all())
+    return tuple([ versions.get(name, 0) for name in names ])
+
+def not_modified(etag):
+    """
+    Returns a 304 response if the request's If-None-Match matches `etag` (in
+    any content coding), or None.  Call this before doing the work of
+    building the response.
+    """
+    if not etag:
+        return None
+    inm = request.if_none_match
+    if not inm:
+        return None
+    if not inm.star_tag:
+        for suffix in ETAG_CODING_SUFFIXES:
+            if inm.contains(etag + suffix):
+                break
+        else:
+            return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response
+
+def _compress(response, min_size, gzip_level, brotli_quality):
+    if response.direct_passthrough or response.is_streamed \
+      or response.status_code != 200 \
+      or "Content-Encoding" in response.headers \
+      or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add("Accept-Encoding")
+    if response.content_length is not None and response.content_length < min_size:
+        return response
+
+    accept = request.accept_encodings
+    if brotli and accept["br"]:
+        coding = "br"
+    elif accept["gzip"]:
+        coding = "gzip"
+    else:
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    with timed("compress"):
+        if coding == "br":
+            data = brotli.compress(data, quality=brotli_quality)
+        else:
+            data = gzip.compress(data, compresslevel=gzip_level)
+    response.set_data(data)
+    response.headers["Content-Encoding"] = coding
+    (etag, weak) = response.get_etag()
+    if etag:
+        response.set_etag("%s-%s" % (etag, coding), weak)
+    return response
+
+def init_compression(app):
+    """
+    Compresses JSON (and other text) responses of at least COMPRESS_MIN_SIZE
+    bytes, with brotli if it is installed and the client accepts it, else
+    with gzip.  File contents (sent with direct_passthrough) are left alone.
+    """
+    if not app.config.get("COMPRESS_ENABLED"):
+        return
+    config = (app.config.get("COMPRESS_MIN_SIZE", 1024),
+              app.config.get("COMPRESS_GZIP_LEVEL", 6),
+              app.config.get("COMPRESS_BROTLI_QUALITY", 5))
+
+    @app.after_request
+    def compress_response(response):
+        return _compress(response, *config)
+
+    LOG.info("response compression enabled (%s)",
+             "brotli, gzip" if brotli else "gzip")
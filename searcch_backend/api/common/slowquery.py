@@ -0,0 +1,191 @@
+
+import collections
+import datetime
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+import sqlalchemy
+from flask import has_request_context, request
+
+LOG = logging.getLogger(__name__)
+
+# Parameters whose names match this are redacted whatever their type.
+SENSITIVE_PARAM_RE = re.compile(
+    r"token|passw|secret|key|email|sso|auth", re.IGNORECASE)
+# SELECTs that EXPLAIN ANALYZE would not run harmlessly, even in a
+# savepoint: they consume sequence values, take row locks, or take advisory
+# locks.  These are explained without ANALYZE.
+SIDE_EFFECT_RE = re.compile(
+    r"\bnextval\s*\(|\bsetval\s*\(|\bfor\s+(no\s+key\s+)?update\b"
+    r"|\bfor\s+(key\s+)?share\b|\bpg_\w*advisory\w*\s*\(",
+    re.IGNORECASE)
+MAX_STATEMENT_LENGTH = 10000
+
+def redact_value(name, v):
+    """
+    Keeps numbers, booleans and NULLs (ids, limits, offsets), which are
+    usually what explains a plan; replaces anything else, and any value of a
+    sensitive-looking parameter, by its type and length.
+    """
+    if v is None or isinstance(v, bool):
+        return v
+    if isinstance(v, (int, float)) and not (name and SENSITIVE_PARAM_RE.search(name)):
+        return v
+    try:
+        return "<%s:%d>" % (type(v).__name__, len(v))
+    except TypeError:
+        return "<%s>" % (type(v).__name__,)
+
+def redact_parameters(parameters):
+    if isinstance(parameters, dict):
+        return dict((k, redact_value(k, v)) for (k, v) in parameters.items())
+    if isinstance(parameters, (list, tuple)):
+        return [ redact_value(None, v) for v in parameters ]
+    return redact_value(None, parameters)
+
+class SlowQueryRecorder(object):
+    """
+    Records statements that take longer than `threshold` seconds: their
+    SQL, redacted parameters, duration, and originating endpoint, and, for
+    a sampled fraction (`explain_rate`) of slow SELECTs, their
+    EXPLAIN (ANALYZE, BUFFERS) plan (or, for SELECTs with side effects,
+    their EXPLAIN plan).  Keeps the last `size` records in
+    memory (per process), and appends each to `path` as a JSON line, if
+    given.
+    """
+
+    def __init__(self, threshold, explain_rate=0.0, explain_timeout=10.0,
+                 size=200, path=None):
+        self.threshold = threshold
+        self.explain_rate = explain_rate
+        self.explain_timeout = explain_timeout
+        self.path = path
+        self.records = collections.deque(maxlen=size)
+        self.lock = threading.Lock()
+        self.count = 0
+
+    # The start time is kept on the execution context, which is per
+    # statement, so that nothing is left behind when a statement fails.
+    def before_cursor_execute(self, conn, cursor, statement, parameters,
+                              context, executemany):
+        if context is not None:
+            context._slow_query_start = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters,
+                             context, executemany):
+        start = getattr(context, "_slow_query_start", None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        if duration < self.threshold:
+            return
+        try:
+            self.record(conn, cursor, statement, parameters, context,
+                        executemany, duration)
+        except Exception:
+            LOG.exception("failed to record slow query")
+
+    def explain(self, cursor, statement, parameters, analyze=True):
+        """
+        Runs EXPLAIN (ANALYZE, BUFFERS), or, unless `analyze`, a plain
+        EXPLAIN, in a savepoint on the statement's connection, so that it
+        sees what the statement saw, and so that neither its
+        statement_timeout nor its failure outlives it.
+        """
+        cur = cursor.connection.cursor()
+        try:
+            cur.execute("savepoint slow_query_explain")
+            try:
+                cur.execute("set local statement_timeout = %d" % (
+                    int(self.explain_timeout * 1000),))
+                cur.execute(
+                    ("explain (analyze, buffers) " if analyze else "explain ")
+                    + statement, parameters)
+                return "\n".join(row[0] for row in cur.fetchall())
+            except Exception as ex:
+                return "explain failed: %s" % (str(ex).strip(),)
+            finally:
+                cur.execute("rollback to savepoint slow_query_explain")
+                cur.execute("release savepoint slow_query_explain")
+        finally:
+            cur.close()
+
+    def should_explain(self, statement, context, executemany):
+        if executemany or self.explain_rate <= 0:
+            return False
+        if context is not None and context.execution_options.get("stream_results"):
+            return False
+        if not statement.lstrip().lower().startswith("select"):
+            return False
+        return self.explain_rate >= 1 or random.random() < self.explain_rate
+
+    def record(self, conn, cursor, statement, parameters, context, executemany,
+               duration):
+        record = collections.OrderedDict([
+            ("time", datetime.datetime.now().isoformat()),
+            ("ms", round(duration * 1000, 2)), ("pid", os.getpid()),
+            ("endpoint", None), ("method", None), ("path", None),
+            ("statement", statement[:MAX_STATEMENT_LENGTH]),
+            ("executemany", len(parameters) if executemany else None),
+            ("parameters", redact_parameters(
+                parameters[0] if executemany and parameters else parameters)),
+            ("explain", None) ])
+        if has_request_context():
+            record["endpoint"] = request.endpoint
+            record["method"] = request.method
+            record["path"] = request.path
+        if self.should_explain(statement, context, executemany):
+            record["explain"] = self.explain(
+                cursor, statement, parameters,
+                analyze=not SIDE_EFFECT_RE.search(statement))
+        LOG.warning("slow query (%.1f ms, endpoint %s): %s",
+                    record["ms"], record["endpoint"], statement[:200])
+        with self.lock:
+            self.count += 1
+            self.records.append(record)
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+
+    def get_records(self, limit=None, endpoint=None):
+        """
+        Returns this process's records, newest first.
+        """
+        with self.lock:
+            records = list(reversed(self.records))
+        if endpoint:
+            records = [ r for r in records if r["endpoint"] == endpoint ]
+        if limit:
+            records = records[:limit]
+        return records
+
+    def clear(self):
+        with self.lock:
+            self.records.clear()
+
+slow_query_recorder = None
+
+def init_slow_query_log(app, engine):
+    """
+    Records slow statements on `engine`, if SLOW_QUERY_ENABLED.
+    """
+    global slow_query_recorder
+    if not app.config.get("SLOW_QUERY_ENABLED"):
+        return
+    slow_query_recorder = SlowQueryRecorder(
+        app.config.get("SLOW_QUERY_THRESHOLD_MS", 500) / 1000.0,
+        explain_rate=app.config.get("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 0.0),
+        explain_timeout=app.config.get("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", 10000) / 1000.0,
+        size=app.config.get("SLOW_QUERY_LOG_SIZE", 200),
+        path=app.config.get("SLOW_QUERY_LOG_FILE"))
+    sqlalchemy.event.listen(
+        engine, "before_cursor_execute", slow_query_recorder.before_cursor_execute)
+    sqlalchemy.event.listen(
+        engine, "after_cursor_execute", slow_query_recorder.after_cursor_execute)
+    LOG.info("slow query log enabled (threshold %d ms)",
+             app.config.get("SLOW_QUERY_THRESHOLD_MS", 500))
@@ -31,15 +31,94 @@ def get_primary_key_for_class(model_class):
             return k
     return None
 
-def artifact_diff(session, curator, artifact, obj1, obj2, update=True, path=""):
+def estimate_query_count(session, query):
+    """
+    Returns the planner's row estimate for the given query, from EXPLAIN.
+    This is far cheaper than a COUNT(*) over a multi-join query, but it is
+    only an estimate, and only as good as the table statistics.
+    """
+    conn = session.connection()
+    compiled = query.statement.compile(dialect=conn.dialect)
+    plan = conn.execute(
+        "EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+def _json_value(v):
+    if isinstance(v,bytes):
+        return v.decode('utf-8')
+    if not isinstance(v,jsontypes):
+        return str(v)
+    return v
+
+class ArtifactDiff(object):
+    """
+    The changes between an artifact and a modified copy of it.  `ops` are
+    the changes as JSON-serializable curation ops; apply() makes them to the
+    original.  Computing a diff modifies neither object, nor the session.
+    """
+
+    def __init__(self):
+        self.ops = []
+        self.changes = []
+
+    def __len__(self):
+        return len(self.ops)
+
+    def set(self,path,obj,k,value):
+        self.ops.append(
+            { "path": path,"obj": obj.__class__.__name__,"op": "set",
+              "data": { "field": k,"value": _json_value(value) } })
+        self.changes.append(("set",obj,k,value,None,None))
+
+    def delete(self,path,obj,k,x,uselist,delete_referenced):
+        self.ops.append(
+            { "path": path,"obj": x.__class__.__name__,"op": "del",
+              "data": { "field": k,"value": object_to_json(x) } })
+        self.changes.append(("del",obj,k,x,uselist,delete_referenced))
+
+    def add(self,path,obj,k,x,uselist):
+        self.ops.append(
+            { "path": path,"obj": x.__class__.__name__,"op": "add",
+              "data": { "field": k,"value": object_to_json(x) } })
+        self.changes.append(("add",obj,k,x,uselist,None))
+
+    def apply(self,session):
+        for (op,obj,k,x,uselist,delete_referenced) in self.changes:
+            if op == "set":
+                setattr(obj,k,x)
+            elif op == "del":
+                if delete_referenced:
+                    LOG.debug("deleting referenced object %r",x)
+                    session.delete(x)
+                if not uselist:
+                    setattr(obj,k,None)
+                else:
+                    getattr(obj,k).remove(x)
+            else:
+                if not uselist:
+                    setattr(obj,k,x)
+                else:
+                    getattr(obj,k).append(x)
+
+def artifact_diff(session,artifact,obj1,obj2):
+    """
+    Returns an ArtifactDiff of the changes from `obj1`, an artifact (or one
+    of its objects) to `obj2`, its modified copy.
+    """
     if not isinstance(artifact,model.Artifact):
         raise TypeError("artifact is not an Artifact")
+    diff = ArtifactDiff()
+    _diff_objects(diff,obj1,obj2,"")
+    return diff
+
+def _diff_objects(diff,obj1,obj2,path):
     if type(obj1) != type(obj2):
         raise TypeError("object type mismatch (%r,%r)" % (type(obj1),type(obj2)))
     if not isinstance(obj1,db.Model):
         raise TypeError("object not part of the model")
 
-    curations = []
     obj_class = obj1.__class__
 
     #
@@ -47,11 +126,7 @@ def artifact_diff(session, curator, artifact, obj1, obj2, update=True, path=""):
     # `session.refresh` is triggered, sqlalchemy will fail to load the object.
     # This is a useful canary-in-the-coal-mine for now.
     #
-    try:
-        LOG.debug("diffing class %r and class %r" % (obj1.__class__.__name__,obj2.__class__.__name__))
-    except:
-        pass
-    LOG.debug("diffing %r and %r" % (repr(obj1),repr(obj2)))
+    LOG.debug("diffing class %r (%r)",obj_class.__name__,path)
 
     # Diff the non-primary and non-foreign-key fields.
     user_ro_fields = getattr(obj_class,"__user_ro_fields__",{})
@@ -73,17 +148,7 @@ def artifact_diff(session, curator, artifact, obj1, obj2, update=True, path=""):
             if k in user_ro_fields:
                 raise ValueError("not allowed to modify field %s" % (k,))
             LOG.debug("field %s diff: '%r' != '%r'" % (k,repr(obj1_val),repr(obj2_val)))
-            curation = model.ArtifactCuration(
-                artifact_id=artifact.id,time=datetime.datetime.now(),
-                opdata=json.dumps(
-                    { "path": path,
-                      "obj": obj_class.__name__,
-                      "op": "set",
-                      "data": { "field": k, "value": obj2_val } }),
-                curator_id=curator.id)
-            curations.append(curation)
-            if update:
-                setattr(obj1,k,obj2_val)
+            diff.set(path,obj1,k,obj2_val)
 
     # Diff relationships.  We match on primary key (nearly always ID in our
     # schema).  If the primary_key does not exist, this is a new object that is
@@ -99,14 +164,6 @@ def artifact_diff(session, curator, artifact, obj1, obj2, update=True, path=""):
         if len(relprop.local_columns) > 1:
             raise TypeError("cannot handle relationship with multiple foreign keys")
 
-        (lcc,) = relprop.local_columns
-
-        if False and lcc.foreign_keys:
-            # This is a relationship through a foreign key we store in this
-            # table, into another table.  We don't allow editing of these keys,
-            # so skip it.
-            continue
-
         # We must delete referenced objects if we cannot nullify their foreign
         # keys into this object.
         delete_referenced_objects = False
@@ -115,154 +172,130 @@ def artifact_diff(session, curator, artifact, obj1, obj2, update=True, path=""):
                 # If the foreign key is not nullable, AND
                 # If it points into obj_class's table
                 if not rsk.nullable and obj_class.__mapper__.local_table.name == fk.column.table.fullname:
-                    LOG.debug("dro: %r %r %r" % (rsk,obj_class.__mapper__.local_table.name,fk.column.table.fullname))
                     delete_referenced_objects = True
                     break
 
-        # Otherwise, this is a relationship into another table via a key in our
-        # table, probably our primary key.  We check via primary key of the
-        # item(s) if any have been removed, added, or modified.  In particular,
-        # we want to see if the objects in obj2[k] are in obj1[k], and
-        # if so, if they differ... etc.
-        deletes = []
-        adds = []
+        # This is a relationship into another table via a key in our table,
+        # probably our primary key.  We check via primary key of the item(s)
+        # if any have been removed, added, or modified.  Handle both
+        # one-to-one and one-to-many relations the same way.
         obj1_rval = getattr(obj1,k)
         obj2_rval = getattr(obj2,k)
-
-        # Handle both one-to-one and one-to-many relations in the same code
-        # below.
         if not relprop.uselist:
-            if obj1_rval:
-                obj1_rval = [ obj1_rval ]
-            else:
-                obj1_rval = []
-            if obj2_rval:
-                obj2_rval = [ obj2_rval ]
-            else:
-                obj2_rval = []
+            obj1_rval = [ obj1_rval ] if obj1_rval else []
+            obj2_rval = [ obj2_rval ] if obj2_rval else []
 
         foreign_class = relprop.argument()
         foreign_primary_key = get_primary_key_for_class(foreign_class)
-        obj1_rval_pk_map = {}
-        obj2_rval_pk_map = {}
+        allow_pk = getattr(foreign_class,"__object_from_json_allow_pk__",False)
 
-        # Construct maps for easy assessment of addition/deletion.
-        for i in range(0,len(obj1_rval)):
-            x = obj1_rval[i]
+        # Map both sides by primary key; objects in obj2 without one are new.
+        obj1_rval_pk_map = {}
+        for x in obj1_rval:
             val = getattr(x,foreign_primary_key,None)
-            if val is not None:
-                obj1_rval_pk_map[val] = (i,x)
-            else:
+            if val is None:
                 raise ValueError("original object relation pkey values must not be None (class %r, relation %r)"
                                  % (obj_class.__name__,k))
-        # Setup modified map; journal additions.
-        for i in range(0,len(obj2_rval)):
-            x = obj2_rval[i]
-            val = None
-            #if x in session:
-            #try:
-            try:
-                LOG.debug("foo: %r",x.person)
-            except:
-                pass
-            LOG.debug("trying to read %s.%s",x.__class__.__name__,foreign_primary_key)
+            obj1_rval_pk_map[val] = x
+        obj2_rval_pk_map = {}
+        adds = []
+        for x in obj2_rval:
             val = getattr(x,foreign_primary_key,None)
-            #except:
-            #    LOG.debug("would have been an exception (%r/%r)",path,k)
-            #    LOG.exception(sys.exc_info()[1])
-            if val is not None:
-                if val not in obj1_rval_pk_map:
-                    if not getattr(foreign_class,"__object_from_json_allow_pk__",False):
-                        raise ValueError("cannot set primary key to value not present in original object")
-                    LOG.debug("adding relation %r",k)
-                    #session.add(x)
-                    #LOG.debug("added relation %r item: %r" % (k,x))
-                    adds.append(x)
-                obj2_rval_pk_map[val] = (i,x)
-            else:
-                LOG.debug("adding relation %r",k)
-                #session.add(x)
-                #LOG.debug("added relation %r item: %r" % (k,x))
+            if val is None:
+                adds.append(x)
+                continue
+            if val not in obj1_rval_pk_map:
+                if not allow_pk:
+                    raise ValueError("cannot set primary key to value not present in original object")
                 adds.append(x)
-        # Look for deletions.
-        for (o1k,o1v) in obj1_rval_pk_map.items():
-            if not o1k in obj2_rval_pk_map:
-                LOG.debug("deleted relation %r item: %r" % (o1k,o1v,))
-                deletes.append(o1v)
+            obj2_rval_pk_map[val] = x
 
         LOG.debug("%r/%r orig (%r) new (%r)",path,k,
-                  list(obj1_rval_pk_map.keys()),
-                  list(obj2_rval_pk_map.keys()))
-
-        # Trawl for possible modifications.
-        for (o1k,(o1i,o1v)) in obj1_rval_pk_map.items():
-            if not o1k in obj2_rval_pk_map:
-                # NB: this just happens because we don't modify the maps as we
-                # journal additions/deletions; so ignore.
-                continue
-            # Finally, recurse:
-            (o2i,o2v) = obj2_rval_pk_map[o1k]
-            rcurations = artifact_diff(session,curator,artifact,o1v,o2v,update=update,path=path+"."+k)
-            if rcurations:
-                curations.extend(rcurations)
-
-        # Make the add/deletes live.
-        deletes.reverse()
-        if deletes and delete_referenced_objects:
-            LOG.debug("will delete referenced objects of relation %s.%s",obj_class.__name__,k)
-
-        for (i,x) in deletes:
-            acj = json.dumps(
-                { "obj": foreign_class.__name__,"op": "del",
-                "data":{ "field":k,"value": object_to_json(x) } },
-                separators=(',',':'))
-            ac = model.ArtifactCuration(
-                artifact_id=artifact.id,time=datetime.datetime.now(),
-                opdata=acj,curator_id=curator.id)
-            curations.append(ac)
-            if delete_referenced_objects:
-                LOG.debug("deleting referenced object %r",x)
-                session.delete(x)
-            if not relprop.uselist:
-                setattr(obj1,k,None)
+                  list(obj1_rval_pk_map.keys()),list(obj2_rval_pk_map.keys()))
+
+        # Recurse into the objects in both; journal deletions.
+        for (val,x) in obj1_rval_pk_map.items():
+            if val in obj2_rval_pk_map:
+                _diff_objects(diff,x,obj2_rval_pk_map[val],path + "." + k)
             else:
-                del getattr(obj1,k)[i]
+                LOG.debug("deleted relation %r item: %r",k,val)
+                diff.delete(path,obj1,k,x,relprop.uselist,delete_referenced_objects)
         for x in adds:
-            acj = json.dumps(
-                { "obj": foreign_class.__name__,"op": "add",
-                  "data":{ "field":k,"value": object_to_json(x) } },
-                separators=(',',':'))
-            ac = model.ArtifactCuration(
-                artifact_id=artifact.id,time=datetime.datetime.now(),
-                opdata=acj,curator_id=curator.id)
-            curations.append(ac)
-            if not relprop.uselist:
-                setattr(obj1,k,x)
-            else:
-                getattr(obj1,k).append(x)
-            LOG.debug("added relation %r item: %r" % (k,x))
+            LOG.debug("added relation %r item: %r",k,x)
+            diff.add(path,obj1,k,x,relprop.uselist)
 
-    return curations
-
-def object_from_json(session,obj_class,j,skip_primary_keys=True,error_on_primary_key=False,
-                     allow_fk=False,enable_cache=True,
-                     should_query=True,obj_cache=None,obj_cache_dicts=None):
+def record_artifact_diff(session,curator,artifact,diff,time=None):
     """
-    This function provides hierarchical construction of sqlalchemy objects from JSON.  It handles regular fields and handles recursion ("hierarchy") through relationships.  We use the term hierarchy in the sense that an Artifact may have one or more curations associated with it; so perhaps, less a hierarchy than a tree; but we represent the relationships as children in JSON.  If such "children" have an existing match in the DB, we link those objects directly in (NB: this needs to change to handle permissions or places where we don't want to create a link to existing objects, because the owner needs to ack, or whatever).
+    Records `diff` as a single curation whose opdata is a "batch" op
+    containing all of the diff's ops, encoded once, with one bulk insert.
     """
-    obj_kwargs = dict()
-
-    if enable_cache:
-        if obj_cache is None:
-            obj_cache = []
-        if obj_cache_dicts is None:
-            obj_cache_dicts = []
+    if not diff.ops:
+        return
+    opdata = json.dumps({ "op": "batch","ops": diff.ops },separators=(',',':'))
+    session.bulk_insert_mappings(
+        model.ArtifactCuration,
+        [ dict(artifact_id=artifact.id,time=time or datetime.datetime.now(),
+               opdata=opdata,curator_id=curator.id) ])
 
-    if j == None:
-        LOG.debug("object_from_json: null: %r <- %r" % (obj_class,j))
+def delete_artifacts(session,artifact_ids):
+    """
+    Deletes artifacts and every row that belongs to them, with one
+    set-based DELETE per table, in dependency order, instead of loading and
+    deleting each row through the session.  Relationships from other
+    artifacts to these are deleted too, and other artifacts' parent links
+    to them are cleared.  Other artifacts that list these among their
+    recommended neighbors lose their recommendation state, so that the
+    recommender's next refresh recomputes their lists.  artifact_stats,
+    artifact_search_view, and the rest of the recommender's rows go by ON
+    DELETE CASCADE.  Does not commit; objects already in the session are
+    stale afterwards.
+    """
+    ids = list(artifact_ids)
+    if not ids:
         return
-    else:
-        LOG.debug("object_from_json: %r <- %r" % (obj_class,j))
+    M = model
+    imports = sqlalchemy.select([M.ArtifactImport.id])\
+      .where(M.ArtifactImport.artifact_id.in_(ids))
+    files = sqlalchemy.select([M.ArtifactFile.id])\
+      .where(M.ArtifactFile.artifact_id.in_(ids))
+    listed_by = sqlalchemy.select([M.ArtifactNeighbor.artifact_id])\
+      .where(M.ArtifactNeighbor.neighbor_id.in_(ids))
+    stmts = [
+        M.ArtifactRecommendationState.__table__.delete()\
+          .where(M.ArtifactRecommendationState.artifact_id.in_(listed_by)),
+        M.ArtifactNeighbor.__table__.delete().where(sqlalchemy.or_(
+            M.ArtifactNeighbor.artifact_id.in_(ids),
+            M.ArtifactNeighbor.neighbor_id.in_(ids))),
+        M.ImporterSchedule.__table__.delete()\
+          .where(M.ImporterSchedule.artifact_import_id.in_(imports)),
+        M.ArtifactImport.__table__.delete()\
+          .where(M.ArtifactImport.artifact_id.in_(ids)),
+        M.ArtifactFileMember.__table__.delete()\
+          .where(M.ArtifactFileMember.parent_file_id.in_(files)),
+    ]
+    for c in (M.ArtifactFile, M.ArtifactFunding, M.ArtifactMetadata,
+              M.ArtifactPublication, M.ArtifactTag, M.ArtifactCuration,
+              M.ArtifactAffiliation, M.ArtifactRelease, M.ArtifactBadge,
+              M.ArtifactRatings, M.ArtifactReviews, M.ArtifactFavorites):
+        stmts.append(c.__table__.delete().where(c.artifact_id.in_(ids)))
+    stmts.extend([
+        M.ArtifactRelationship.__table__.delete().where(sqlalchemy.or_(
+            M.ArtifactRelationship.artifact_id.in_(ids),
+            M.ArtifactRelationship.related_artifact_id.in_(ids))),
+        M.Artifact.__table__.update()\
+          .where(M.Artifact.parent_id.in_(ids)).values(parent_id=None),
+        M.Artifact.__table__.delete().where(M.Artifact.id.in_(ids)),
+    ])
+    for stmt in stmts:
+        session.execute(stmt)
+
+def _column_kwargs(obj_class,j,skip_primary_keys=True,error_on_primary_key=False,
+                   allow_fk=False):
+    """
+    Validates (and converts, in place) the column fields of `j` for
+    `obj_class`, and returns them as constructor kwargs.
+    """
+    obj_kwargs = dict()
 
     for k in obj_class.__mapper__.column_attrs.keys():
         colprop = getattr(obj_class,k).property.columns[0]
@@ -329,6 +362,244 @@ def object_from_json(session,obj_class,j,skip_primary_keys=True,error_on_primary
         # Appears valid as far as we can tell.
         obj_kwargs[k] = j[k]
 
+    return obj_kwargs
+
+def _normalize_key_value(v):
+    if isinstance(v,memoryview):
+        return bytes(v)
+    return v
+
+def _sorted_key_items(d):
+    return tuple(sorted(d.items(),key=lambda x: x[0]))
+
+def _canonical_json(v):
+    if isinstance(v,dict):
+        return tuple(sorted([ (k,_canonical_json(x)) for (k,x) in v.items() ],
+                            key=lambda x: x[0]))
+    if isinstance(v,list):
+        return ("[]",) + tuple([ _canonical_json(x) for x in v ])
+    return v
+
+def json_key(obj_class,j):
+    """
+    Returns a hashable key for an `obj_class` JSON document: equal documents
+    have equal keys.
+    """
+    return (obj_class,"json",_canonical_json(j))
+
+def lookup_key(obj_class,obj_kwargs):
+    """
+    Returns a hashable key for the object object_from_json() would look up
+    (or construct) from `obj_kwargs`: its class, and the values of its
+    columns and references, with persistent references by ID and new ones by
+    identity.  Returns None if such an object would never be looked up.
+    """
+    items = {}
+    for (k,v) in obj_kwargs.items():
+        if isinstance(v,list):
+            return None
+        if k in obj_class.__mapper__.relationships:
+            (lcc,) = getattr(obj_class,k).property.local_columns
+            if v is None:
+                items[lcc.name] = None
+                continue
+            state = sqlalchemy.inspect(v)
+            if state.persistent:
+                fk = next(iter(lcc.foreign_keys))
+                items[lcc.name] = getattr(v,fk.column.name)
+            else:
+                items[lcc.name] = ("new",id(v))
+        else:
+            items[k] = _normalize_key_value(v)
+    return (obj_class,_sorted_key_items(items))
+
+class NaturalKeyResolver(object):
+    """
+    Resolves the references to shared, many-to-one objects (Person,
+    Organization, Affiliation, License, Badge, ...) in a batch of JSON
+    documents with one query per class and key shape, instead of the one
+    query per reference that object_from_json() would make on its own.  It
+    also shares the objects it resolves, or that object_from_json() creates,
+    across every document in the batch, so that a new Person referenced by
+    two artifacts is only inserted once.
+
+    Use it by calling collect() on each document, then resolve(), then
+    passing it to object_from_json() for each document.  The options must
+    match those passed to object_from_json().
+    """
+    CHUNK_SIZE = 500
+
+    def __init__(self,session,skip_primary_keys=True,error_on_primary_key=False,
+                 allow_fk=False):
+        self.session = session
+        self.skip_primary_keys = skip_primary_keys
+        self.error_on_primary_key = error_on_primary_key
+        self.allow_fk = allow_fk
+        # lookup_key() -> resolved (persistent) or newly-created object.  This
+        # is also object_from_json()'s cache for the whole batch.
+        self.objects = {}
+        # Lookup keys known not to exist in the DB.
+        self.misses = set()
+        # Depth -> list of (obj_class,j,column kwargs,references).
+        self.pending = {}
+        # id(j) -> depth (None if not resolvable in batch), and lookup key.
+        self.depths = {}
+        self.keys = {}
+        self.queries = 0
+
+    def collect(self,obj_class,j):
+        """
+        Collects the references in `j`, an `obj_class` document.
+        """
+        if not isinstance(j,dict):
+            return
+        for k in obj_class.__mapper__.relationships.keys():
+            relprop = getattr(obj_class,k).property
+            if relprop.backref or k not in j or len(relprop.local_columns) != 1:
+                continue
+            (lcc,) = relprop.local_columns
+            foreign_class = relprop.argument()
+            if lcc.foreign_keys:
+                self._collect_reference(foreign_class,j[k])
+            elif relprop.uselist and isinstance(j[k],list):
+                for x in j[k]:
+                    self.collect(foreign_class,x)
+            else:
+                self.collect(foreign_class,j[k])
+
+    def _collect_reference(self,obj_class,j):
+        if not isinstance(j,dict) or id(j) in self.depths:
+            return
+        self.depths[id(j)] = None
+        self.collect(obj_class,j)
+
+        # object_from_json() never looks up objects with list relations.
+        for k in obj_class.__mapper__.relationships.keys():
+            relprop = getattr(obj_class,k).property
+            if relprop.uselist and not relprop.backref:
+                return
+        try:
+            kwargs = _column_kwargs(
+                obj_class,j,skip_primary_keys=self.skip_primary_keys,
+                error_on_primary_key=self.error_on_primary_key,
+                allow_fk=self.allow_fk)
+        except (ValueError,TypeError):
+            # object_from_json() will report this.
+            return
+        refs = {}
+        depth = 0
+        for k in obj_class.__mapper__.relationships.keys():
+            relprop = getattr(obj_class,k).property
+            if relprop.backref or k not in j:
+                continue
+            (lcc,) = relprop.local_columns
+            child_depth = None
+            if lcc.foreign_keys and j[k] is not None:
+                child_depth = self.depths.get(id(j[k]))
+            if child_depth is None:
+                return
+            fk = next(iter(lcc.foreign_keys))
+            refs[lcc.name] = (j[k],fk.column.name)
+            depth = max(depth,child_depth + 1)
+        if not kwargs and not refs:
+            return
+        self.depths[id(j)] = depth
+        self.pending.setdefault(depth,[]).append((obj_class,j,kwargs,refs))
+
+    def resolve(self):
+        """
+        Looks up all collected references, one query per class and key
+        shape.  References with no references of their own go first, so
+        that the keys of the objects referring to them can include their IDs.
+        """
+        for depth in sorted(self.pending):
+            groups = {}
+            for (obj_class,j,kwargs,refs) in self.pending[depth]:
+                values = dict()
+                for (k,v) in kwargs.items():
+                    values[k] = _normalize_key_value(v)
+                new_ref = False
+                for (colname,(child,remote_colname)) in refs.items():
+                    obj = self.objects.get(self.keys.get(id(child)))
+                    if obj is None:
+                        new_ref = True
+                        break
+                    values[colname] = getattr(obj,remote_colname)
+                # If a reference is new, so is this object, and there is
+                # nothing to look up.
+                if new_ref:
+                    continue
+                key = (obj_class,_sorted_key_items(values))
+                self.keys[id(j)] = key
+                if key in self.objects or key in self.misses:
+                    continue
+                if None in [ x[1] for x in key[1] ]:
+                    continue
+                names = tuple([ x[0] for x in key[1] ])
+                group = groups.setdefault((obj_class,names),{})
+                group[tuple([ x[1] for x in key[1] ])] = key
+            for ((obj_class,names),keys) in groups.items():
+                self._query(obj_class,names,keys)
+        self.pending = {}
+
+    def _query(self,obj_class,names,keys):
+        cols = [ getattr(obj_class,n) for n in names ]
+        values = list(keys.keys())
+        for i in range(0,len(values),self.CHUNK_SIZE):
+            chunk = values[i:i+self.CHUNK_SIZE]
+            if len(cols) == 1:
+                cond = cols[0].in_([ v[0] for v in chunk ])
+            else:
+                cond = sqlalchemy.tuple_(*cols).in_(chunk)
+            self.queries += 1
+            for row in self.session.query(obj_class).filter(cond):
+                v = tuple([ _normalize_key_value(getattr(row,n)) for n in names ])
+                key = keys.get(v)
+                if key is not None and key not in self.objects:
+                    self.objects[key] = row
+        found = 0
+        for key in keys.values():
+            if key in self.objects:
+                found += 1
+            else:
+                self.misses.add(key)
+        LOG.debug("resolved %d %s references (%d found)",
+                  len(keys),obj_class.__name__,found)
+
+def object_from_json(session,obj_class,j,skip_primary_keys=True,error_on_primary_key=False,
+                     allow_fk=False,enable_cache=True,
+                     should_query=True,obj_cache=None,resolver=None,resolve=False):
+    """
+    This function provides hierarchical construction of sqlalchemy objects from JSON.  It handles regular fields and handles recursion ("hierarchy") through relationships.  We use the term hierarchy in the sense that an Artifact may have one or more curations associated with it; so perhaps, less a hierarchy than a tree; but we represent the relationships as children in JSON.  If such "children" have an existing match in the DB, we link those objects directly in (NB: this needs to change to handle permissions or places where we don't want to create a link to existing objects, because the owner needs to ack, or whatever).
+
+    If `enable_cache`, every reference is cached in `obj_cache`, a dict shared by the whole object graph, under both the json_key() of its document and the lookup_key() of the object built from it.  So identical references are built and looked up once, and share one object.  If `resolver` (a NaturalKeyResolver) is given, its objects are the cache, and it knows which references do not exist.
+
+    If `resolve`, construction is two-phase: every reference in `j` is first collected and resolved by a new NaturalKeyResolver, with one query per class and key shape, and the tree is then built from the resolved references.  This makes the number of queries proportional to the number of referenced classes, rather than to the number of references.
+    """
+    obj_kwargs = dict()
+
+    if resolve and resolver is None and j is not None:
+        resolver = NaturalKeyResolver(
+            session,skip_primary_keys=skip_primary_keys,
+            error_on_primary_key=error_on_primary_key,allow_fk=allow_fk)
+        resolver.collect(obj_class,j)
+        resolver.resolve()
+
+    if resolver is not None:
+        obj_cache = resolver.objects
+    elif enable_cache and obj_cache is None:
+        obj_cache = dict()
+
+    if j == None:
+        LOG.debug("object_from_json: null: %r <- %r",obj_class,j)
+        return
+    else:
+        LOG.debug("object_from_json: %r <- %r",obj_class,j)
+
+    obj_kwargs.update(_column_kwargs(
+        obj_class,j,skip_primary_keys=skip_primary_keys,
+        error_on_primary_key=error_on_primary_key,allow_fk=allow_fk))
+
     for k in obj_class.__mapper__.relationships.keys():
         relprop = getattr(obj_class,k).property
         if relprop.backref:
@@ -360,24 +631,23 @@ def object_from_json(session,obj_class,j,skip_primary_keys=True,error_on_primary
                 # Then we need to look for existing objects that match this
                 # one, and reference them if they exist.  We look in our cache
                 # and in the session.
-                if obj_cache and obj_cache_dicts:
-                    try:
-                        cached = obj_cache_dicts.index(j[k])
-                        obj_kwargs[k] = obj_cache[cached]
+                foreign_class = relprop.argument()
+                ref_key = None
+                if obj_cache is not None and isinstance(j[k],dict):
+                    # Key before recursing, which converts values in place.
+                    ref_key = json_key(foreign_class,j[k])
+                    if ref_key in obj_cache:
+                        obj_kwargs[k] = obj_cache[ref_key]
                         LOG.debug("object_from_json(cache-hit,%r)",j[k])
                         continue
-                    except:
-                        pass
-                foreign_class = relprop.argument()
                 next_obj = object_from_json(
                     session,foreign_class,j[k],skip_primary_keys=skip_primary_keys,
                     error_on_primary_key=error_on_primary_key,should_query=True,
                     allow_fk=allow_fk,enable_cache=enable_cache,
-                    obj_cache=obj_cache,obj_cache_dicts=obj_cache_dicts)
+                    obj_cache=obj_cache,resolver=resolver)
                 obj_kwargs[k] = next_obj
-                if obj_cache:
-                    obj_cache.append(next_obj)
-                    obj_cache_dicts.append(j[k])
+                if ref_key is not None:
+                    obj_cache[ref_key] = next_obj
                 continue
         else:
             # This is a relationship into another table via a key in our
@@ -392,18 +662,19 @@ def object_from_json(session,obj_class,j,skip_primary_keys=True,error_on_primary
                     session,relprop.argument(),x,skip_primary_keys=skip_primary_keys,
                     error_on_primary_key=error_on_primary_key,should_query=False,
                     allow_fk=allow_fk,enable_cache=enable_cache,
-                    obj_cache=obj_cache,obj_cache_dicts=obj_cache_dicts)
+                    obj_cache=obj_cache,resolver=resolver)
                 obj_kwargs[k].append(next_obj)
         else:
             next_obj = object_from_json(
                 session,relprop.argument(),j[k],skip_primary_keys=skip_primary_keys,
                 error_on_primary_key=error_on_primary_key,should_query=False,
                 allow_fk=allow_fk,enable_cache=enable_cache,
-                obj_cache=obj_cache,obj_cache_dicts=obj_cache_dicts)
+                obj_cache=obj_cache,resolver=resolver)
             obj_kwargs[k] = next_obj
 
     # Query the DB iff all top-level obj_kwargs are basic types or persistent
     # objects, and if our parent told us we should query.
+    obj_key = None
     if should_query:
         can_query = True
         for kwa in list(obj_kwargs):
@@ -420,15 +691,23 @@ def object_from_json(session,obj_class,j,skip_primary_keys=True,error_on_primary
                 pass
             if not can_query:
                 break
+        if obj_cache is not None:
+            obj_key = lookup_key(obj_class,obj_kwargs)
+            if obj_key is not None:
+                hit = obj_cache.get(obj_key)
+                if hit is not None:
+                    LOG.debug("object_from_json(cache-hit): %r",hit.__class__.__name__)
+                    return hit
+                if resolver is not None and obj_key in resolver.misses:
+                    can_query = False
         if can_query:
             q = session.query(obj_class)
             for kwa in list(obj_kwargs):
                 q = q.filter(getattr(obj_class,kwa).__eq__(obj_kwargs[kwa]))
             qres = q.all()
             if qres:
-                if obj_cache:
-                    obj_cache.append(qres[0])
-                    obj_cache_dicts.append(j)
+                if obj_key is not None:
+                    obj_cache[obj_key] = qres[0]
                 if qres[0] in session:
                     LOG.debug("object_from_json(in=True,query): %r",qres[0])
                 else:
@@ -436,6 +715,8 @@ def object_from_json(session,obj_class,j,skip_primary_keys=True,error_on_primary
                 return qres[0]
 
     ret = obj_class(**obj_kwargs)
+    if obj_key is not None:
+        obj_cache[obj_key] = ret
     if ret in session:
         LOG.debug("object_from_json(in=True): %r",ret)
     else:
@@ -500,9 +781,11 @@ def conv_python_type_to_jsonschema(t):
     return "string"
 
 def class_to_jsonschema(kls,skip_pk=True,skip_fk=True,skip_relations=False,
-                        defs={},root=True):
+                        defs=None,root=True):
     #if not isinstance(o,db.Model):
     #    raise ValueError("object %r not an instance of our model.Base" % (o))
+    if defs is None:
+        defs = {}
     name = kls.__name__
     if name in defs:
         return
@@ -0,0 +1,82 @@
+
+import logging
+
+import sqlalchemy
+from sqlalchemy.dialects import postgresql
+
+from searcch_backend.models.model import ArtifactStats
+
+LOG = logging.getLogger(__name__)
+
+def update_artifact_stats(session, artifact_id, ratings=0, rating_sum=0,
+                          reviews=0, favorites=0):
+    """
+    Applies deltas to an artifact's artifact_stats row, creating it if
+    necessary.  This runs in the caller's transaction, so the aggregates
+    commit (or roll back) with the rating/review/favorite change itself.
+    The update is relative (col = col + delta), so concurrent writers to the
+    same artifact serialize on the row lock instead of losing updates.
+    """
+    table = ArtifactStats.__table__
+    session.execute(
+        postgresql.insert(table).values(artifact_id=artifact_id)\
+          .on_conflict_do_nothing(index_elements=[table.c.artifact_id]))
+    num_ratings = table.c.num_ratings + ratings
+    new_rating_sum = table.c.rating_sum + rating_sum
+    avg_rating = sqlalchemy.case(
+        [(num_ratings > 0,
+          sqlalchemy.cast(new_rating_sum, sqlalchemy.Float) / num_ratings)],
+        else_=None)
+    session.execute(
+        table.update().where(table.c.artifact_id == artifact_id).values(
+            num_ratings=num_ratings, rating_sum=new_rating_sum,
+            avg_rating=avg_rating,
+            num_reviews=table.c.num_reviews + reviews,
+            num_favorites=table.c.num_favorites + favorites))
+
+REBUILD_ARTIFACT_STATS_SQL = \
+    "insert into artifact_stats" \
+    "  (artifact_id, num_ratings, rating_sum, avg_rating, num_reviews, num_favorites)" \
+    " select A.id, coalesce(R.num_ratings, 0), coalesce(R.rating_sum, 0)," \
+    "   R.rating_sum::float / nullif(R.num_ratings, 0)," \
+    "   coalesce(V.num_reviews, 0), coalesce(F.num_favorites, 0)" \
+    " from artifacts A" \
+    " left join (" \
+    "   select artifact_id, count(id) as num_ratings, sum(rating) as rating_sum" \
+    "   from artifact_ratings group by artifact_id" \
+    " ) R on A.id = R.artifact_id" \
+    " left join (" \
+    "   select artifact_id, count(id) as num_reviews" \
+    "   from artifact_reviews group by artifact_id" \
+    " ) V on A.id = V.artifact_id" \
+    " left join (" \
+    "   select artifact_id, count(id) as num_favorites" \
+    "   from artifact_favorites group by artifact_id" \
+    " ) F on A.id = F.artifact_id" \
+    " on conflict (artifact_id) do update set" \
+    "   num_ratings = excluded.num_ratings, rating_sum = excluded.rating_sum," \
+    "   avg_rating = excluded.avg_rating, num_reviews = excluded.num_reviews," \
+    "   num_favorites = excluded.num_favorites" \
+    " where (artifact_stats.num_ratings, artifact_stats.rating_sum," \
+    "        artifact_stats.avg_rating, artifact_stats.num_reviews," \
+    "        artifact_stats.num_favorites)" \
+    "   is distinct from (excluded.num_ratings, excluded.rating_sum," \
+    "        excluded.avg_rating, excluded.num_reviews, excluded.num_favorites)"
+
+def rebuild_artifact_stats(session):
+    """
+    Rebuilds artifact_stats from the ratings, reviews, and favorites tables.
+    Rows are upserted, and only their aggregate columns rewritten (and only
+    if wrong), so each artifact keeps its generation, and with it its
+    clients' cached responses.  The table is locked for the duration so
+    that concurrent delta updates cannot interleave with the rebuild.
+    Returns the number of rows written or deleted; the caller commits.
+    """
+    session.execute("lock table artifact_stats in exclusive mode")
+    deleted = session.execute(
+        "delete from artifact_stats S where not exists"
+        " (select 1 from artifacts A where A.id = S.artifact_id)").rowcount
+    res = session.execute(REBUILD_ARTIFACT_STATS_SQL)
+    LOG.info("rebuilt artifact_stats (%d rows updated, %d deleted)",
+             res.rowcount, deleted)
+    return res.rowcount + deleted
@@ -0,0 +1,52 @@
+
+import logging
+
+import sqlalchemy
+from sqlalchemy import func, or_
+
+LOG = logging.getLogger(__name__)
+
+def escape_like(s, escape="\\"):
+    """
+    Escapes the LIKE wildcards in `s`, so that it matches literally.
+    """
+    return s.replace(escape, escape + escape)\
+      .replace("%", escape + "%").replace("_", escape + "_")
+
+def contains_filter(cols, s):
+    """
+    Returns a condition that is true if any of `cols` contains `s`,
+    case-insensitively.  With a gin_trgm_ops index on each column, Postgres
+    answers this from the indexes rather than by scanning the table.
+    """
+    pattern = "%" + escape_like(s) + "%"
+    return or_(*[ col.ilike(pattern, escape="\\") for col in cols ])
+
+def _similar(col, q, i):
+    # The pg_trgm % (similarity above pg_trgm.similarity_threshold)
+    # operator, which is index-assisted, unlike similarity() > x.  A text
+    # clause, because its percent sign must be escaped for the DBAPI.
+    name = "typeahead_q%d" % (i,)
+    col = col.expression
+    return sqlalchemy.text(
+        "%s.%s " % (col.table.name, col.name) + "% :" + name)\
+      .bindparams(**{ name: q })
+
+def typeahead(query, cols, q, limit=10):
+    """
+    Returns the top `limit` rows of `query` whose `cols` contain, or are
+    trigram-similar to, `q`, each with its best similarity score; most
+    similar first.
+    """
+    conds = [ contains_filter(cols, q) ]
+    scores = []
+    for (i, col) in enumerate(cols):
+        conds.append(_similar(col, q, i))
+        scores.append(func.coalesce(func.similarity(col, q), 0))
+    if len(scores) == 1:
+        score = scores[0]
+    else:
+        score = func.greatest(*scores)
+    score = score.label("score")
+    return query.add_columns(score).filter(or_(*conds))\
+      .order_by(score.desc(), *cols).limit(limit).all()
@@ -1,8 +1,15 @@
 # logic for /artifacts
 
-from searcch_backend.api.app import db, config_name
-from searcch_backend.api.common.sql import (object_from_json, artifact_diff)
+from searcch_backend.api.app import app, db, config_name
+from searcch_backend.api.common.sql import (
+    object_from_json, artifact_diff, record_artifact_diff, delete_artifacts)
+from searcch_backend.api.common.bulk import ingest_artifacts
 from searcch_backend.api.common.auth import (verify_api_key, has_api_key, has_token, verify_token)
+from searcch_backend.api.common.projection import (
+    Projection, ProjectionError, add_projection_arguments)
+from searcch_backend.api.common.response import (
+    make_etag, not_modified, get_table_versions, request_args_key)
+from searcch_backend.api.common.typeahead import contains_filter
 from searcch_backend.models.model import *
 from searcch_backend.models.schema import *
 from flask import abort, jsonify, request, make_response, Blueprint, url_for, Response
@@ -17,6 +24,12 @@ import math
 
 LOG = logging.getLogger(__name__)
 
+# Tables of the shared objects embedded in an artifact response; a change
+# to any of them changes an artifact's ETag.
+ARTIFACT_ETAG_TABLES = (
+    "persons", "users", "organizations", "affiliations", "licenses",
+    "badges", "importers", "exporters")
+
 class ArtifactIndexAPI(Resource):
 
     def __init__(self):
@@ -50,6 +63,11 @@ class ArtifactIndexAPI(Resource):
         self.getparse.add_argument(
             name="sort_desc", type=int, required=False, default=1,
             help="if set True, sort descending, else ascending")
+        add_projection_arguments(self.getparse)
+        self.deleteparse = reqparse.RequestParser()
+        self.deleteparse.add_argument(
+            name="id", type=int, required=False, action="append", location="args",
+            help="artifact ID(s) to delete")
 
         super(ArtifactIndexAPI, self).__init__()
 
@@ -78,13 +96,11 @@ class ArtifactIndexAPI(Resource):
             artifacts = artifacts.\
               filter(Artifact.publication == None)
         if args["owner"]:
-            owner_cond = "%" + args["owner"] + "%"
             artifacts = artifacts.\
               join(User, Artifact.owner_id == User.id).\
               join(Person, User.person_id == Person.id)
             artifacts = artifacts.\
-              filter(or_(Person.name.ilike(owner_cond),
-                         Person.email.ilike(owner_cond)))
+              filter(contains_filter((Person.name, Person.email), args["owner"]))
         if not args["sort"]:
             args["sort"] = "id"
         if args["sort_desc"]:
@@ -94,6 +110,22 @@ class ArtifactIndexAPI(Resource):
             artifacts = artifacts.\
               order_by(asc(getattr(Artifact,args["sort"])))
 
+        # short_view_include is the older spelling of expand.
+        expand = args["expand"]
+        if args["short_view_include"] is not None:
+            sva = args["short_view_include"].split(",")
+            relationships = list(Artifact.__mapper__.relationships.keys())
+            for x in sva:
+                if not x in relationships:
+                    abort(401, description="invalid short_view_include relation")
+            expand = sva
+        try:
+            projection = Projection(
+                ArtifactSchema, fields=args["fields"], expand=expand)
+        except ProjectionError as ex:
+            abort(400, description=str(ex))
+        artifacts = projection.apply(artifacts)
+
         pagination = None
         if "page" in args and args["page"]:
             if args["items_per_page"] <= 0:
@@ -104,18 +136,9 @@ class ArtifactIndexAPI(Resource):
         else:
             artifacts = artifacts.all()
 
-        exclude = None
-        if args["short_view_include"] is not None:
-            sva = args["short_view_include"].split(",")
-            exclude = list(Artifact.__mapper__.relationships.keys())
-            for x in sva:
-                if not x in exclude:
-                    abort(401, description="invalid short_view_include relation")
-                exclude.remove(x)
-
         response_dict = {
-            "artifacts": ArtifactSchema(
-                many=True,exclude=exclude).dump(artifacts)
+            "artifacts": projection.schema(
+                ArtifactSchema, many=True).dump(artifacts)
         }
         if pagination:
             response_dict["page"] = pagination.page
@@ -141,7 +164,8 @@ class ArtifactIndexAPI(Resource):
         if "artifact" in data:
             data = data["artifact"]
         artifact = object_from_json(db.session, Artifact, data, skip_primary_keys=True,
-                                    error_on_primary_key=False, allow_fk=True)
+                                    error_on_primary_key=False, allow_fk=True,
+                                    resolve=True)
         if not artifact.ctime:
             artifact.ctime = datetime.datetime.now()
         if login_session:
@@ -181,31 +205,162 @@ class ArtifactIndexAPI(Resource):
 
         return response
 
+    def delete(self):
+        """
+        Deletes many artifacts, given as `id` arguments and/or an "ids" array
+        in a JSON body, in a single transaction.  Admin only.
+        """
+        verify_api_key(request)
+        login_session = verify_token(request)
+        if not login_session.is_admin:
+            abort(403, description="unauthorized")
+
+        args = self.deleteparse.parse_args()
+        ids = set(args["id"] or [])
+        if request.is_json and isinstance(request.json, dict):
+            try:
+                ids.update([ int(x) for x in request.json.get("ids") or [] ])
+            except (TypeError, ValueError):
+                abort(400, description="ids must be a list of artifact IDs")
+        if not ids:
+            abort(400, description="no artifact IDs given")
+
+        found = [ id for (id,) in db.session.query(Artifact.id).filter(Artifact.id.in_(ids)) ]
+        try:
+            delete_artifacts(db.session, found)
+            db.session.commit()
+        except:
+            LOG.error("failed to delete artifacts %r", found)
+            LOG.exception(sys.exc_info()[1])
+            db.session.rollback()
+            abort(500, description="failed to delete artifacts")
+
+        response = jsonify(dict(
+            deleted=sorted(found), missing=sorted(ids.difference(found))))
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.status_code = 200
+        return response
+
+
+class ArtifactBulkAPI(Resource):
+    def post(self):
+        """
+        Creates many artifacts from a JSON array of artifacts (or an object
+        with an "artifacts" array), or from newline-delimited JSON
+        (application/x-ndjson), one artifact per line, without invoking the
+        importer.  Returns a result per artifact, in order: its new `id`, or
+        an `error`.
+        """
+        verify_api_key(request)
+        login_session = None
+        if has_token(request):
+            login_session = verify_token(request)
+            if not login_session.is_admin:
+                abort(403, description="unauthorized")
+
+        docs = []
+        errors = {}
+        if request.mimetype == "application/x-ndjson":
+            lines = [ l for l in request.get_data(as_text=True).splitlines() if l.strip() ]
+            for (i, line) in enumerate(lines):
+                try:
+                    docs.append(json.loads(line))
+                except ValueError as ex:
+                    docs.append(None)
+                    errors[i] = "invalid JSON: %s" % (str(ex),)
+        elif request.is_json:
+            docs = request.json
+            if isinstance(docs, dict):
+                docs = docs.get("artifacts")
+            if not isinstance(docs, list):
+                abort(400, description="request body must be a JSON array of artifacts")
+        else:
+            abort(400, description="request body must be JSON or newline-delimited JSON")
+
+        fake_module_name = "manual"
+        if not login_session:
+            fake_module_name = "cli-export"
+        good = [ i for i in range(0, len(docs)) if i not in errors ]
+        try:
+            results = ingest_artifacts(
+                db.session, [ docs[i] for i in good ],
+                owner=login_session.user if login_session else None,
+                module_name=fake_module_name,
+                batch_size=app.config.get("BULK_INGEST_BATCH_SIZE", 500))
+        except:
+            LOG.exception(sys.exc_info()[1])
+            abort(500)
+        for (i, result) in zip(good, results):
+            result["index"] = i
+        for (i, error) in errors.items():
+            results.append(dict(index=i, error=error))
+        results.sort(key=lambda x: x["index"])
+
+        created = len([ r for r in results if "id" in r ])
+        response = jsonify(dict(
+            total=len(results), created=created, failed=len(results) - created,
+            results=results))
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.status_code = 200
+
+        return response
+
 
 class ArtifactAPI(Resource):
+    def __init__(self):
+        self.getparse = reqparse.RequestParser()
+        add_projection_arguments(self.getparse)
+        self.putparse = reqparse.RequestParser()
+        self.putparse.add_argument(
+            name="dry_run", type=int, required=False, default=0, location="args",
+            help="if 1, return the changes that would be made, without making them")
+
+        super(ArtifactAPI, self).__init__()
+
     def get(self, artifact_id):
         if has_api_key(request):
             verify_api_key(request)
 
-        artifact = db.session.query(Artifact).filter(
+        # Without a projection, return the whole artifact, file contents and
+        # all, as always.
+        args = self.getparse.parse_args()
+        try:
+            projection = Projection(
+                ArtifactSchema, fields=args["fields"], expand=args["expand"],
+                include_blobs=not (args["fields"] or args["expand"]))
+        except ProjectionError as ex:
+            abort(400, description=str(ex))
+
+        # get average rating for the artifact, number of ratings; and its
+        # generation, which with the versions of the shared tables it
+        # embeds, identifies this response.
+        stats = db.session.query(ArtifactStats).filter(
+            ArtifactStats.artifact_id == artifact_id).first()
+        etag = None
+        if stats:
+            etag = make_etag(
+                "artifact", artifact_id, stats.generation,
+                get_table_versions(db.session, ARTIFACT_ETAG_TABLES),
+                request_args_key())
+            response = not_modified(etag)
+            if response:
+                return response
+
+        artifact = projection.apply(db.session.query(Artifact)).filter(
             Artifact.id == artifact_id).first()
         if not artifact:
             abort(404, description='invalid ID for artifact')
 
-        # get average rating for the artifact, number of ratings
-        rating_aggregates = db.session.query(ArtifactRatings.artifact_id, func.count(ArtifactRatings.id).label('num_ratings'), func.avg(
-            ArtifactRatings.rating).label('avg_rating')).filter(ArtifactRatings.artifact_id == artifact_id).group_by("artifact_id").all()
-
         ratings = db.session.query(ArtifactRatings, ArtifactReviews).join(ArtifactReviews, and_(
             ArtifactRatings.user_id == ArtifactReviews.user_id,
             ArtifactRatings.artifact_id == ArtifactReviews.artifact_id
         )).filter(ArtifactRatings.artifact_id == artifact_id).all()
 
         response = jsonify({
-            "artifact": ArtifactSchema().dump(artifact),
-            "avg_rating": float(rating_aggregates[0][2]) if rating_aggregates else None,
-            "num_ratings": rating_aggregates[0][1] if rating_aggregates else 0,
-            "num_reviews": len(ratings) if ratings else 0,
+            "artifact": projection.schema(ArtifactSchema).dump(artifact),
+            "avg_rating": float(stats.avg_rating) if stats and stats.avg_rating is not None else None,
+            "num_ratings": stats.num_ratings if stats else 0,
+            "num_reviews": stats.num_reviews if stats else 0,
             "rating_review": [{
                 "rating": ArtifactRatingsSchema(only=("rating",)).dump(rating), 
                 "review": ArtifactReviewsSchema(exclude=("artifact_id", "user_id")).dump(review)
@@ -213,6 +368,8 @@ class ArtifactAPI(Resource):
         })
         response.headers.add('Access-Control-Allow-Origin', '*')
         response.status_code = 200
+        if etag:
+            response.set_etag(etag)
         return response
 
     def put(self, artifact_id):
@@ -220,6 +377,7 @@ class ArtifactAPI(Resource):
         login_session = None
         if has_token(request):
             login_session = verify_token(request)
+        args = self.putparse.parse_args()
 
         # We can only change unpublished artifacts unless admin.
         artifact = db.session.query(Artifact).\
@@ -235,6 +393,7 @@ class ArtifactAPI(Resource):
             abort(400, description="request body must be a JSON representation of an artifact")
 
         data = request.json
+        ops = []
         artifact_data = data
         if "artifact" in data:
             artifact_data = data["artifact"]
@@ -252,7 +411,8 @@ class ArtifactAPI(Resource):
                     #
                     mod_artifact = object_from_json(
                         db.session, Artifact, artifact_data, skip_primary_keys=False,
-                        error_on_primary_key=False, should_query=True, allow_fk=True)
+                        error_on_primary_key=False, should_query=True, allow_fk=True,
+                        resolve=True)
                     mod_artifact.owner = artifact.owner
                 except:
                     LOG.exception(sys.exc_info()[1])
@@ -261,13 +421,15 @@ class ArtifactAPI(Resource):
                 if not mod_artifact:
                     abort(400, description="cannot parse updated artifact")
 
-                curations = None
                 try:
                     curator = login_session.user if login_session else artifact.owner
-                    curations = artifact_diff(db.session, curator, artifact, artifact, mod_artifact)
-                    if curations:
-                        artifact.mtime = datetime.datetime.now()
-                        db.session.add_all(curations)
+                    diff = artifact_diff(db.session, artifact, artifact, mod_artifact)
+                    ops = diff.ops
+                    if diff and not args["dry_run"]:
+                        now = datetime.datetime.now()
+                        diff.apply(db.session)
+                        artifact.mtime = now
+                        record_artifact_diff(db.session, curator, artifact, diff, time=now)
                         db.session.add(artifact)
                 except sqlalchemy.exc.IntegrityError:
                     ex = sys.exc_info()[1]
@@ -287,6 +449,12 @@ class ArtifactAPI(Resource):
                     db.session.rollback()
                     abort(500, description="unexpected internal error")
 
+        if args["dry_run"]:
+            response = jsonify(dict(artifact_id=artifact.id, ops=ops))
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            response.status_code = 200
+            return response
+
         if "publication" in data and data["publication"] is not None \
           and not artifact.publication:
             notes = None
@@ -328,52 +496,13 @@ class ArtifactAPI(Resource):
         if artifact.publication and not login_session.is_admin:
             abort(403, description="artifact already published; cannot delete")
 
-        # If currently importing, delete that first, and commit:
-        artifact_import = db.session.query(ArtifactImport).\
-          filter(ArtifactImport.artifact_id == artifact_id).\
-          first()
-        if artifact_import:
-            schedule = db.session.query(ImporterSchedule).\
-              filter(ImporterSchedule.artifact_import_id == artifact_import.id).\
-              first()
-            if schedule:
-                db.session.delete(schedule)
-            db.session.delete(artifact_import)
-            db.session.commit()
-
-        db.session.refresh(artifact)
-        db.session.refresh(login_session)
-
-        for af in getattr(artifact, "files", []):
-            for afm in getattr(af, "members", []):
-                db.session.delete(afm)
-            af.members = []
-            db.session.delete(af)
-        artifact.files = []
-        many = [ "meta", "tags", "curations", "affiliations", "relationships", "releases",
-                 "badges" ]
-        for field in many:
-            for x in getattr(artifact, field, []):
-                db.session.delete(x)
-            setattr(artifact, field, [])
-        classes = [ ArtifactReviews, ArtifactRatings, ArtifactFavorites ]
-        for c in classes:
-            res = db.session.query(c).filter(c.artifact_id == artifact_id).all() or []
-            for x in res:
-                db.session.delete(x)
-        single = [ "publication" ]
-        for field in single:
-            x = getattr(artifact, field, None)
-            if x:
-                db.session.delete(x)
-                setattr(artifact, field, None)
-
-        db.session.delete(artifact)
         try:
+            delete_artifacts(db.session, [artifact_id])
             db.session.commit()
         except:
             LOG.error("failed to delete artifact %r", artifact_id)
             LOG.exception(sys.exc_info()[1])
+            db.session.rollback()
             abort(500, description="failed to delete artifact %r" % (artifact_id,))
 
         return Response(status=200)
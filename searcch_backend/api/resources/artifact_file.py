@@ -0,0 +1,92 @@
+# logic for /artifact/file
+
+from searcch_backend.api.app import db
+from searcch_backend.api.common.auth import (verify_api_key, has_api_key)
+from searcch_backend.api.common import blobstore
+from searcch_backend.models.model import *
+from flask import abort, request, Response
+from flask_restful import Resource
+import logging
+
+LOG = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+def _iter_chunks(buf, start, stop, close=None):
+    try:
+        while start < stop:
+            end = min(start + CHUNK_SIZE, stop)
+            yield bytes(buf[start:end])
+            start = end
+    finally:
+        if close:
+            close()
+
+def content_response(obj):
+    """
+    Streams an ArtifactFile or ArtifactFileMember's content, honoring a
+    single-range Range header.  Contents in the blob store are served from a
+    read-only mmap of the blob, so only the requested range is ever paged in.
+    """
+    mm = None
+    if obj.content is not None:
+        buf = obj.content
+        size = len(buf)
+    elif obj.content_digest and blobstore.blob_store:
+        try:
+            (mm, size) = blobstore.blob_store.open(obj.content_digest)
+        except FileNotFoundError:
+            LOG.error("missing blob %s for %r", obj.content_digest, obj)
+            abort(404, description="content not available")
+        buf = mm
+    else:
+        abort(404, description="no content")
+
+    (start, stop) = (0, size)
+    status = 200
+    headers = { "Accept-Ranges": "bytes" }
+    # Multiple ranges are legal to ignore; we serve the whole content.
+    if request.range and request.range.units == "bytes" \
+      and len(request.range.ranges) == 1:
+        r = request.range.range_for_length(size)
+        if r is None:
+            if mm:
+                mm.close()
+            headers["Content-Range"] = "bytes */%d" % (size,)
+            return Response(status=416, headers=headers)
+        (start, stop) = r
+        status = 206
+        headers["Content-Range"] = "bytes %d-%d/%d" % (start, stop - 1, size)
+    headers["Content-Length"] = str(stop - start)
+    headers["Access-Control-Allow-Origin"] = "*"
+    if obj.content_digest:
+        headers["ETag"] = '"%s"' % (obj.content_digest,)
+
+    return Response(
+        _iter_chunks(buf, start, stop, close=mm.close if mm else None),
+        status=status, headers=headers,
+        mimetype="application/octet-stream", direct_passthrough=True)
+
+
+class ArtifactFileContentAPI(Resource):
+    def get(self, artifact_file_id):
+        if has_api_key(request):
+            verify_api_key(request)
+
+        artifact_file = db.session.query(ArtifactFile).filter(
+            ArtifactFile.id == artifact_file_id).first()
+        if not artifact_file:
+            abort(404, description="invalid artifact file ID")
+        return content_response(artifact_file)
+
+
+class ArtifactFileMemberContentAPI(Resource):
+    def get(self, artifact_file_member_id):
+        if has_api_key(request):
+            verify_api_key(request)
+
+        member = db.session.query(ArtifactFileMember).filter(
+            ArtifactFileMember.id == artifact_file_member_id).first()
+        if not member:
+            abort(404, description="invalid artifact file member ID")
+        return content_response(member)
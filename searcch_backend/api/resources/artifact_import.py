@@ -2,7 +2,6 @@ import datetime
 import dateutil.parser
 import logging
 import sys
-import threading
 import traceback
 import math
 
@@ -22,6 +21,7 @@ from searcch_backend.api.app import db, config_name
 from searcch_backend.api.common.auth import (verify_api_key, verify_token, has_token)
 from searcch_backend.api.common.importer import schedule_import
 from searcch_backend.api.common.sql import object_from_json
+from searcch_backend.api.common.typeahead import contains_filter
 
 LOG = logging.getLogger(__name__)
 
@@ -89,13 +89,11 @@ class ArtifactImportResourceRoot(Resource):
         if not args["archived"]:
             artifact_imports = artifact_imports.filter(ArtifactImport.archived == False)
         if args["owner"]:
-            owner_cond = "%" + args["owner"] + "%"
             artifact_imports = artifact_imports.\
               join(User, ArtifactImport.owner_id == User.id).\
               join(Person, User.person_id == Person.id)
             artifact_imports = artifact_imports.\
-              filter(or_(Person.name.ilike(owner_cond),
-                         Person.email.ilike(owner_cond)))
+              filter(contains_filter((Person.name, Person.email), args["owner"]))
         if not args["sort"]:
             args["sort"] = "id"
         if args["sort_desc"]:
@@ -166,7 +164,7 @@ class ArtifactImportResourceRoot(Resource):
         db.session.refresh(ai)
 
         LOG.debug("scheduling %r" % (ai,))
-        threading.Thread(target=schedule_import,name="schedule_import").start()
+        schedule_import()
 
         response = jsonify(ArtifactImportSchema().dump(ai))
         response.status_code = 200
@@ -271,7 +269,7 @@ class ArtifactImportResource(Resource):
             db.session.commit()
 
             LOG.debug("artifact import status %r; scheduling" % (args["status"],))
-            threading.Thread(target=schedule_import,name="schedule_import").start()
+            schedule_import()
 
         if args["status"] == "completed" and args["phase"] == "done":
             if artifact_json:
@@ -282,7 +280,9 @@ class ArtifactImportResource(Resource):
                     del artifact_json["owner_id"]
                 artifact = None
                 try:
-                    artifact = object_from_json(db.session,Artifact,artifact_json,skip_primary_keys=True)
+                    artifact = object_from_json(
+                        db.session,Artifact,artifact_json,skip_primary_keys=True,
+                        resolve=True)
                 except (TypeError, ValueError):
                     ex = sys.exc_info()[1]
                     LOG.exception(ex)
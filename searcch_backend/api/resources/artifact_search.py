@@ -1,62 +1,255 @@
 # logic for /artifacts
 
-from searcch_backend.api.app import db
+from searcch_backend.api.app import app, db
 from searcch_backend.models.model import *
 from searcch_backend.models.schema import *
 from flask import abort, jsonify, url_for, request
 from flask_restful import reqparse, Resource
+import sqlalchemy
 from sqlalchemy import func, desc, sql, or_, and_
 from searcch_backend.api.common.auth import (verify_api_key, has_api_key, has_token, verify_token)
+from searcch_backend.api.common.sql import estimate_query_count
+from searcch_backend.api.common.cache import make_cache
+from searcch_backend.api.common.response import get_table_versions
+import base64
 import math
 import logging
 import json
 
 LOG = logging.getLogger(__name__)
 
+SEARCH_TOTAL_MODES = ("exact", "estimate", "none")
+SEARCH_FACETS = ("type", "badge", "organization")
+RECOMMENDATIONS_PER_PAGE = 10
+MAX_FACET_LIMIT = 100
+
+#
+# Facet counts, keyed by the normalized search filters.  They are not
+# invalidated by writes; they are only as fresh as SEARCH_FACET_CACHE_TTL.
+#
+facet_cache = None
+if app.config.get("SEARCH_FACET_CACHE_ENABLED", False):
+    facet_cache = make_cache(
+        app, "search_facets", "SEARCH_FACET_CACHE", maxsize=1024, ttl=60)
+
+#
+# Whole search results, keyed by the normalized search arguments and the
+# search generation, so a change to the index, or to anything a filter or
+# an abstract reads, makes all entries unreachable.
+#
+search_cache = None
+if app.config.get("SEARCH_CACHE_ENABLED", False):
+    search_cache = make_cache(
+        app, "search_results", "SEARCH_CACHE", maxsize=1024, ttl=300)
+
+# Tables whose table_versions make up the search generation: the index,
+# the publications that decide what is searchable, and the tables the
+# filters join (badge=, author=, organization=, owner=).  The "artifacts"
+# version only changes with type, owner_id, and url, which type= and the
+# abstracts read and the index does not cover.
+SEARCH_GENERATION_TABLES = (
+    "artifact_search_view", "artifact_publications", "artifacts",
+    "artifact_badges", "badges", "artifact_affiliations", "affiliations",
+    "persons", "organizations", "users")
+
 def generate_artifact_uri(artifact_id):
     return url_for('api.artifact', artifact_id=artifact_id)
 
-def search_artifacts(keywords, artifact_types, author_keywords, organization, owner_keywords, badge_id_list, page_num, items_per_page):
-    """ search for artifacts based on keywords, with optional filters by owner and affiliation """
-    sqratings = db.session.query(
-        ArtifactRatings.artifact_id,
-        func.count(ArtifactRatings.id).label('num_ratings'),
-        func.avg(ArtifactRatings.rating).label('avg_rating')
-    ).group_by("artifact_id").subquery()
-    sqreviews = db.session.query(
-        ArtifactReviews.artifact_id,
-        func.count(ArtifactReviews.id).label('num_reviews')
-    ).group_by("artifact_id").subquery()
+def encode_search_cursor(rank, avg_rating, artifact_id):
+    """
+    Encodes the sort key of the last row of a search page as an opaque,
+    URL-safe cursor.
+    """
+    key = [ rank, avg_rating, artifact_id ]
+    s = json.dumps(key, separators=(',',':')).encode("utf-8")
+    return base64.urlsafe_b64encode(s).decode("ascii").rstrip("=")
+
+def decode_search_cursor(cursor):
+    try:
+        s = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        (rank, avg_rating, artifact_id) = json.loads(s.decode("utf-8"))
+        return (float(rank),
+                float(avg_rating) if avg_rating is not None else None,
+                int(artifact_id))
+    except Exception:
+        raise ValueError("invalid search cursor")
+
+def search_result_columns():
+    """
+    The columns an artifact search abstract is built from.  Search selects
+    only these, rather than whole Artifact entities (and their lazy-loaded
+    owners).
+    """
+    return [ Artifact.id, Artifact.url, Artifact.type, Artifact.title,
+             Artifact.description, Artifact.owner_id,
+             ArtifactStats.num_ratings, ArtifactStats.avg_rating,
+             ArtifactStats.num_reviews ]
+
+def _normalize_list(v):
+    if v is None:
+        return []
+    if not isinstance(v, list):
+        v = [ v ]
+    return sorted(set([ x for x in v if x not in (None, "") ]))
+
+def _normalize_keywords(keywords):
+    return " ".join((keywords or "").lower().split())
+
+def search_facets_key(keywords, artifact_types, author_keywords, organization,
+                      owner_keywords, badge_id_list, facets, facet_limit):
+    """
+    Returns a string that is equal for all searches that match the same
+    artifacts and request the same facets; i.e., the facet cache key.
+    """
+    key = [ _normalize_keywords(keywords), _normalize_list(artifact_types),
+            _normalize_list(author_keywords), _normalize_list(organization),
+            _normalize_list(owner_keywords), _normalize_list(badge_id_list),
+            sorted(facets), facet_limit ]
+    return json.dumps(key, separators=(',',':'))
+
+def facet_counts_expr(query, facets, facet_limit):
+    """
+    Returns a scalar subquery that computes the requested facet counts over
+    all the artifacts `query` matches, as a JSON array of [facet, id, value,
+    count] rows: the count of matches of each type, and of the top
+    `facet_limit` badges and organizations (by matches).
+    """
+    matches = query.order_by(None).with_entities(
+        Artifact.id.label("artifact_id"), Artifact.type.label("type"))\
+      .cte("facet_matches")
+    count = func.count(sql.distinct(matches.c.artifact_id)).label("count")
+    branches = []
+    if "type" in facets:
+        branches.append(sql.select([
+            sql.literal("type").label("facet"),
+            sql.cast(sql.null(), sqlalchemy.Integer).label("id"),
+            sql.cast(matches.c.type, sqlalchemy.Text).label("value"),
+            count ]).group_by(matches.c.type))
+    if "badge" in facets:
+        branches.append(sql.select([
+            sql.literal("badge").label("facet"), Badge.id.label("id"),
+            sql.cast(Badge.title, sqlalchemy.Text).label("value"), count ])\
+          .select_from(
+            matches.join(ArtifactBadge.__table__,
+                         ArtifactBadge.artifact_id == matches.c.artifact_id)\
+              .join(Badge.__table__, Badge.id == ArtifactBadge.badge_id))\
+          .group_by(Badge.id, Badge.title)\
+          .order_by(desc("count"), Badge.id).limit(facet_limit))
+    if "organization" in facets:
+        branches.append(sql.select([
+            sql.literal("organization").label("facet"),
+            Organization.id.label("id"),
+            sql.cast(Organization.name, sqlalchemy.Text).label("value"), count ])\
+          .select_from(
+            matches.join(ArtifactAffiliation.__table__,
+                         ArtifactAffiliation.artifact_id == matches.c.artifact_id)\
+              .join(Affiliation.__table__,
+                    Affiliation.id == ArtifactAffiliation.affiliation_id)\
+              .join(Organization.__table__, Organization.id == Affiliation.org_id))\
+          .group_by(Organization.id, Organization.name)\
+          .order_by(desc("count"), Organization.id).limit(facet_limit))
+    # Each branch is wrapped, so that its ORDER BY/LIMIT stays its own.
+    counts = sql.union_all(*[
+        sql.select([ b.alias() ]) for b in branches ]).alias("facet_counts")
+    return sql.select([
+        func.json_agg(func.json_build_array(
+            counts.c.facet, counts.c.id, counts.c.value, counts.c.count)) ])\
+      .select_from(counts).correlate(None).as_scalar()
+
+def format_facets(rows, facets):
+    if isinstance(rows, str):
+        rows = json.loads(rows)
+    ret = dict([ (facet, []) for facet in facets ])
+    for (facet, id, value, count) in rows or []:
+        if facet == "type":
+            ret[facet].append(dict(value=value, count=count))
+        elif facet == "badge":
+            ret[facet].append(dict(id=id, title=value, count=count))
+        else:
+            ret[facet].append(dict(id=id, name=value, count=count))
+    for l in ret.values():
+        l.sort(key=lambda x: (-x["count"], x.get("id") or 0, x.get("value") or ""))
+    return ret
+
+def search_result_abstract(row):
+    """
+    Returns the abstract of an artifact from a row of search_result_columns().
+    """
+    return {
+        "id": row.id,
+        "uri": generate_artifact_uri(row.id),
+        "doi": row.url,
+        "type": row.type,
+        "title": row.title,
+        "description": row.description,
+        "avg_rating": float(row.avg_rating) if row.avg_rating else None,
+        "num_ratings": row.num_ratings if row.num_ratings else 0,
+        "num_reviews": row.num_reviews if row.num_reviews else 0,
+        "owner": { "id": row.owner_id }
+    }
+
+def search_artifacts(keywords, artifact_types, author_keywords, organization, owner_keywords, badge_id_list, page_num, items_per_page,
+                     cursor=None, use_cursor=False, total_mode="exact",
+                     facets=None, facet_limit=20):
+    """
+    search for artifacts based on keywords, with optional filters by owner and affiliation
+
+    By default, results are paginated by page number (OFFSET).  If use_cursor
+    is set (or a cursor is given), results are instead paginated by keyset on
+    (rank, avg_rating, id): cursor is the next_cursor value returned with the
+    previous page (None for the first page), so deep pages cost the same as
+    the first.  total_mode is one of exact (COUNT), estimate (planner row
+    estimate), or none.  An exact total is selected alongside the page rows,
+    so a page is a single round trip.
+
+    facets is a list of SEARCH_FACETS to count over all matches (not just
+    the page); the counts are likewise selected alongside the page rows,
+    unless they are cached.
+    """
+    if cursor:
+        use_cursor = True
+
+    facet_key = None
+    facet_result = None
+    if facets:
+        facet_key = search_facets_key(
+            keywords, artifact_types, author_keywords, organization,
+            owner_keywords, badge_id_list, facets, facet_limit)
+        if facet_cache:
+            facet_result = facet_cache.get(facet_key)
 
     # create base query object
     if not keywords:
-        query = db.session.query(Artifact,
-                                    sql.expression.bindparam("zero", 0).label("rank"),
-                                    'num_ratings', 'avg_rating', 'num_reviews'
-                                    ).order_by(
-                                    db.case([
-                                        (Artifact.type == 'software', 1),
-                                        (Artifact.type == 'dataset', 2),
-                                        (Artifact.type ==
-                                        'publication', 3),
-                                    ], else_=4)
-                                )
-        query = query.join(sqratings, Artifact.id == sqratings.c.artifact_id, isouter=True
+        # Without keywords, "rank" is the artifact type preference; negated,
+        # so that rank always sorts descending.
+        rank_expr = 0 - db.case([
+                                    (Artifact.type == 'software', 1),
+                                    (Artifact.type == 'dataset', 2),
+                                    (Artifact.type ==
+                                    'publication', 3),
+                                ], else_=4)
+        query = db.session.query(*search_result_columns(),
+                                    rank_expr.label("rank")
+                                    ).select_from(Artifact
+                                    ).order_by(desc(rank_expr))
+        query = query.join(ArtifactStats, Artifact.id == ArtifactStats.artifact_id, isouter=True
                         ).join(ArtifactPublication, ArtifactPublication.artifact_id == Artifact.id
-                        ).join(sqreviews, Artifact.id == sqreviews.c.artifact_id, isouter=True
-                        ).order_by(sqratings.c.avg_rating.desc().nullslast(),sqreviews.c.num_reviews.desc())
+                        ).order_by(ArtifactStats.avg_rating.desc().nullslast(),ArtifactStats.num_reviews.desc())
     else:
+        # ts_rank_cd is a float4; as a float8, the rank a cursor carries
+        # back compares equal to the rank it was read from.
         search_query = db.session.query(ArtifactSearchMaterializedView.artifact_id, 
-                                        func.ts_rank_cd(ArtifactSearchMaterializedView.doc_vector, func.websearch_to_tsquery("english", keywords)).label("rank")
+                                        sqlalchemy.cast(func.ts_rank_cd(ArtifactSearchMaterializedView.doc_vector, func.websearch_to_tsquery("english", keywords)), sqlalchemy.Float(53)).label("rank")
                                     ).filter(ArtifactSearchMaterializedView.doc_vector.op('@@')(func.websearch_to_tsquery("english", keywords))
                                     ).subquery()
-        query = db.session.query(Artifact, 
-                                    search_query.c.rank, 'num_ratings', 'avg_rating', 'num_reviews'
+        rank_expr = search_query.c.rank
+        query = db.session.query(*search_result_columns(),
+                                    search_query.c.rank
+                                    ).select_from(Artifact
                                     ).join(ArtifactPublication, ArtifactPublication.artifact_id == Artifact.id
                                     ).join(search_query, Artifact.id == search_query.c.artifact_id, isouter=False)
         
-        query = query.join(sqratings, Artifact.id == sqratings.c.artifact_id, isouter=True
-                        ).join(sqreviews, Artifact.id == sqreviews.c.artifact_id, isouter=True
+        query = query.join(ArtifactStats, Artifact.id == ArtifactStats.artifact_id, isouter=True
                         ).order_by(desc(search_query.c.rank))
 
     if author_keywords or organization:
@@ -112,31 +305,126 @@ def search_artifacts(keywords, artifact_types, author_keywords, organization, ow
         else:
             query = query.filter(Artifact.type == artifact_types[0])
 
-    
-    pagination = query.paginate(page=page_num, error_out=False, max_per_page=items_per_page)
-    result = pagination.items
-
-    artifacts = []
-    for row in result:
-        artifact, _, num_ratings, avg_rating, num_reviews = row
-        abstract = {
-            "id": artifact.id,
-            "uri": generate_artifact_uri(artifact.id),
-            "doi": artifact.url,
-            "type": artifact.type,
-            "title": artifact.title,
-            "description": artifact.description,
-            "avg_rating": float(avg_rating) if avg_rating else None,
-            "num_ratings": num_ratings if num_ratings else 0,
-            "num_reviews": num_reviews if num_reviews else 0,
-            "owner": { "id": artifact.owner.id }
-        }
-        artifacts.append(abstract)
 
-    return dict(
-        page=pagination.page,total=pagination.total,
-        pages=int(math.ceil(pagination.total / items_per_page)),
-        artifacts=artifacts)
+    total = None
+    total_expr = None
+    if total_mode == "exact":
+        # An uncorrelated scalar subquery, so postgres evaluates it once per
+        # statement; it is computed before the keyset filter, so it counts
+        # all matches, not just those after the cursor.
+        total_expr = query.order_by(None).with_entities(func.count())\
+          .statement.correlate(None).as_scalar()
+        query = query.add_columns(total_expr.label("total"))
+    elif total_mode == "estimate":
+        total = estimate_query_count(db.session, query.order_by(None))
+
+    facets_expr = None
+    if facets and facet_result is None:
+        facets_expr = facet_counts_expr(query, facets, facet_limit)
+        query = query.add_columns(facets_expr.label("facets"))
+
+    if use_cursor:
+        # Keyset pagination: a total order on (rank, avg_rating, id), all
+        # descending, with unrated artifacts last.
+        avg_rating_expr = func.coalesce(ArtifactStats.avg_rating, -1)
+        query = query.order_by(None).order_by(
+            desc(rank_expr), desc(avg_rating_expr), desc(Artifact.id))
+        if cursor:
+            (last_rank, last_avg_rating, last_id) = decode_search_cursor(cursor)
+            if last_avg_rating is None:
+                last_avg_rating = -1
+            query = query.filter(
+                sqlalchemy.tuple_(rank_expr, avg_rating_expr, Artifact.id) \
+                  < sqlalchemy.tuple_(
+                      sqlalchemy.cast(last_rank, sqlalchemy.Float(53)),
+                      sqlalchemy.cast(last_avg_rating, sqlalchemy.Float(53)),
+                      last_id))
+        result = query.limit(items_per_page + 1).all()
+        next_cursor = None
+        if len(result) > items_per_page:
+            result = result[:items_per_page]
+            last = result[-1]
+            next_cursor = encode_search_cursor(last.rank, last.avg_rating, last.id)
+    else:
+        if page_num < 1:
+            page_num = 1
+        result = query.limit(items_per_page).offset((page_num - 1) * items_per_page).all()
+
+    if total_expr is not None:
+        if result:
+            total = result[0].total
+        elif use_cursor and not cursor or not use_cursor and page_num == 1:
+            total = 0
+        else:
+            # Past the end: no rows to carry the total.
+            total = db.session.query(total_expr).scalar()
+
+    if facets_expr is not None:
+        if result:
+            facet_rows = result[0].facets
+        else:
+            facet_rows = db.session.query(facets_expr).scalar()
+        facet_result = format_facets(facet_rows, facets)
+        if facet_cache:
+            facet_cache.put(facet_key, facet_result)
+
+    artifacts = [ search_result_abstract(row) for row in result ]
+
+    ret = dict(artifacts=artifacts)
+    if use_cursor:
+        ret["next_cursor"] = next_cursor
+    else:
+        ret["page"] = page_num
+    if total is not None:
+        ret["total"] = total
+        if not use_cursor:
+            ret["pages"] = int(math.ceil(total / items_per_page))
+        if total_mode == "estimate":
+            ret["total_estimated"] = True
+    if facet_result is not None:
+        ret["facets"] = facet_result
+    return ret
+
+def get_search_generation():
+    """
+    Returns the search generation: it changes whenever the search index,
+    the set of published artifacts, or anything a search filter matches on
+    does.
+    """
+    return get_table_versions(db.session, SEARCH_GENERATION_TABLES)
+
+def cached_search_artifacts(keywords, artifact_types, author_keywords, organization, owner_keywords, badge_id_list, page_num, items_per_page,
+                            cursor=None, use_cursor=False, total_mode="exact",
+                            facets=None, facet_limit=20):
+    """
+    search_artifacts(), through the search result cache.  Ratings and
+    reviews change result order and abstracts without changing the search
+    generation; they show up when entries expire (SEARCH_CACHE_TTL).  Every
+    other change that affects results changes the generation.
+    """
+    if not search_cache:
+        return search_artifacts(
+            keywords, artifact_types, author_keywords, organization,
+            owner_keywords, badge_id_list, page_num, items_per_page,
+            cursor=cursor, use_cursor=use_cursor, total_mode=total_mode,
+            facets=facets, facet_limit=facet_limit)
+    key = json.dumps([
+        get_search_generation(), _normalize_keywords(keywords),
+        _normalize_list(artifact_types), _normalize_list(author_keywords),
+        _normalize_list(organization), _normalize_list(owner_keywords),
+        _normalize_list(badge_id_list), bool(use_cursor or cursor),
+        cursor if (use_cursor or cursor) else max(page_num, 1), items_per_page,
+        total_mode, sorted(facets or []), facet_limit ],
+        separators=(',',':'))
+    result = search_cache.get(key)
+    if result is None:
+        result = search_artifacts(
+            keywords, artifact_types, author_keywords, organization,
+            owner_keywords, badge_id_list, page_num, items_per_page,
+            cursor=cursor, use_cursor=use_cursor, total_mode=total_mode,
+            facets=facets, facet_limit=facet_limit)
+        search_cache.put(key, result)
+    return result
 
 class ArtifactSearchIndexAPI(Resource):
     def __init__(self):
@@ -155,6 +443,22 @@ class ArtifactSearchIndexAPI(Resource):
                                    required=False,
                                    default=10,
                                    help='items per page for paginated results')
+        self.reqparse.add_argument(name='pagination',
+                                   type=str,
+                                   required=False,
+                                   default='page',
+                                   choices=('page', 'cursor'),
+                                   help='pagination mode: page (by page number) or cursor (by next_cursor)')
+        self.reqparse.add_argument(name='cursor',
+                                   type=str,
+                                   required=False,
+                                   help='next_cursor value from the previous page; implies cursor pagination')
+        self.reqparse.add_argument(name='total',
+                                   type=str,
+                                   required=False,
+                                   default='exact',
+                                   choices=SEARCH_TOTAL_MODES,
+                                   help='total result count: exact, estimate, or none')
         
         # filters
         self.reqparse.add_argument(name='type',
@@ -183,6 +487,16 @@ class ArtifactSearchIndexAPI(Resource):
                                    required=False,
                                    action='append',
                                    help='badge IDs to search for')
+        self.reqparse.add_argument(name='facets',
+                                   type=str,
+                                   required=False,
+                                   action='append',
+                                   help='facets to count over all results (type, badge, organization); a comma-separated list, or repeated')
+        self.reqparse.add_argument(name='facet_limit',
+                                   type=int,
+                                   required=False,
+                                   default=20,
+                                   help='maximum number of badge and organization facet values')
 
         super(ArtifactSearchIndexAPI, self).__init__()
 
@@ -196,6 +510,9 @@ class ArtifactSearchIndexAPI(Resource):
         keywords = args['keywords']
         page_num = args['page']
         items_per_page = args['items_per_page']
+        use_cursor = args['pagination'] == 'cursor'
+        cursor = args['cursor']
+        total_mode = args['total']
 
         # artifact search filters
         artifact_types = args['type']
@@ -203,14 +520,30 @@ class ArtifactSearchIndexAPI(Resource):
         organization = args['organization']
         owner_keywords = args['owner']
         badge_id_list = args['badge_id']
+        facets = []
+        for f in args['facets'] or []:
+            facets.extend([ x.strip() for x in f.split(",") if x.strip() ])
+        facet_limit = args['facet_limit']
 
         # sanity checks
         if artifact_types:
             for a_type in artifact_types:
                 if not ArtifactSearchIndexAPI.is_artifact_type_valid(a_type):
                     abort(400, description='invalid artifact type passed')
+        if items_per_page < 1:
+            abort(400, description='items_per_page must be positive')
+        for facet in facets:
+            if facet not in SEARCH_FACETS:
+                abort(400, description='invalid facet %s' % (facet,))
+        if facet_limit < 1 or facet_limit > MAX_FACET_LIMIT:
+            abort(400, description='facet_limit must be between 1 and %d' % (MAX_FACET_LIMIT,))
 
-        result = search_artifacts(keywords, artifact_types, author_keywords, organization, owner_keywords, badge_id_list, page_num, items_per_page)
+        try:
+            result = cached_search_artifacts(keywords, artifact_types, author_keywords, organization, owner_keywords, badge_id_list, page_num, items_per_page,
+                                             cursor=cursor, use_cursor=use_cursor, total_mode=total_mode,
+                                             facets=sorted(set(facets)), facet_limit=facet_limit)
+        except ValueError as ex:
+            abort(400, description=str(ex))
         response = jsonify(result)
         response.headers.add('Access-Control-Allow-Origin', '*')
         response.status_code = 200
@@ -235,7 +568,7 @@ class ArtifactRecommendationAPI(Resource):
         page_num = args['page']
 
         # check for valid artifact id
-        artifact = db.session.query(Artifact).filter(
+        artifact = db.session.query(Artifact.id).filter(
             Artifact.id == artifact_id).first()
         if not artifact:
             abort(400, description='invalid artifact ID')
@@ -245,25 +578,38 @@ class ArtifactRecommendationAPI(Resource):
         #Authors of artifact for later
         authors = [res.name for res in authors_res]
 
-    
-        top_keywords = db.session.query(ArtifactTag.tag).filter(
-            ArtifactTag.artifact_id == artifact_id, ArtifactTag.source.like('%keywords%')).all()
-        if not top_keywords:
-            response = jsonify(
-                {"message": "The artifact doesnt have any top rated keywords"})
-        else:
-            keywords = [result.tag for result in top_keywords]
-            artifacts = search_artifacts(keywords=" or ".join(keywords), artifact_types = ARTIFACT_TYPES, page_num = page_num, items_per_page= 10, author_keywords = None,  organization = None, owner_keywords = None, badge_id_list = None)
-            res =  db.session.query(ArtifactRatings.artifact_id, func.count(ArtifactRatings.id).label('num_ratings'), func.avg(ArtifactRatings.rating).label('avg_rating')).group_by("artifact_id").filter(ArtifactRatings.artifact_id == artifact_id).first()
-            if res:
-                num_ratings = res.num_ratings if res.num_ratings else 0
-                avg_rating = round(res.avg_rating,2) if res.avg_rating else None
-            else:
-                num_ratings = 0
-                avg_rating = None
-            response = jsonify({"artifacts": artifacts, "avg_rating": float(avg_rating) if avg_rating else None, "num_ratings": num_ratings, "authors": authors})
-
+        # Recommendations are precomputed (see api.common.recommender); this
+        # is one indexed lookup of the artifact's neighbors.  Neighbors are
+        # only recommended while published, as in search.
+        neighbors = db.session.query(*search_result_columns(), ArtifactNeighbor.score
+                                    ).select_from(ArtifactNeighbor
+                                    ).join(Artifact, Artifact.id == ArtifactNeighbor.neighbor_id
+                                    ).join(ArtifactPublication, ArtifactPublication.artifact_id == ArtifactNeighbor.neighbor_id
+                                    ).join(ArtifactStats, Artifact.id == ArtifactStats.artifact_id, isouter=True
+                                    ).filter(ArtifactNeighbor.artifact_id == artifact_id
+                                    ).order_by(desc(ArtifactNeighbor.score), ArtifactNeighbor.neighbor_id).all()
+        if page_num < 1:
+            page_num = 1
+        recommended = []
+        for row in neighbors[(page_num - 1) * RECOMMENDATIONS_PER_PAGE:page_num * RECOMMENDATIONS_PER_PAGE]:
+            abstract = search_result_abstract(row)
+            abstract["score"] = row.score
+            recommended.append(abstract)
+        artifacts = {
+            "artifacts": recommended,
+            "page": page_num,
+            "total": len(neighbors),
+            "pages": int(math.ceil(len(neighbors) / RECOMMENDATIONS_PER_PAGE))
+        }
 
+        res = db.session.query(ArtifactStats.num_ratings, ArtifactStats.avg_rating).filter(ArtifactStats.artifact_id == artifact_id).first()
+        if res:
+            num_ratings = res.num_ratings if res.num_ratings else 0
+            avg_rating = round(res.avg_rating,2) if res.avg_rating else None
+        else:
+            num_ratings = 0
+            avg_rating = None
+        response = jsonify({"artifacts": artifacts, "avg_rating": float(avg_rating) if avg_rating else None, "num_ratings": num_ratings, "authors": authors})
 
         response.headers.add('Access-Control-Allow-Origin', '*')
         response.status_code = 200
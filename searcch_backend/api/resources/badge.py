@@ -1,6 +1,7 @@
 
 from searcch_backend.api.app import db, config_name
 from searcch_backend.api.common.auth import verify_api_key
+from searcch_backend.api.common.catalog import catalog_response
 from searcch_backend.models.model import Badge
 from searcch_backend.models.schema import BadgeSchema
 from flask import abort, jsonify, request
@@ -38,25 +39,18 @@ class BadgeResourceRoot(Resource):
         all_badges = args["all"]
         verified = args["verified"]
 
-        query = db.session.query(Badge)
-        if verified:
-            query = query.filter(Badge.verified == True)
-        query = query.order_by(asc(Badge.title))
-        if all_badges:
-            badges = query.all()
-        else:
-            badges = query.paginate(page=page, error_out=False, max_per_page=20).items
+        def build():
+            query = db.session.query(Badge)
+            if verified:
+                query = query.filter(Badge.verified == True)
+            query = query.order_by(asc(Badge.title))
+            if all_badges:
+                badges = query.all()
+            else:
+                badges = query.paginate(page=page, error_out=False, max_per_page=20).items
+            return { "badges": BadgeSchema(many=True).dump(badges) }
 
-        response = jsonify({"badges": BadgeSchema(many=True).dump(badges)})
-        response.status_code = 200
-        return response
-
-        response = jsonify({
-            "badges": badges
-            })
-        response.headers.add("Access-Control-Allow-Origin", "*")
-        response.status_code = 200
-        return response
+        return catalog_response(("badges",), build)
 
 
 class BadgeResource(Resource):
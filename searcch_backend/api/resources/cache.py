@@ -0,0 +1,44 @@
+# logic for /caches
+
+from searcch_backend.api.common.auth import (verify_api_key, has_token, verify_token)
+from searcch_backend.api.common.cache import (CACHES, get_cache_stats)
+from flask import abort, jsonify, request
+from flask_restful import Resource
+import logging
+
+LOG = logging.getLogger(__name__)
+
+
+class CacheResourceRoot(Resource):
+
+    def get(self):
+        """
+        Reports this worker's cache counters.
+        """
+        verify_api_key(request)
+        login_session = None
+        if has_token(request):
+            login_session = verify_token(request)
+        if login_session and not login_session.is_admin:
+            abort(403, description="unauthorized")
+
+        response = jsonify({"caches": get_cache_stats()})
+        response.status_code = 200
+        return response
+
+    def delete(self):
+        """
+        Clears all caches (in all workers, if their backend is shared).
+        Admin only.
+        """
+        verify_api_key(request)
+        login_session = verify_token(request)
+        if not login_session.is_admin:
+            abort(403, description="unauthorized")
+
+        for cache in CACHES.values():
+            cache.clear()
+
+        response = jsonify({"message": "cleared caches"})
+        response.status_code = 200
+        return response
@@ -2,7 +2,6 @@
 
 from searcch_backend.api.app import db, config_name
 from searcch_backend.api.common.auth import (verify_api_key, verify_token)
-from searcch_backend.api.resources.favorite import subquery_constructs
 from searcch_backend.models.model import *
 from searcch_backend.models.schema import *
 from flask import abort, jsonify, request, url_for
@@ -91,13 +90,10 @@ class ArtifactStatsAPI(Resource):
         login_session = verify_token(request)
 
         # Rating and review stats
-        sqratings, sqreviews = subquery_constructs()
-
-        artifact_list = db.session.query(Artifact, 'num_ratings', 'avg_rating', 'num_reviews'
-                                                ).join(sqratings, Artifact.id == sqratings.c.artifact_id, isouter=True
-                                                ).join(sqreviews, Artifact.id == sqreviews.c.artifact_id, isouter=True
-                                                ).filter(or_(sqratings.c.num_ratings > 0, sqreviews.c.num_reviews > 10)
-                                                ).order_by(sqratings.c.avg_rating.desc().nullslast(),sqreviews.c.num_reviews.desc()
+        artifact_list = db.session.query(Artifact, ArtifactStats.num_ratings, ArtifactStats.avg_rating, ArtifactStats.num_reviews
+                                                ).join(ArtifactStats, Artifact.id == ArtifactStats.artifact_id
+                                                ).filter(or_(ArtifactStats.num_ratings > 0, ArtifactStats.num_reviews > 10)
+                                                ).order_by(ArtifactStats.avg_rating.desc().nullslast(),ArtifactStats.num_reviews.desc()
                                                 ).all()
 
         ranked_artifacts = []
@@ -2,26 +2,13 @@
 
 from searcch_backend.api.app import db, config_name
 from searcch_backend.api.common.auth import (verify_api_key, verify_token)
+from searcch_backend.api.common.stats import update_artifact_stats
 from searcch_backend.models.model import *
 from searcch_backend.models.schema import *
 from flask import abort, jsonify, request, url_for, Blueprint
 from flask_restful import reqparse, Resource, fields, marshal
 from sqlalchemy import func, desc, sql
 
-def subquery_constructs():
-    sqratings = db.session.query(
-        ArtifactRatings.artifact_id,
-        func.count(ArtifactRatings.id).label('num_ratings'),
-        func.avg(ArtifactRatings.rating).label('avg_rating')
-    ).group_by("artifact_id").subquery()
-
-    sqreviews = db.session.query(
-        ArtifactReviews.artifact_id,
-        func.count(ArtifactReviews.id).label('num_reviews')
-    ).group_by("artifact_id").subquery()
-    
-    return sqratings, sqreviews
-
 class FavoritesListAPI(Resource):
     @staticmethod
     def generate_artifact_uri(artifact_id):
@@ -34,11 +21,8 @@ class FavoritesListAPI(Resource):
         if user_id != login_session.user_id:
             abort(401, description="insufficient permission to list favorites")
 
-        sqratings, sqreviews = subquery_constructs()
-
-        favorite_artifacts = db.session.query(Artifact, 'num_ratings', 'avg_rating', 'num_reviews'
-                                                ).join(sqratings, Artifact.id == sqratings.c.artifact_id, isouter=True
-                                                ).join(sqreviews, Artifact.id == sqreviews.c.artifact_id, isouter=True
+        favorite_artifacts = db.session.query(Artifact, ArtifactStats.num_ratings, ArtifactStats.avg_rating, ArtifactStats.num_reviews
+                                                ).join(ArtifactStats, Artifact.id == ArtifactStats.artifact_id, isouter=True
                                                 ).join(ArtifactFavorites, Artifact.id == ArtifactFavorites.artifact_id
                                                 ).filter(ArtifactFavorites.user_id == login_session.user_id
                                                 ).all()
@@ -80,6 +64,7 @@ class FavoriteAPI(Resource):
         new_favorite = ArtifactFavorites(
             user_id=login_session.user_id, artifact_id=artifact_id)
         db.session.add(new_favorite)
+        update_artifact_stats(db.session, artifact_id, favorites=1)
         db.session.commit()
 
         response = jsonify({"message": "added artifact to favorites list"})
@@ -94,6 +79,7 @@ class FavoriteAPI(Resource):
         existing_favorite = db.session.query(ArtifactFavorites).filter(
             ArtifactFavorites.user_id == login_session.user_id, ArtifactFavorites.artifact_id == artifact_id).first()
         if existing_favorite:
+            update_artifact_stats(db.session, artifact_id, favorites=-1)
             db.session.delete(existing_favorite)
             db.session.commit()
             response = jsonify(
@@ -15,6 +15,7 @@ from searcch_backend.api.app import db, config_name
 from searcch_backend.api.common.auth import (
     verify_api_key, has_token, verify_token)
 from searcch_backend.api.common.importer import schedule_import
+from searcch_backend.api.common.importer_client import importer_client
 
 
 LOG = logging.getLogger(__name__)
@@ -35,8 +36,9 @@ class ImporterCheckThread(threading.Thread):
         old_status = self.importer_instance.status
         old_admin_status = self.importer_instance.admin_status
         try:
-            r = requests.Session().get(url,headers={"X-Api-Key":self.importer_instance.key},
-                             timeout=4)
+            r = importer_client.get_status(
+                self.importer_instance.id,self.importer_instance.url,
+                self.importer_instance.key)
             if r.status_code != requests.codes.ok:
                 LOG.error("%s/status check failed (%d)" % (
                     self.importer_instance.url,r.status_code))
@@ -63,7 +65,7 @@ class ImporterCheckThread(threading.Thread):
         # Invoke the scheduler in case we changed state.
         if self.importer_instance.status != old_status \
           or self.importer_instance.admin_status != old_admin_status:
-            threading.Thread(target=schedule_import,name="schedule_import").start()
+            schedule_import()
 
 class ImporterResourceRoot(Resource):
 
@@ -208,10 +210,14 @@ class ImporterResource(Resource):
             importer_instance.admin_status_time = datetime.datetime.now()
         db.session.commit()
 
+        # An importer reporting itself up gets a fresh circuit breaker.
+        if j.get("status") == "up":
+            importer_client.reset(importer_instance.id)
+
         # Invoke the scheduler in case we changed state.
         if importer_instance.admin_status == "enabled" \
           and importer_instance.status == "up":
-            threading.Thread(target=schedule_import,name="schedule_import").start()
+            schedule_import()
 
         return Response(status=200)
 
@@ -1,6 +1,7 @@
 
 from searcch_backend.api.app import db, config_name
 from searcch_backend.api.common.auth import verify_api_key
+from searcch_backend.api.common.catalog import catalog_response
 from searcch_backend.models.model import License
 from searcch_backend.models.schema import LicenseSchema
 from flask import abort, jsonify, request
@@ -38,25 +39,18 @@ class LicenseResourceRoot(Resource):
         all_licenses = args["all"]
         verified = args["verified"]
 
-        query = db.session.query(License)
-        if verified:
-            query = query.filter(License.verified == True)
-        query = query.order_by(asc(License.long_name))
-        if all_licenses:
-            licenses = query.all()
-        else:
-            licenses = query.paginate(page=page, error_out=False, max_per_page=20).items
+        def build():
+            query = db.session.query(License)
+            if verified:
+                query = query.filter(License.verified == True)
+            query = query.order_by(asc(License.long_name))
+            if all_licenses:
+                licenses = query.all()
+            else:
+                licenses = query.paginate(page=page, error_out=False, max_per_page=20).items
+            return { "licenses": LicenseSchema(many=True).dump(licenses) }
 
-        response = jsonify({"licenses": LicenseSchema(many=True).dump(licenses)})
-        response.status_code = 200
-        return response
-
-        response = jsonify({
-            "licenses": licenses
-            })
-        response.headers.add("Access-Control-Allow-Origin", "*")
-        response.status_code = 200
-        return response
+        return catalog_response(("licenses",), build)
 
 
 class LicenseResource(Resource):
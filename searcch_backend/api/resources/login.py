@@ -9,7 +9,7 @@ import logging
 
 from searcch_backend.api.app import db, app, config_name
 from searcch_backend.api.common.auth import (
-    verify_api_key, lookup_token, verify_token)
+    verify_api_key, lookup_token, verify_token, invalidate_token)
 from searcch_backend.models.model import *
 from searcch_backend.models.schema import *
 
@@ -76,6 +76,7 @@ class LoginAPI(Resource):
         args = self.putparse.parse_args(strict=True)
         login_session.is_admin = args["is_admin"]
         db.session.commit()
+        invalidate_token(login_session.sso_token)
 
         return Response(status=200)
 
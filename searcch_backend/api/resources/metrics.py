@@ -0,0 +1,26 @@
+# logic for /metrics
+
+from searcch_backend.api.app import db, app
+from searcch_backend.api.common.auth import verify_api_key
+from searcch_backend.api.common.metrics import (metrics_enabled, generate_metrics)
+from flask import abort, request, Response
+from flask_restful import Resource
+import logging
+
+LOG = logging.getLogger(__name__)
+
+
+class MetricsAPI(Resource):
+
+    def get(self):
+        """
+        Exports request, database pool, cache and importer queue metrics,
+        aggregated over all workers, in the Prometheus text format.
+        """
+        if not app.config.get("METRICS_ALLOW_ANONYMOUS"):
+            verify_api_key(request)
+        if not metrics_enabled():
+            abort(404, description="metrics not enabled")
+
+        (body, content_type) = generate_metrics(db.session)
+        return Response(body, status=200, content_type=content_type)
@@ -1,6 +1,7 @@
 
 from searcch_backend.api.app import db, config_name
 from searcch_backend.api.common.auth import verify_api_key
+from searcch_backend.api.common.catalog import catalog_response
 from searcch_backend.models.model import Organization
 from searcch_backend.models.schema import OrganizationSchema
 from flask import abort, jsonify, request
@@ -45,27 +46,20 @@ class OrganizationListAPI(Resource):
         all_orgs = args["all"]
         verified = args["verified"]
 
-        query = db.session.query(Organization)
-        if verified:
-            query = query.filter(Organization.verified == True)
-        query = query.order_by(asc(Organization.name))
-        if all_orgs:
-            organizations = query.all()
-        else:
-            organizations = query.paginate(page=page, error_out=False, max_per_page=20).items
+        def build():
+            query = db.session.query(Organization)
+            if verified:
+                query = query.filter(Organization.verified == True)
+            query = query.order_by(asc(Organization.name))
+            if all_orgs:
+                organizations = query.all()
+            else:
+                organizations = query.paginate(page=page, error_out=False, max_per_page=20).items
+            d = { "organizations": OrganizationSchema(many=True).dump(organizations) }
+            d = filter_dict_or_list(d,None)
+            return d
 
-        d = { "organizations": OrganizationSchema(many=True).dump(organizations) }
-        d = filter_dict_or_list(d,None)
-        response = jsonify(d)
-        response.status_code = 200
-        return response
-
-        response = jsonify({
-            "organizations": organizations
-            })
-        response.headers.add("Access-Control-Allow-Origin", "*")
-        response.status_code = 200
-        return response
+        return catalog_response(("organizations",), build)
 
 
 class OrganizationAPI(Resource):
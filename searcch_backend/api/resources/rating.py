@@ -2,6 +2,7 @@
 
 from searcch_backend.api.app import db, config_name
 from searcch_backend.api.common.auth import (verify_api_key, verify_token)
+from searcch_backend.api.common.stats import update_artifact_stats
 from searcch_backend.models.model import *
 from searcch_backend.models.schema import *
 from flask import abort, jsonify, request, make_response, Blueprint
@@ -63,6 +64,8 @@ class RatingAPI(Resource):
         new_rating = ArtifactRatings(
             user_id=login_session.user_id, artifact_id=artifact_id, rating=rating)
         db.session.add(new_rating)
+        update_artifact_stats(
+            db.session, artifact_id, ratings=1, rating_sum=rating)
         db.session.commit()
 
         response = jsonify({"message": "added new rating"})
@@ -80,12 +83,17 @@ class RatingAPI(Resource):
         existing_rating = db.session.query(ArtifactRatings).filter(
             ArtifactRatings.user_id == login_session.user_id, ArtifactRatings.artifact_id == artifact_id).first()
         if existing_rating:
+            update_artifact_stats(
+                db.session, artifact_id,
+                rating_sum=rating - existing_rating.rating)
             existing_rating.rating = rating
             db.session.commit()
             msg = "updated rating"
         else:
             new_rating = ArtifactRatings(user_id=login_session.user_id, artifact_id=artifact_id, rating=rating)
             db.session.add(new_rating)
+            update_artifact_stats(
+                db.session, artifact_id, ratings=1, rating_sum=rating)
             db.session.commit()
             msg = "added new rating"
 
@@ -101,6 +109,8 @@ class RatingAPI(Resource):
         rating = db.session.query(ArtifactRatings).filter(
             ArtifactRatings.user_id == login_session.user_id, ArtifactRatings.artifact_id == artifact_id).first()
         if rating:
+            update_artifact_stats(
+                db.session, artifact_id, ratings=-1, rating_sum=-rating.rating)
             db.session.delete(rating)
             db.session.commit()
             response = jsonify({"message": "deleted rating"})
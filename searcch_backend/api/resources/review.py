@@ -2,6 +2,7 @@
 
 from searcch_backend.api.app import db, config_name
 from searcch_backend.api.common.auth import (verify_api_key, verify_token)
+from searcch_backend.api.common.stats import update_artifact_stats
 from searcch_backend.models.model import *
 from searcch_backend.models.schema import *
 from datetime import datetime
@@ -73,6 +74,7 @@ class ReviewAPI(Resource):
             new_review = ArtifactReviews(
                 user_id=login_session.user_id, artifact_id=artifact_id, review=review, review_time=datetime.now())
             db.session.add(new_review)
+            update_artifact_stats(db.session, artifact_id, reviews=1)
             message = "added new review"
         db.session.commit()
 
@@ -114,6 +116,7 @@ class ReviewAPI(Resource):
         existing_review = db.session.query(ArtifactReviews).filter(
             ArtifactReviews.id == review_id, ArtifactReviews.user_id == login_session.user_id, ArtifactReviews.artifact_id == artifact_id).first()
         if existing_review:
+            update_artifact_stats(db.session, artifact_id, reviews=-1)
             db.session.delete(existing_review)
             db.session.commit()
             response = jsonify({"message": "deleted review"})
@@ -1,21 +1,36 @@
 
-from searcch_backend.api.app import db, config_name
+from searcch_backend.api.app import app, db, config_name
 from searcch_backend.api.common.sql import class_to_jsonschema
+from searcch_backend.api.common.response import make_etag, not_modified
+from searcch_backend.api.common.catalog import json_bytes_response
 from searcch_backend.models.model import (Artifact, Affiliation)
 from flask import (abort, jsonify)
 from flask_restful import Resource
 
+# The schema of a class only changes with the code, so its document is
+# generated and serialized once, at startup.
+_schema_docs = {}
+
+def _load_schema_doc(obj_class):
+    with app.app_context():
+        body = jsonify(class_to_jsonschema(obj_class)).get_data()
+    _schema_docs[obj_class] = (body, make_etag("schema", body))
+
+for obj_class in (Artifact, Affiliation):
+    _load_schema_doc(obj_class)
+
+def _schema_response(obj_class):
+    (body, etag) = _schema_docs[obj_class]
+    response = not_modified(etag)
+    if response:
+        return response
+    return json_bytes_response(body, etag)
+
 
 class SchemaArtifactAPI(Resource):
     def get(self):
-        response = jsonify(class_to_jsonschema(Artifact))
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.status_code = 200
-        return response
+        return _schema_response(Artifact)
 
 class SchemaAffiliationAPI(Resource):
     def get(self):
-        response = jsonify(class_to_jsonschema(Affiliation))
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.status_code = 200
-        return response
+        return _schema_response(Affiliation)
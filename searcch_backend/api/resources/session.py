@@ -1,8 +1,9 @@
 # logic for /rating
 
 from searcch_backend.api.app import db, config_name
-from searcch_backend.api.common.auth import (verify_api_key, verify_token)
+from searcch_backend.api.common.auth import (verify_api_key, verify_token, invalidate_token)
 from searcch_backend.api.common.sql import object_from_json
+from searcch_backend.api.common.typeahead import contains_filter
 from searcch_backend.models.model import *
 from searcch_backend.models.schema import *
 from flask import abort, jsonify, request, url_for, Blueprint
@@ -66,10 +67,8 @@ class SessionResourceRoot(Resource):
           join(User, Sessions.user_id == User.id).\
           join(Person, User.person_id == Person.id)
         if args["owner"]:
-            owner_cond = "%" + args["owner"] + "%"
             sessions = sessions.\
-              filter(or_(Person.name.ilike(owner_cond),
-                         Person.email.ilike(owner_cond)))
+              filter(contains_filter((Person.name, Person.email), args["owner"]))
         if args["can_admin"] is not None:
             sessions = sessions.\
               filter(User.can_admin == bool(args["can_admin"]))
@@ -135,8 +134,10 @@ class SessionResource(Resource):
           and not login_session.is_admin:
             abort(401, description="unauthorized")
 
+        sso_token = session.sso_token
         db.session.delete(session)
         db.session.commit()
+        invalidate_token(sso_token)
 
         response = jsonify({ "message": "session %r deleted" % (session_id,) })
         response.headers.add('Access-Control-Allow-Origin', '*')
@@ -0,0 +1,65 @@
+# logic for /slowqueries
+
+from searcch_backend.api.app import app
+from searcch_backend.api.common.auth import (verify_api_key, has_token, verify_token)
+from searcch_backend.api.common import slowquery
+from flask import abort, jsonify, request
+from flask_restful import reqparse, Resource
+import logging
+
+LOG = logging.getLogger(__name__)
+
+
+class SlowQueryResourceRoot(Resource):
+
+    def __init__(self):
+        self.getparse = reqparse.RequestParser()
+        self.getparse.add_argument(
+            name="limit", type=int, required=False, location="args",
+            help="maximum number of records")
+        self.getparse.add_argument(
+            name="endpoint", type=str, required=False, location="args",
+            help="only records from this endpoint (e.g. api.artifact_search)")
+        super(SlowQueryResourceRoot, self).__init__()
+
+    def get(self):
+        """
+        Lists this worker's recent slow queries, newest first.
+        """
+        verify_api_key(request)
+        login_session = None
+        if has_token(request):
+            login_session = verify_token(request)
+        if login_session and not login_session.is_admin:
+            abort(403, description="unauthorized")
+
+        recorder = slowquery.slow_query_recorder
+        if not recorder:
+            abort(404, description="slow query log not enabled")
+        args = self.getparse.parse_args()
+        response = jsonify({
+            "threshold_ms": app.config.get("SLOW_QUERY_THRESHOLD_MS"),
+            "explain_sample_rate": app.config.get("SLOW_QUERY_EXPLAIN_SAMPLE_RATE"),
+            "total": recorder.count,
+            "slow_queries": recorder.get_records(
+                limit=args["limit"], endpoint=args["endpoint"]) })
+        response.status_code = 200
+        return response
+
+    def delete(self):
+        """
+        Clears this worker's recent slow queries.
+        """
+        verify_api_key(request)
+        login_session = verify_token(request)
+        if not login_session.is_admin:
+            abort(403, description="unauthorized")
+
+        recorder = slowquery.slow_query_recorder
+        if not recorder:
+            abort(404, description="slow query log not enabled")
+        recorder.clear()
+
+        response = jsonify({"message": "cleared slow queries"})
+        response.status_code = 200
+        return response
@@ -0,0 +1,96 @@
+# logic for /typeahead
+
+from searcch_backend.api.app import db, config_name
+from searcch_backend.api.common.auth import (verify_api_key, verify_token)
+from searcch_backend.api.common.typeahead import typeahead
+from searcch_backend.models.model import Organization, Person, Badge
+from flask import abort, jsonify, request
+from flask_restful import reqparse, Resource
+import logging
+
+LOG = logging.getLogger(__name__)
+
+MAX_LIMIT = 50
+
+
+class TypeaheadResource(Resource):
+    """
+    Returns the top-K matches for a (partial) name, by trigram similarity.
+    """
+    def __init__(self):
+        self.getparse = reqparse.RequestParser()
+        self.getparse.add_argument(
+            name="q", type=str, required=True, location="args",
+            help="missing text to match")
+        self.getparse.add_argument(
+            name="limit", type=int, required=False, default=10, location="args",
+            help="maximum number of matches")
+        super(TypeaheadResource, self).__init__()
+
+    def parse_args(self):
+        args = self.getparse.parse_args()
+        args["q"] = args["q"].strip()
+        if not args["q"]:
+            abort(400, description="q must not be empty")
+        if args["limit"] < 1 or args["limit"] > MAX_LIMIT:
+            abort(400, description="limit must be between 1 and %d" % (MAX_LIMIT,))
+        return args
+
+    def respond(self, key, matches):
+        response = jsonify({key: matches})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.status_code = 200
+        return response
+
+
+class OrganizationTypeaheadAPI(TypeaheadResource):
+    def __init__(self):
+        super(OrganizationTypeaheadAPI, self).__init__()
+        self.getparse.add_argument(
+            name="verified", type=int, required=False, location="args",
+            help="if 1, match only verified organizations")
+
+    def get(self):
+        args = self.parse_args()
+        query = db.session.query(
+            Organization.id, Organization.name, Organization.type,
+            Organization.verified)
+        if args["verified"]:
+            query = query.filter(Organization.verified == True)
+        rows = typeahead(query, (Organization.name,), args["q"], args["limit"])
+        return self.respond("organizations", [
+            dict(id=id, name=name, type=org_type, verified=verified, score=score)
+            for (id, name, org_type, verified, score) in rows ])
+
+
+class PersonTypeaheadAPI(TypeaheadResource):
+    def get(self):
+        verify_api_key(request)
+        login_session = verify_token(request)
+        args = self.parse_args()
+
+        # Only admins may match on (and see) email addresses.
+        if login_session.is_admin:
+            query = db.session.query(Person.id, Person.name, Person.email)
+            rows = typeahead(
+                query, (Person.name, Person.email), args["q"], args["limit"])
+            matches = [ dict(id=id, name=name, email=email, score=score)
+                        for (id, name, email, score) in rows ]
+        else:
+            query = db.session.query(Person.id, Person.name)
+            rows = typeahead(query, (Person.name,), args["q"], args["limit"])
+            matches = [ dict(id=id, name=name, score=score)
+                        for (id, name, score) in rows ]
+        return self.respond("persons", matches)
+
+
+class BadgeTypeaheadAPI(TypeaheadResource):
+    def get(self):
+        args = self.parse_args()
+        query = db.session.query(
+            Badge.id, Badge.title, Badge.version, Badge.organization)
+        rows = typeahead(query, (Badge.title,), args["q"], args["limit"])
+        return self.respond("badges", [
+            dict(id=id, title=title, version=version, organization=organization,
+                 score=score)
+            for (id, title, version, organization, score) in rows ])
@@ -3,6 +3,9 @@
 from searcch_backend.api.app import db, config_name
 from searcch_backend.api.common.auth import (verify_api_key, verify_token)
 from searcch_backend.api.common.sql import object_from_json
+from searcch_backend.api.common.projection import (
+    Projection, ProjectionError, add_projection_arguments)
+from searcch_backend.api.common.typeahead import contains_filter
 from searcch_backend.models.model import *
 from searcch_backend.models.schema import *
 from flask import abort, jsonify, request, url_for, Blueprint
@@ -59,10 +62,8 @@ class UsersIndexAPI(Resource):
         users = users.\
           join(Person, User.person_id == Person.id)
         if args["owner"]:
-            owner_cond = "%" + args["owner"] + "%"
             users = users.\
-              filter(or_(Person.name.ilike(owner_cond),
-                         Person.email.ilike(owner_cond)))
+              filter(contains_filter((Person.name, Person.email), args["owner"]))
         if args["can_admin"] is not None:
             users = users.\
               filter(User.can_admin == bool(args["can_admin"]))
@@ -215,15 +216,25 @@ class UserProfileAPI(Resource):
         return response
 
 class UserArtifactsAPI(Resource):
+    def __init__(self):
+        self.getparse = reqparse.RequestParser()
+        add_projection_arguments(self.getparse)
+
+        super(UserArtifactsAPI, self).__init__()
+
     def get(self):
         verify_api_key(request)
         login_session = verify_token(request)
 
-        #logged in user record
-        user = db.session.query(User).filter(User.id == login_session.user_id).first()
+        args = self.getparse.parse_args()
+        try:
+            projection = Projection(
+                ArtifactSchema, fields=args["fields"], expand=args["expand"])
+        except ProjectionError as ex:
+            abort(400, description=str(ex))
 
-        artifact_schema = ArtifactSchema(many=True)
-        owned_artifacts = db.session.query(Artifact).filter(Artifact.owner_id == login_session.user_id)
+        artifact_schema = projection.schema(ArtifactSchema, many=True)
+        owned_artifacts = projection.apply(db.session.query(Artifact)).filter(Artifact.owner_id == login_session.user_id)
 
         response = jsonify({
             "owned_artifacts": artifact_schema.dump(owned_artifacts)
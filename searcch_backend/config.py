@@ -4,6 +4,98 @@ class Config(object):
     """
     API_VERSION = 1
     APPLICATION_ROOT = '/v{}'.format(API_VERSION)
+    # Send ORM and Core executemany() INSERTs as multi-row INSERT ... VALUES
+    # statements (psycopg2's execute_values), and other executemany()
+    # statements in pages (execute_batch), rather than one round trip per
+    # row.  Bulk ingest relies on this.
+    SQLALCHEMY_ENGINE_OPTIONS = { "executemany_mode": "values" }
+    # Validated-session cache.  The "file" backend shares invalidations
+    # (logout, admin toggles) between workers on this host via marker files
+    # in SESSION_CACHE_DIR (default: a directory under the system tmpdir);
+    # "memory" only invalidates in the worker that made the change.
+    SESSION_CACHE_ENABLED = True
+    SESSION_CACHE_SIZE = 4096
+    SESSION_CACHE_TTL = 60
+    SESSION_CACHE_BACKEND = "file"
+    SESSION_CACHE_DIR = None
+    # If set, artifact file contents are stored in a content-addressed blob
+    # store in this directory, rather than in the database.  Use
+    # `flask migrate-blobs` to move existing contents.
+    BLOB_STORE_DIR = None
+    # Seconds between import scheduler passes, in addition to the passes
+    # triggered by import and importer state changes.
+    IMPORT_SCHEDULER_INTERVAL = 30
+    # Importer HTTP client: timeouts (seconds), per-importer keep-alive pool
+    # size, retries (connection errors and 502/503/504 only), and the number
+    # of consecutive failures after which an importer is marked stale and
+    # not contacted for IMPORTER_CIRCUIT_RESET seconds.
+    IMPORTER_CONNECT_TIMEOUT = 3.05
+    IMPORTER_READ_TIMEOUT = 10
+    IMPORTER_POOL_SIZE = 4
+    IMPORTER_RETRIES = 2
+    IMPORTER_RETRY_BACKOFF = 0.5
+    IMPORTER_CIRCUIT_FAILURES = 3
+    IMPORTER_CIRCUIT_RESET = 60
+    # If True, send an importer several scheduled imports as one JSON array
+    # (falling back to one at a time if it refuses).
+    IMPORTER_BATCH_DISPATCH = False
+    # Artifacts per transaction in bulk ingest (POST /artifacts/bulk and
+    # `flask ingest-artifacts`).
+    BULK_INGEST_BATCH_SIZE = 500
+    # Compress JSON responses of at least COMPRESS_MIN_SIZE bytes: brotli
+    # (if the brotli or brotlicffi module is installed) or gzip, as the
+    # client accepts.
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 5
+    # Serialized organization, badge, and license catalog responses, keyed
+    # by their tables' versions (so never stale).
+    CATALOG_CACHE_ENABLED = True
+    CATALOG_CACHE_SIZE = 128
+    CATALOG_CACHE_TTL = 3600
+    # Search facet counts (/artifact/search?facets=...), by normalized
+    # search filters.  Counts may lag writes by up to the TTL.
+    SEARCH_FACET_CACHE_ENABLED = True
+    SEARCH_FACET_CACHE_SIZE = 1024
+    SEARCH_FACET_CACHE_TTL = 60
+    # Search results, by normalized search arguments and search generation
+    # (which changes when the search index, publications, or the tables
+    # search filters match on do).  Rating changes may lag by up to the TTL.
+    SEARCH_CACHE_ENABLED = True
+    SEARCH_CACHE_SIZE = 1024
+    SEARCH_CACHE_TTL = 300
+    # Recommendations: neighbors kept per artifact, and how often (seconds;
+    # 0 disables) and in what batches each worker's background refresher
+    # recomputes changed artifacts.  `flask rebuild-recommendations`
+    # recomputes everything.
+    RECOMMENDER_NEIGHBORS = 10
+    RECOMMENDER_REFRESH_INTERVAL = 300
+    RECOMMENDER_REFRESH_BATCH_SIZE = 500
+    # Per-request instrumentation: for this fraction of requests, count SQL
+    # statements and rows, and time the database, serialization, JSON
+    # encoding, and compression; report them in a Server-Timing header and
+    # (if INSTRUMENTATION_LOG) a JSON log line.
+    INSTRUMENTATION_ENABLED = True
+    INSTRUMENTATION_SAMPLE_RATE = 0.05
+    INSTRUMENTATION_LOG = True
+    # Prometheus metrics at /metrics (needs prometheus_client).  Under
+    # gunicorn, set PROMETHEUS_MULTIPROC_DIR (env/gunicorn_conf.py does) so
+    # that all workers' metrics are aggregated.
+    METRICS_ENABLED = True
+    METRICS_ALLOW_ANONYMOUS = False
+    # Slow query log (opt-in): statements slower than the threshold are
+    # kept (the last SLOW_QUERY_LOG_SIZE per worker, at /slowqueries), and
+    # appended to SLOW_QUERY_LOG_FILE as JSON lines if set.  This fraction
+    # of slow SELECTs is re-run under EXPLAIN (ANALYZE, BUFFERS), in a
+    # savepoint, with a statement timeout; SELECTs that take locks or
+    # sequence values are only EXPLAINed.
+    SLOW_QUERY_ENABLED = False
+    SLOW_QUERY_THRESHOLD_MS = 500
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE = 0.1
+    SLOW_QUERY_EXPLAIN_TIMEOUT_MS = 10000
+    SLOW_QUERY_LOG_SIZE = 200
+    SLOW_QUERY_LOG_FILE = None
 
 
 class DevelopmentConfig(Config):
@@ -17,6 +109,7 @@ class DevelopmentConfig(Config):
     SESSION_TIMEOUT_IN_MINUTES = 120
     DB_AUTO_MIGRATE = True
     JSON_SORT_KEYS = False
+    INSTRUMENTATION_SAMPLE_RATE = 1.0
 
 
 class ProductionConfig(Config):
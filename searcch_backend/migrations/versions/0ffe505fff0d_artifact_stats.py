@@ -0,0 +1,57 @@
+"""artifact stats
+
+Revision ID: 0ffe505fff0d
+Revises: a3af4a7c1f4f
+Create Date: 2026-10-18 19:02:47.118530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0ffe505fff0d'
+down_revision = 'a3af4a7c1f4f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('artifact_stats',
+        sa.Column('artifact_id', sa.Integer(), nullable=False),
+        sa.Column('num_ratings', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('avg_rating', sa.Float(), nullable=True),
+        sa.Column('num_reviews', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('num_favorites', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['artifact_id'], ['artifacts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('artifact_id')
+    )
+
+    # Backfill.
+    op.execute(
+        "insert into artifact_stats"
+        "  (artifact_id, num_ratings, rating_sum, avg_rating, num_reviews, num_favorites)"
+        " select A.id, coalesce(R.num_ratings, 0), coalesce(R.rating_sum, 0),"
+        "   R.rating_sum::float / nullif(R.num_ratings, 0),"
+        "   coalesce(V.num_reviews, 0), coalesce(F.num_favorites, 0)"
+        " from artifacts A"
+        " left join ("
+        "   select artifact_id, count(id) as num_ratings, sum(rating) as rating_sum"
+        "   from artifact_ratings group by artifact_id"
+        " ) R on A.id = R.artifact_id"
+        " left join ("
+        "   select artifact_id, count(id) as num_reviews"
+        "   from artifact_reviews group by artifact_id"
+        " ) V on A.id = V.artifact_id"
+        " left join ("
+        "   select artifact_id, count(id) as num_favorites"
+        "   from artifact_favorites group by artifact_id"
+        " ) F on A.id = F.artifact_id"
+        " where R.artifact_id is not null or V.artifact_id is not null"
+        "   or F.artifact_id is not null;"
+    )
+
+
+def downgrade():
+    op.drop_table('artifact_stats')
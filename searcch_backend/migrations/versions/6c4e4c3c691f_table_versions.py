@@ -0,0 +1,135 @@
+"""table versions and artifact generations
+
+Revision ID: 6c4e4c3c691f
+Revises: 8e0a61dfafe1
+Create Date: 2026-10-18 21:14:05.310274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c4e4c3c691f'
+down_revision = '8e0a61dfafe1'
+branch_labels = None
+depends_on = None
+
+# Tables whose table_versions counter is bumped by every statement that
+# modifies them; used as ETags (and cache keys) for catalog responses, and
+# for the shared objects embedded in artifact responses.
+VERSIONED_TABLES = [
+    "organizations", "badges", "licenses", "persons", "users",
+    "affiliations", "importers", "exporters",
+]
+
+# Tables whose rows belong to an artifact (by artifact_id); a change to any
+# of them bumps the artifact's artifact_stats.generation.
+ARTIFACT_CHILD_TABLES = [
+    "artifact_files", "artifact_funding", "artifact_metadata",
+    "artifact_publications", "artifact_tags", "artifact_curations",
+    "artifact_affiliations", "artifact_relationships", "artifact_releases",
+    "artifact_badges", "artifact_ratings", "artifact_reviews",
+]
+
+
+def upgrade():
+    op.create_table('table_versions',
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('version', sa.BigInteger(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.execute(
+        "create or replace function table_version_bump() returns trigger"
+        " language plpgsql as $$"
+        " begin"
+        "   insert into table_versions (name, version) values (TG_TABLE_NAME, 1)"
+        "   on conflict (name) do update"
+        "     set version = table_versions.version + 1;"
+        "   return null;"
+        " end $$;")
+    for table in VERSIONED_TABLES:
+        op.execute(
+            "insert into table_versions (name, version) values ('%s', 1)"
+            % (table,))
+        op.execute(
+            "create trigger %s_version_bump"
+            " after insert or update or delete or truncate on %s"
+            " for each statement execute procedure table_version_bump();"
+            % (table, table))
+
+    op.execute("create sequence artifact_generation_seq;")
+    op.add_column('artifact_stats', sa.Column(
+        'generation', sa.BigInteger(),
+        server_default=sa.text("nextval('artifact_generation_seq')"),
+        nullable=False))
+    op.execute(
+        "alter sequence artifact_generation_seq"
+        " owned by artifact_stats.generation;")
+    # Every artifact gets a stats row, so that every artifact has a
+    # generation.
+    op.execute(
+        "insert into artifact_stats (artifact_id)"
+        " select id from artifacts"
+        " on conflict (artifact_id) do nothing;")
+
+    op.execute(
+        "create or replace function artifact_touch_id(aid integer) returns void"
+        " language plpgsql as $$"
+        " begin"
+        "   if aid is null then"
+        "     return;"
+        "   end if;"
+        "   insert into artifact_stats (artifact_id) values (aid)"
+        "   on conflict (artifact_id) do update"
+        "     set generation = nextval('artifact_generation_seq');"
+        " end $$;")
+    op.execute(
+        "create or replace function artifact_touch() returns trigger"
+        " language plpgsql as $$"
+        " declare"
+        "   rec record;"
+        " begin"
+        "   if TG_OP = 'DELETE' then"
+        "     rec := OLD;"
+        "   else"
+        "     rec := NEW;"
+        "   end if;"
+        "   if TG_TABLE_NAME = 'artifacts' then"
+        "     perform artifact_touch_id(rec.id);"
+        "     return null;"
+        "   end if;"
+        "   perform artifact_touch_id(rec.artifact_id);"
+        "   if TG_OP = 'UPDATE' and OLD.artifact_id is distinct from NEW.artifact_id then"
+        "     perform artifact_touch_id(OLD.artifact_id);"
+        "   end if;"
+        "   if TG_TABLE_NAME = 'artifact_relationships' then"
+        "     perform artifact_touch_id(rec.related_artifact_id);"
+        "   end if;"
+        "   return null;"
+        " end $$;")
+    # A deleted artifact's stats row goes with it (on delete cascade).
+    op.execute(
+        "create trigger artifacts_touch"
+        " after insert or update on artifacts"
+        " for each row execute procedure artifact_touch();")
+    for table in ARTIFACT_CHILD_TABLES:
+        op.execute(
+            "create trigger %s_touch"
+            " after insert or update or delete on %s"
+            " for each row execute procedure artifact_touch();"
+            % (table, table))
+
+
+def downgrade():
+    for table in ARTIFACT_CHILD_TABLES:
+        op.execute("drop trigger if exists %s_touch on %s;" % (table, table))
+    op.execute("drop trigger if exists artifacts_touch on artifacts;")
+    op.execute("drop function if exists artifact_touch();")
+    op.execute("drop function if exists artifact_touch_id(integer);")
+    op.drop_column('artifact_stats', 'generation')
+    op.execute("drop sequence if exists artifact_generation_seq;")
+    for table in VERSIONED_TABLES:
+        op.execute("drop trigger if exists %s_version_bump on %s;" % (table, table))
+    op.execute("drop function if exists table_version_bump();")
+    op.drop_table('table_versions')
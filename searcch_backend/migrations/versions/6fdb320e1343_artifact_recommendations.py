@@ -0,0 +1,55 @@
+"""artifact recommendations
+
+Revision ID: 6fdb320e1343
+Revises: 9b61d2464768
+Create Date: 2026-10-18 23:20:44.187305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6fdb320e1343'
+down_revision = '9b61d2464768'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('artifact_terms',
+        sa.Column('artifact_id', sa.Integer(), nullable=False),
+        sa.Column('term', sa.String(length=64), nullable=False),
+        sa.Column('weight', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['artifact_id'], ['artifacts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('artifact_id', 'term')
+    )
+    op.create_index('artifact_terms_term_idx', 'artifact_terms', ['term'])
+    op.create_table('artifact_neighbors',
+        sa.Column('artifact_id', sa.Integer(), nullable=False),
+        sa.Column('neighbor_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['artifact_id'], ['artifacts.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['neighbor_id'], ['artifacts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('artifact_id', 'neighbor_id')
+    )
+    op.create_index('artifact_neighbors_score_idx', 'artifact_neighbors',
+                    ['artifact_id', sa.text('score desc')])
+    op.create_index('artifact_neighbors_neighbor_idx', 'artifact_neighbors',
+                    ['neighbor_id'])
+    op.create_table('artifact_recommendation_state',
+        sa.Column('artifact_id', sa.Integer(), nullable=False),
+        sa.Column('generation', sa.BigInteger(), nullable=False),
+        sa.Column('mtime', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['artifact_id'], ['artifacts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('artifact_id')
+    )
+
+
+def downgrade():
+    op.drop_table('artifact_recommendation_state')
+    op.drop_index('artifact_neighbors_neighbor_idx')
+    op.drop_index('artifact_neighbors_score_idx')
+    op.drop_table('artifact_neighbors')
+    op.drop_index('artifact_terms_term_idx')
+    op.drop_table('artifact_terms')
@@ -0,0 +1,51 @@
+"""search generation covers search filters
+
+Revision ID: 7f208058e84c
+Revises: 8e709b4ed82c
+Create Date: 2026-10-19 10:12:37.518640
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f208058e84c'
+down_revision = '8e709b4ed82c'
+branch_labels = None
+depends_on = None
+
+# Artifact child tables that search filters (badge=, author=,
+# organization=) join, and that are not otherwise versioned.
+SEARCH_FILTER_TABLES = [ "artifact_badges", "artifact_affiliations" ]
+
+
+def upgrade():
+    for table in SEARCH_FILTER_TABLES:
+        op.execute(
+            "insert into table_versions (name, version) values ('%s', 1)"
+            " on conflict (name) do nothing;" % (table,))
+        op.execute(
+            "create trigger %s_version_bump"
+            " after insert or update or delete or truncate on %s"
+            " for each statement execute procedure table_version_bump();"
+            % (table, table))
+    # The artifacts columns that search filters (type=, owner=) or result
+    # abstracts use, and that artifact_search_view does not cover.  Only
+    # these bump the "artifacts" version; inserts do not matter until an
+    # artifact is published, and deletes also delete its publication.
+    op.execute(
+        "insert into table_versions (name, version) values ('artifacts', 1)"
+        " on conflict (name) do nothing;")
+    op.execute(
+        "create trigger artifacts_search_version_bump"
+        " after update of type, owner_id, url on artifacts"
+        " for each statement execute procedure table_version_bump();")
+
+
+def downgrade():
+    op.execute("drop trigger if exists artifacts_search_version_bump on artifacts;")
+    op.execute("delete from table_versions where name = 'artifacts';")
+    for table in SEARCH_FILTER_TABLES:
+        op.execute("drop trigger if exists %s_version_bump on %s;" % (table, table))
+        op.execute("delete from table_versions where name = '%s';" % (table,))
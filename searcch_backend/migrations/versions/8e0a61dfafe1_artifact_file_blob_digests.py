@@ -0,0 +1,30 @@
+"""artifact file blob digests
+
+Revision ID: 8e0a61dfafe1
+Revises: 0ffe505fff0d
+Create Date: 2026-10-18 19:41:05.530112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e0a61dfafe1'
+down_revision = '0ffe505fff0d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('artifact_files', sa.Column('content_digest', sa.String(length=64), nullable=True))
+    op.add_column('artifact_files', sa.Column('content_size', sa.BigInteger(), nullable=True))
+    op.add_column('artifact_file_members', sa.Column('content_digest', sa.String(length=64), nullable=True))
+    op.add_column('artifact_file_members', sa.Column('content_size', sa.BigInteger(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('artifact_file_members', 'content_size')
+    op.drop_column('artifact_file_members', 'content_digest')
+    op.drop_column('artifact_files', 'content_size')
+    op.drop_column('artifact_files', 'content_digest')
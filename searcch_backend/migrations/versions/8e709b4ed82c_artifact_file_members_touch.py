@@ -0,0 +1,56 @@
+"""artifact file members touch trigger
+
+Revision ID: 8e709b4ed82c
+Revises: 6fdb320e1343
+Create Date: 2026-10-18 23:58:12.604417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e709b4ed82c'
+down_revision = '6fdb320e1343'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # artifact_file_members rows belong to an artifact through their parent
+    # artifact_files row, so artifact_touch() (which wants an artifact_id)
+    # cannot be used.  If the parent file is gone (a cascaded delete), its
+    # own trigger has already touched the artifact.
+    op.execute(
+        "create or replace function artifact_file_member_touch() returns trigger"
+        " language plpgsql as $$"
+        " declare"
+        "   old_file_id integer;"
+        " begin"
+        "   if TG_OP = 'DELETE' then"
+        "     old_file_id := OLD.parent_file_id;"
+        "   else"
+        "     perform artifact_touch_id("
+        "       (select artifact_id from artifact_files where id = NEW.parent_file_id));"
+        "     if TG_OP = 'UPDATE'"
+        "        and OLD.parent_file_id is distinct from NEW.parent_file_id then"
+        "       old_file_id := OLD.parent_file_id;"
+        "     end if;"
+        "   end if;"
+        "   if old_file_id is not null then"
+        "     perform artifact_touch_id("
+        "       (select artifact_id from artifact_files where id = old_file_id));"
+        "   end if;"
+        "   return null;"
+        " end $$;")
+    op.execute(
+        "create trigger artifact_file_members_touch"
+        " after insert or update or delete on artifact_file_members"
+        " for each row execute procedure artifact_file_member_touch();")
+
+
+def downgrade():
+    op.execute(
+        "drop trigger if exists artifact_file_members_touch"
+        " on artifact_file_members;")
+    op.execute("drop function if exists artifact_file_member_touch();")
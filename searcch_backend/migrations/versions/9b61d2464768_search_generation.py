@@ -0,0 +1,38 @@
+"""search generation
+
+Revision ID: 9b61d2464768
+Revises: d13b1b906654
+Create Date: 2026-10-18 22:47:19.603128
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b61d2464768'
+down_revision = 'd13b1b906654'
+branch_labels = None
+depends_on = None
+
+# The search index, and the table that decides which artifacts are
+# searchable; together, their table_versions are the search generation.
+SEARCH_TABLES = [ "artifact_search_view", "artifact_publications" ]
+
+
+def upgrade():
+    for table in SEARCH_TABLES:
+        op.execute(
+            "insert into table_versions (name, version) values ('%s', 1)"
+            " on conflict (name) do nothing;" % (table,))
+        op.execute(
+            "create trigger %s_version_bump"
+            " after insert or update or delete or truncate on %s"
+            " for each statement execute procedure table_version_bump();"
+            % (table, table))
+
+
+def downgrade():
+    for table in SEARCH_TABLES:
+        op.execute("drop trigger if exists %s_version_bump on %s;" % (table, table))
+        op.execute("delete from table_versions where name = '%s';" % (table,))
@@ -0,0 +1,204 @@
+"""incremental search index
+
+Revision ID: a3af4a7c1f4f
+Revises: 3b98c44ef5b2
+Create Date: 2026-10-18 18:20:11.402183
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'a3af4a7c1f4f'
+down_revision = '3b98c44ef5b2'
+branch_labels = None
+depends_on = None
+
+
+#
+# The per-artifact search document.  This must match the expression used by
+# the old materialized view, except that tags are now joined on the artifact
+# itself (the view joined them on the metadata subquery, so artifacts without
+# indexed metadata lost their tags).
+#
+SEARCH_METADATA_NAMES = \
+    "('full_name', 'topics', 'languages', 'owner_login', 'owner_name')"
+
+
+def upgrade():
+    # Remove the statement-level full refresh.
+    op.execute("DROP TRIGGER IF EXISTS refresh_mat_view on artifacts;")
+    op.execute("DROP FUNCTION IF EXISTS public.refresh_mat_view;")
+    op.execute("DROP INDEX IF EXISTS doc_idx;")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS artifact_search_view;")
+
+    op.create_table('artifact_search_view',
+        sa.Column('artifact_id', sa.Integer(), nullable=False),
+        sa.Column('doc_vector', postgresql.TSVECTOR(), nullable=True),
+        sa.ForeignKeyConstraint(['artifact_id'], ['artifacts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('artifact_id')
+    )
+    op.create_index('doc_idx', 'artifact_search_view', [sa.text("doc_vector")], postgresql_using='gin')
+
+    #
+    # Artifacts whose search document must be rebuilt before the current
+    # transaction commits.  Rows only live for the duration of a transaction.
+    #
+    op.create_table('artifact_search_dirty',
+        sa.Column('artifact_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('artifact_id')
+    )
+
+    op.execute(
+        "create or replace function artifact_search_view_refresh(aid integer)"
+        " returns void language plpgsql"
+        " as $$"
+        " begin"
+        "     insert into artifact_search_view (artifact_id, doc_vector)"
+        "     select A.id, to_tsvector('english', coalesce(A.title, '') || ' ' || coalesce(A.description, '') || ' ' || coalesce(AM.metadata_str, '') || ' ' || coalesce(AT.tag_str, ''))"
+        "     from artifacts A"
+        "     left join ("
+        "         select replace(string_agg(value, ' '), ',', ' ') as metadata_str"
+        "         from artifact_metadata"
+        "         where artifact_id = aid and name IN " + SEARCH_METADATA_NAMES +
+        "     ) AM on true"
+        "     left join ("
+        "         select string_agg(tag, ' ') as tag_str"
+        "         from artifact_tags"
+        "         where artifact_id = aid"
+        "     ) AT on true"
+        "     where A.id = aid"
+        "     on conflict (artifact_id) do update set doc_vector = excluded.doc_vector;"
+        " end $$;"
+    )
+
+    #
+    # Row triggers only record which artifacts changed; the (single) rebuild
+    # per artifact happens in a deferred trigger at commit, so an import that
+    # inserts hundreds of tags and metadata rows rebuilds its document once.
+    #
+    op.execute(
+        "create or replace function artifact_search_mark_dirty()"
+        " returns trigger language plpgsql"
+        " as $$"
+        " begin"
+        "     if TG_TABLE_NAME = 'artifacts' then"
+        "         insert into artifact_search_dirty values (NEW.id)"
+        "             on conflict do nothing;"
+        "         return null;"
+        "     end if;"
+        "     if TG_OP <> 'DELETE' then"
+        "         if NEW.artifact_id is not null then"
+        "             insert into artifact_search_dirty values (NEW.artifact_id)"
+        "                 on conflict do nothing;"
+        "         end if;"
+        "     end if;"
+        "     if TG_OP <> 'INSERT' then"
+        "         if OLD.artifact_id is not null then"
+        "             insert into artifact_search_dirty values (OLD.artifact_id)"
+        "                 on conflict do nothing;"
+        "         end if;"
+        "     end if;"
+        "     return null;"
+        " end $$;"
+    )
+    op.execute(
+        "create trigger artifact_search_dirty"
+        " after insert or update of title, description"
+        " on artifacts for each row"
+        " execute procedure artifact_search_mark_dirty();"
+    )
+    for table in ("artifact_metadata", "artifact_tags"):
+        op.execute(
+            "create trigger artifact_search_dirty"
+            " after insert or update or delete"
+            " on %s for each row"
+            " execute procedure artifact_search_mark_dirty();" % (table,)
+        )
+
+    op.execute(
+        "create or replace function artifact_search_flush()"
+        " returns trigger language plpgsql"
+        " as $$"
+        " begin"
+        "     perform artifact_search_view_refresh(NEW.artifact_id);"
+        "     delete from artifact_search_dirty where artifact_id = NEW.artifact_id;"
+        "     return null;"
+        " end $$;"
+    )
+    op.execute(
+        "create constraint trigger artifact_search_flush"
+        " after insert on artifact_search_dirty"
+        " deferrable initially deferred"
+        " for each row execute procedure artifact_search_flush();"
+    )
+
+    # Backfill.
+    op.execute(
+        "insert into artifact_search_view (artifact_id, doc_vector)"
+        " select A.id, to_tsvector('english', coalesce(A.title, '') || ' ' || coalesce(A.description, '') || ' ' || coalesce(AM.metadata_str, '') || ' ' || coalesce(AT.tag_str, ''))"
+        " from artifacts A"
+        " left join ("
+        "     select artifact_id, replace(string_agg(value, ' '), ',', ' ') as metadata_str"
+        "     from artifact_metadata"
+        "     where name IN " + SEARCH_METADATA_NAMES +
+        "     group by artifact_id"
+        " ) AM on A.id = AM.artifact_id"
+        " left join ("
+        "     select artifact_id, string_agg(tag, ' ') as tag_str"
+        "     from artifact_tags"
+        "     group by artifact_id"
+        " ) AT on A.id = AT.artifact_id;"
+    )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS artifact_search_flush on artifact_search_dirty;")
+    for table in ("artifacts", "artifact_metadata", "artifact_tags"):
+        op.execute("DROP TRIGGER IF EXISTS artifact_search_dirty on %s;" % (table,))
+    op.execute("DROP FUNCTION IF EXISTS public.artifact_search_flush;")
+    op.execute("DROP FUNCTION IF EXISTS public.artifact_search_mark_dirty;")
+    op.execute("DROP FUNCTION IF EXISTS public.artifact_search_view_refresh;")
+    op.drop_table('artifact_search_dirty')
+    op.drop_index('doc_idx')
+    op.drop_table('artifact_search_view')
+
+    op.execute(
+        "create materialized view artifact_search_view AS "
+        " select A.id as artifact_id, to_tsvector('english', coalesce(A.title, '') || ' ' || coalesce(A.description, '') || ' ' || coalesce(AM.metadata_str, '') || ' ' || coalesce(AT.tag_str, '')) as doc_vector"
+        " from "
+        " ("
+        "     select id, title, description"
+        "     from artifacts"
+        " ) A "
+        " left join "
+        " ("
+        "     select artifact_id, replace(string_agg(value, ' '), ',', ' ') as metadata_str"
+        "     from artifact_metadata "
+        "     where name IN " + SEARCH_METADATA_NAMES +
+        "     group by artifact_id"
+        " ) AM on A.id = AM.artifact_id"
+        " left join "
+        " ("
+        "     select artifact_id, string_agg(tag, ' ') as tag_str "
+        "     from artifact_tags "
+        "     group by artifact_id"
+        " ) AT on AM.artifact_id = AT.artifact_id;"
+    )
+    op.execute(
+        "create or replace function refresh_mat_view()"
+        " returns trigger language plpgsql"
+        " as $$"
+        " begin"
+        "     refresh materialized view public.artifact_search_view;"
+        "     return null;"
+        " end $$;"
+    )
+    op.execute(
+        "create trigger refresh_mat_view"
+        " after insert or update or delete or truncate"
+        " on artifacts for each statement "
+        " execute procedure refresh_mat_view();"
+    )
+    op.create_index('doc_idx', 'artifact_search_view', [sa.text("doc_vector")], postgresql_using='gin')
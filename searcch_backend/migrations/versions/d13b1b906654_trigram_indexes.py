@@ -0,0 +1,38 @@
+"""trigram indexes
+
+Revision ID: d13b1b906654
+Revises: 6c4e4c3c691f
+Create Date: 2026-10-18 22:03:51.846017
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd13b1b906654'
+down_revision = '6c4e4c3c691f'
+branch_labels = None
+depends_on = None
+
+# (index, table, column): GIN trigram indexes, used by the typeahead
+# endpoints (similarity) and by the owner= substring (ilike) filters.
+TRGM_INDEXES = [
+    ("organizations_name_trgm_idx", "organizations", "name"),
+    ("persons_name_trgm_idx", "persons", "name"),
+    ("persons_email_trgm_idx", "persons", "email"),
+    ("badges_title_trgm_idx", "badges", "title"),
+]
+
+
+def upgrade():
+    op.execute("create extension if not exists pg_trgm;")
+    for (name, table, column) in TRGM_INDEXES:
+        op.execute(
+            "create index %s on %s using gin (%s gin_trgm_ops);"
+            % (name, table, column))
+
+
+def downgrade():
+    for (name, table, column) in TRGM_INDEXES:
+        op.execute("drop index if exists %s;" % (name,))
@@ -29,11 +29,17 @@ class ArtifactFile(db.Model):
     name = db.Column(db.String(512))
     filetype = db.Column(db.String(128), nullable=False)
     content = db.Column(db.LargeBinary())
+    # If content is in the blob store, its SHA-256 and length.
+    content_digest = db.Column(db.String(64))
+    content_size = db.Column(db.BigInteger)
     size = db.Column(db.BigInteger)
     mtime = db.Column(db.DateTime)
     
     members = db.relationship("ArtifactFileMember", uselist=True)
 
+    # Columns needed to read a blob column that may be stored out of row.
+    __blob_columns__ = { "content": ("content_digest",) }
+
     __table_args__ = (
         db.UniqueConstraint("artifact_id", "url"),)
 
@@ -54,9 +60,15 @@ class ArtifactFileMember(db.Model):
     name = db.Column(db.String(512))
     filetype = db.Column(db.String(128), nullable=False)
     content = db.Column(db.LargeBinary())
+    # If content is in the blob store, its SHA-256 and length.
+    content_digest = db.Column(db.String(64))
+    content_size = db.Column(db.BigInteger)
     size = db.Column(db.Integer)
     mtime = db.Column(db.DateTime)
 
+    # Columns needed to read a blob column that may be stored out of row.
+    __blob_columns__ = { "content": ("content_digest",) }
+
     __table_args__ = (
         db.UniqueConstraint("parent_file_id", "pathname"),)
 
@@ -254,6 +266,12 @@ class Person(db.Model):
     website = db.Column(db.Text, nullable=True)
     person_tsv = db.Column(TSVECTOR)
 
+    __table_args__ = (
+        db.Index("persons_name_trgm_idx", "name", postgresql_using="gin",
+                 postgresql_ops={"name": "gin_trgm_ops"}),
+        db.Index("persons_email_trgm_idx", "email", postgresql_using="gin",
+                 postgresql_ops={"email": "gin_trgm_ops"}),)
+
     def __repr__(self):
         return "<Person(id=%r,name=%r, email=%r)>" % (
             self.id, self.name, self.email)
@@ -337,6 +355,10 @@ class Organization(db.Model):
     verified = db.Column(db.Boolean, nullable=False, default=False)
     org_tsv = db.Column(TSVECTOR)
 
+    __table_args__ = (
+        db.Index("organizations_name_trgm_idx", "name", postgresql_using="gin",
+                 postgresql_ops={"name": "gin_trgm_ops"}),)
+
     def __repr__(self):
         return "<Organization(name=%r,type=%r,url=%r,verified=%r)>" % (
             self.name, self.type, self.url, self.verified)
@@ -415,7 +437,9 @@ class Badge(db.Model):
     verified = db.Column(db.Boolean, nullable=False, default=False)
 
     __table_args__ = (
-        db.UniqueConstraint("title", "url", "version", "organization"),)
+        db.UniqueConstraint("title", "url", "version", "organization"),
+        db.Index("badges_title_trgm_idx", "title", postgresql_using="gin",
+                 postgresql_ops={"title": "gin_trgm_ops"}),)
 
     __object_from_json_allow_pk__ = True
 
@@ -497,6 +521,102 @@ class ArtifactFavorites(db.Model):
             self.id, self.user_id, self.artifact_id)
 
 
+class ArtifactStats(db.Model):
+    # Per-artifact rating/review/favorite aggregates.  Maintained by
+    # api.common.stats in the same transaction as the rating, review, and
+    # favorite changes; rebuild with `flask rebuild-artifact-stats`.
+    # generation is bumped (by trigger) whenever the artifact or one of its
+    # child rows changes; it is the artifact's ETag.
+    __tablename__ = "artifact_stats"
+
+    artifact_id = db.Column(
+        db.Integer, db.ForeignKey("artifacts.id", ondelete="CASCADE"),
+        primary_key=True)
+    num_ratings = db.Column(db.Integer, nullable=False, server_default="0")
+    rating_sum = db.Column(db.Integer, nullable=False, server_default="0")
+    avg_rating = db.Column(db.Float, nullable=True)
+    num_reviews = db.Column(db.Integer, nullable=False, server_default="0")
+    num_favorites = db.Column(db.Integer, nullable=False, server_default="0")
+    generation = db.Column(
+        db.BigInteger, nullable=False,
+        server_default=db.text("nextval('artifact_generation_seq')"))
+
+    def __repr__(self):
+        return "<ArtifactStats(artifact_id=%r,num_ratings=%r,avg_rating=%r,num_reviews=%r,num_favorites=%r)>" % (
+            self.artifact_id, self.num_ratings, self.avg_rating,
+            self.num_reviews, self.num_favorites)
+
+
+class ArtifactTerm(db.Model):
+    # An artifact's TF-IDF term vector (unit length, as of its last
+    # refresh), from its tags, topic metadata, title, and description.
+    # Maintained by api.common.recommender.
+    __tablename__ = "artifact_terms"
+
+    artifact_id = db.Column(
+        db.Integer, db.ForeignKey("artifacts.id", ondelete="CASCADE"),
+        primary_key=True)
+    term = db.Column(db.String(64), primary_key=True)
+    weight = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index("artifact_terms_term_idx", "term"),)
+
+    def __repr__(self):
+        return "<ArtifactTerm(artifact_id=%r,term=%r,weight=%r)>" % (
+            self.artifact_id, self.term, self.weight)
+
+
+class ArtifactNeighbor(db.Model):
+    # The top-K most similar (cosine of term vectors) published artifacts
+    # to each published artifact.  Maintained by api.common.recommender.
+    __tablename__ = "artifact_neighbors"
+
+    artifact_id = db.Column(
+        db.Integer, db.ForeignKey("artifacts.id", ondelete="CASCADE"),
+        primary_key=True)
+    neighbor_id = db.Column(
+        db.Integer, db.ForeignKey("artifacts.id", ondelete="CASCADE"),
+        primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index("artifact_neighbors_score_idx", "artifact_id", score.desc()),
+        db.Index("artifact_neighbors_neighbor_idx", "neighbor_id"),)
+
+    def __repr__(self):
+        return "<ArtifactNeighbor(artifact_id=%r,neighbor_id=%r,score=%r)>" % (
+            self.artifact_id, self.neighbor_id, self.score)
+
+
+class ArtifactRecommendationState(db.Model):
+    # The artifact_stats generation an artifact's terms and neighbors were
+    # computed at; artifacts whose generation has since changed are stale.
+    __tablename__ = "artifact_recommendation_state"
+
+    artifact_id = db.Column(
+        db.Integer, db.ForeignKey("artifacts.id", ondelete="CASCADE"),
+        primary_key=True)
+    generation = db.Column(db.BigInteger, nullable=False)
+    mtime = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return "<ArtifactRecommendationState(artifact_id=%r,generation=%r,mtime=%r)>" % (
+            self.artifact_id, self.generation, self.mtime)
+
+
+class TableVersion(db.Model):
+    # Per-table change counters, bumped (by statement-level triggers) on
+    # every change to the table.
+    __tablename__ = "table_versions"
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, server_default="0")
+
+    def __repr__(self):
+        return "<TableVersion(name=%r,version=%r)>" % (self.name, self.version)
+
+
 class Sessions(db.Model):
     __tablename__ = "sessions"
     __table_args__ = (
@@ -579,14 +699,29 @@ class Artifact(db.Model):
 
 class ArtifactSearchMaterializedView(db.Model):
     # The ArtifactSearchMaterializedView class provides an internal model of a SEARCCH artifact's searchable index.
+    # NB: this is no longer a materialized view; it is a table maintained
+    # per-artifact by the artifact_search_* triggers on artifacts,
+    # artifact_metadata, and artifact_tags.
     __tablename__ = "artifact_search_view"
 
-    dummy_id = db.Column(db.Integer, primary_key=True)  # this id does not actually exist in the database
-    artifact_id = db.Column(db.Integer)
+    artifact_id = db.Column(
+        db.Integer, db.ForeignKey("artifacts.id", ondelete="CASCADE"),
+        primary_key=True)
     doc_vector = db.Column(TSVECTOR)
     
     def __repr__(self):
-        return "<ArtifactSearchMaterializedView(artifact_id=%r,doc_vector='%s')>" % (self.id, self.doc_vector)
+        return "<ArtifactSearchMaterializedView(artifact_id=%r,doc_vector='%s')>" % (self.artifact_id, self.doc_vector)
+
+
+class ArtifactSearchDirty(db.Model):
+    # Artifacts whose search document is rebuilt when the current transaction
+    # commits.  Only written by triggers.
+    __tablename__ = "artifact_search_dirty"
+
+    artifact_id = db.Column(db.Integer, primary_key=True)
+
+    def __repr__(self):
+        return "<ArtifactSearchDirty(artifact_id=%r)>" % (self.artifact_id,)
 
 
 ARTIFACT_IMPORT_STATUSES = (
@@ -1,8 +1,10 @@
 from marshmallow_sqlalchemy import ModelSchema, SQLAlchemyAutoSchema, auto_field
 from marshmallow_sqlalchemy.convert import ModelConverter as BaseModelConverter
 from marshmallow_sqlalchemy.fields import Nested
+from marshmallow import fields as ma_fields
 
 from searcch_backend.api.app import ma
+from searcch_backend.api.common.blobstore import get_content
 from searcch_backend.models.model import *
 
 
@@ -12,6 +14,17 @@ class ModelConverter(BaseModelConverter):
     }
 
 
+class BlobContent(ma_fields.String):
+    """
+    A content column that may be held in the blob store instead of the row.
+    """
+
+    def _serialize(self, value, attr, obj, **kwargs):
+        if value is None:
+            value = get_content(obj)
+        return super(BlobContent, self)._serialize(value, attr, obj, **kwargs)
+
+
 class ArtifactFundingSchema(SQLAlchemyAutoSchema):
     class Meta:
         model = ArtifactFunding
@@ -54,6 +67,8 @@ class ArtifactFileMemberSchema(SQLAlchemyAutoSchema):
         include_fk = True
         include_relationships = True
 
+    content = BlobContent(allow_none=True)
+
 
 class ArtifactFileSchema(SQLAlchemyAutoSchema):
     class Meta:
@@ -63,6 +78,7 @@ class ArtifactFileSchema(SQLAlchemyAutoSchema):
         include_fk = True
         include_relationships = True
 
+    content = BlobContent(allow_none=True)
     members = Nested(ArtifactFileMemberSchema, many=True)
 
 
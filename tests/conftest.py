@@ -0,0 +1,131 @@
+"""
+Fixtures for tests that need the app and a database.
+
+These tests run against a real Postgres database (the search index, stats,
+and versions are maintained by triggers), which they migrate and empty
+between tests: set SEARCCH_TEST_DATABASE_URI to a disposable database's
+URI to run them.  Tests that need no database run regardless.
+"""
+
+import datetime
+import itertools
+import os
+import tempfile
+
+import pytest
+
+TEST_DATABASE_URI = os.environ.get("SEARCCH_TEST_DATABASE_URI")
+TEST_API_KEY = "test-api-key"
+
+_artifact_numbers = itertools.count(1)
+
+# Tables that are not emptied between tests.
+PRESERVED_TABLES = ("table_versions",)
+
+def _write_instance_config():
+    # The app reads its configuration when it is imported, so this must
+    # happen before the first import of searcch_backend.api.app.
+    path = os.path.join(tempfile.mkdtemp(prefix="searcch-test-"), "config.py")
+    with open(path, "w") as f:
+        f.write("SQLALCHEMY_DATABASE_URI = %r\n" % (TEST_DATABASE_URI,))
+        f.write("SHARED_SECRET_KEY = %r\n" % (TEST_API_KEY,))
+        f.write("DB_AUTO_MIGRATE = True\n")
+        f.write("SQLALCHEMY_ECHO = False\n")
+        f.write("SESSION_CACHE_BACKEND = 'memory'\n")
+        f.write("SEARCH_CACHE_ENABLED = False\n")
+        f.write("SEARCH_FACET_CACHE_ENABLED = False\n")
+        f.write("INSTRUMENTATION_ENABLED = False\n")
+        f.write("METRICS_ENABLED = False\n")
+        f.write("RECOMMENDER_REFRESH_INTERVAL = 0\n")
+    os.environ["FLASK_INSTANCE_CONFIG_FILE"] = path
+
+@pytest.fixture(scope="session")
+def app():
+    if not TEST_DATABASE_URI:
+        pytest.skip("SEARCCH_TEST_DATABASE_URI not set")
+    _write_instance_config()
+    from searcch_backend.api.app import app
+    return app
+
+@pytest.fixture
+def session(app):
+    """
+    A database session in an app and request context, on an emptied
+    database.
+    """
+    from searcch_backend.api.app import db
+    with app.test_request_context():
+        tables = [ t.name for t in db.metadata.sorted_tables
+                   if t.name not in PRESERVED_TABLES ]
+        db.session.execute(
+            "truncate %s restart identity cascade" % (", ".join(tables),))
+        db.session.commit()
+        yield db.session
+        db.session.rollback()
+        db.session.remove()
+
+@pytest.fixture
+def user(session):
+    from searcch_backend.models.model import Person, User
+    person = Person(name="Test User", email="test@example.org")
+    user = User(person=person)
+    session.add(user)
+    session.commit()
+    return user
+
+@pytest.fixture
+def make_artifact(session, user):
+    """
+    Returns a function that creates and commits a (by default, published)
+    artifact.
+    """
+    from searcch_backend.models.model import Artifact, ArtifactPublication, ArtifactTag
+    def make(title, description="", tags=(), type="software", published=True):
+        now = datetime.datetime.now()
+        artifact = Artifact(
+            type=type, url="https://example.org/artifact/%d" % (next(_artifact_numbers),),
+            title=title, description=description, ctime=now, owner=user,
+            tags=[ ArtifactTag(tag=tag, source="test") for tag in tags ])
+        if published:
+            artifact.publication = ArtifactPublication(time=now, publisher=user)
+        session.add(artifact)
+        session.commit()
+        return artifact
+    return make
+
+@pytest.fixture
+def statements(session):
+    """
+    A list of the statements executed (on the app's engine) from here to the
+    end of the test.
+    """
+    import sqlalchemy
+    from searcch_backend.api.app import db
+    executed = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany):
+        executed.append(statement)
+    sqlalchemy.event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    yield executed
+    sqlalchemy.event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+@pytest.fixture
+def make_token(session, user):
+    """
+    Returns a function that creates a login session for `user`, and returns
+    its token.
+    """
+    from searcch_backend.models.model import Sessions
+    tokens = itertools.count(1)
+    def make(is_admin=False):
+        token = "test-token-%d" % (next(tokens),)
+        session.add(Sessions(
+            user=user, sso_token=token, is_admin=is_admin,
+            expires_on=datetime.datetime.now() + datetime.timedelta(days=1)))
+        session.commit()
+        return token
+    return make
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
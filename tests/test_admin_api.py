@@ -0,0 +1,22 @@
+from conftest import TEST_API_KEY
+
+def headers(token=None):
+    h = { "X-Api-Key": TEST_API_KEY }
+    if token:
+        h["Authorization"] = token
+    return h
+
+def test_clear_caches_requires_admin(session, client, make_token):
+    path = "/v1/caches"
+    assert client.delete(path, headers=headers()).status_code == 403
+    assert client.delete(path, headers=headers(make_token())).status_code == 403
+    assert client.delete(path, headers=headers(make_token(is_admin=True))).status_code == 200
+    # Reading the counters needs only the API key.
+    assert client.get(path, headers=headers()).status_code == 200
+
+def test_clear_slow_queries_requires_admin(session, client, make_token):
+    path = "/v1/slowqueries"
+    assert client.delete(path, headers=headers()).status_code == 403
+    assert client.delete(path, headers=headers(make_token())).status_code == 403
+    # The slow query log is disabled in tests; an admin gets past the check.
+    assert client.delete(path, headers=headers(make_token(is_admin=True))).status_code == 404
@@ -0,0 +1,61 @@
+import hashlib
+import os
+
+import pytest
+
+@pytest.fixture
+def blobstore(app, tmp_path, monkeypatch):
+    """
+    The blobstore module, with a store in a temporary directory, and its
+    listener on ArtifactFile.content.
+    """
+    import sqlalchemy
+    from searcch_backend.api.common import blobstore
+    from searcch_backend.models.model import ArtifactFile
+    monkeypatch.setattr(blobstore, "blob_store", blobstore.BlobStore(str(tmp_path)))
+    sqlalchemy.event.listen(
+        ArtifactFile.content, "set", blobstore._offload_content, retval=True)
+    yield blobstore
+    sqlalchemy.event.remove(
+        ArtifactFile.content, "set", blobstore._offload_content)
+
+def test_put_is_content_addressed(tmp_path):
+    from searcch_backend.api.common.blobstore import BlobStore
+    store = BlobStore(str(tmp_path))
+    (digest, size) = store.put(b"hello")
+    assert digest == hashlib.sha256(b"hello").hexdigest()
+    assert size == 5
+    assert store.put(b"hello") == (digest, size)
+    assert store.get(digest) == b"hello"
+    # Sharded two levels deep by digest prefix.
+    assert store.path(digest) \
+      == os.path.join(str(tmp_path), digest[0:2], digest[2:4], digest)
+    assert os.path.isfile(store.path(digest))
+    assert store.exists(digest)
+    with pytest.raises(ValueError):
+        store.path("../etc/passwd")
+
+def test_open(tmp_path):
+    from searcch_backend.api.common.blobstore import BlobStore
+    store = BlobStore(str(tmp_path))
+    (digest, _) = store.put(b"hello")
+    (mm, size) = store.open(digest)
+    try:
+        assert (mm[:], size) == (b"hello", 5)
+    finally:
+        mm.close()
+    (digest, _) = store.put(b"")
+    assert store.open(digest) == (None, 0)
+
+def test_content_offloaded_and_cleared(blobstore):
+    from searcch_backend.models.model import ArtifactFile
+    f = ArtifactFile(url="https://example.org/f", filetype="text/plain",
+                     content=b"hello")
+    assert f.content is None
+    assert f.content_digest == hashlib.sha256(b"hello").hexdigest()
+    assert f.content_size == 5
+    assert blobstore.get_content(f) == b"hello"
+    f.content = None
+    assert f.content_digest is None
+    assert f.content_size is None
+    assert blobstore.get_content(f) is None
@@ -0,0 +1,18 @@
+from test_sql import artifact_doc
+
+def test_failed_document_leaves_nothing(session, user):
+    from searcch_backend.api.common.bulk import ingest_artifacts
+    from searcch_backend.models.model import Affiliation, Artifact, Person
+    bad = artifact_doc(1, [1, 2])
+    # Fails on the second affiliation, after the first is built.
+    bad["affiliations"][1]["roles"] = "Bogus"
+    # Refers to the failed document's new person.
+    docs = [ artifact_doc(0, [0]), bad, artifact_doc(2, [1]) ]
+    results = ingest_artifacts(session, docs, owner=user)
+
+    assert [ "id" in r for r in results ] == [ True, False, True ]
+    assert "enumeration" in results[1]["error"]
+    assert session.query(Artifact).count() == 2
+    assert sorted(name for (name,) in session.query(Person.name)
+                  if name != "Test User") == [ "Person 0", "Person 1" ]
+    assert session.query(Affiliation).count() == 2
@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+from searcch_backend.api.common import cache
+from searcch_backend.api.common.cache import (
+    CACHES, FileInvalidationBackend, TTLCache, get_cache_stats)
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+@pytest.fixture(autouse=True)
+def restore_caches():
+    saved = CACHES.copy()
+    yield
+    CACHES.clear()
+    CACHES.update(saved)
+
+def test_get_put(clock):
+    c = TTLCache("test", maxsize=10, ttl=60)
+    assert c.get("a") is None
+    assert c.get("a", "default") == "default"
+    c.put("a", 1)
+    assert c.get("a") == 1
+    stats = c.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 2, 1)
+
+def test_expiry(clock):
+    c = TTLCache("test", maxsize=10, ttl=60)
+    c.put("a", 1)
+    c.put("b", 2, ttl=10)
+    # A ttl longer than the cache's is capped.
+    c.put("c", 3, ttl=600)
+    clock.now += 30
+    assert c.get("a") == 1
+    assert c.get("b") is None
+    clock.now += 30
+    assert c.get("a") is None
+    assert c.get("c") is None
+    assert c.stats()["size"] == 0
+
+def test_nonpositive_ttl_not_cached(clock):
+    c = TTLCache("test", maxsize=10, ttl=60)
+    c.put("a", 1, ttl=0)
+    c.put("b", 2, ttl=-5)
+    assert c.get("a") is None
+    assert c.get("b") is None
+
+def test_lru_eviction(clock):
+    c = TTLCache("test", maxsize=2, ttl=60)
+    c.put("a", 1)
+    c.put("b", 2)
+    # Reading "a" makes "b" the least recently used.
+    assert c.get("a") == 1
+    c.put("c", 3)
+    assert c.get("b") is None
+    assert c.get("a") == 1
+    assert c.get("c") == 3
+    assert c.stats()["evictions"] == 1
+
+def test_invalidate_and_clear(clock):
+    c = TTLCache("test", maxsize=10, ttl=60)
+    c.put("a", 1)
+    c.put("b", 2)
+    c.invalidate("a")
+    assert c.get("a") is None
+    assert c.get("b") == 2
+    c.clear()
+    assert c.get("b") is None
+    assert c.stats()["invalidations"] == 2
+
+def test_registry():
+    c = TTLCache("test_registry", maxsize=10, ttl=60)
+    assert CACHES["test_registry"] is c
+    assert "test_registry" in [ s["name"] for s in get_cache_stats() ]
+
+def test_file_backend_shared_invalidation(tmp_path):
+    # Two caches on one directory stand in for two workers.
+    c1 = TTLCache("worker1", ttl=60,
+                  backend=FileInvalidationBackend(str(tmp_path), 60))
+    c2 = TTLCache("worker2", ttl=60,
+                  backend=FileInvalidationBackend(str(tmp_path), 60))
+    read_at = time.time() - 10
+    c1.put("a", 1, cached_at=read_at)
+    c1.put("b", 2, cached_at=read_at)
+    c2.invalidate("a")
+    assert c1.get("a") is None
+    assert c1.get("b") == 2
+    # A value read after the invalidation is valid.
+    c1.put("a", 3, cached_at=time.time() + 10)
+    assert c1.get("a") == 3
+    c2.clear()
+    assert c1.get("b") is None
+    assert c1.get("a") == 3
+
+def test_make_cache(tmp_path):
+    class App(object):
+        config = dict(TEST_SIZE=5, TEST_TTL=30, TEST_BACKEND="file",
+                      TEST_DIR=str(tmp_path))
+    c = cache.make_cache(App, "made", "TEST")
+    assert (c.maxsize, c.ttl) == (5, 30)
+    assert isinstance(c.backend, FileInvalidationBackend)
+    App.config["TEST_BACKEND"] = "bogus"
+    with pytest.raises(ValueError):
+        cache.make_cache(App, "made", "TEST")
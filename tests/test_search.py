@@ -0,0 +1,69 @@
+import pytest
+
+def search_pages(keywords, items_per_page):
+    from searcch_backend.api.resources.artifact_search import search_artifacts
+    ids = []
+    cursor = None
+    while True:
+        ret = search_artifacts(
+            keywords, None, None, None, None, None, 1, items_per_page,
+            cursor=cursor, use_cursor=True, total_mode="none")
+        ids.extend(a["id"] for a in ret["artifacts"])
+        cursor = ret["next_cursor"]
+        if not cursor:
+            return ids
+
+def test_cursor_pages_rank_ties(session, make_artifact):
+    # Identical documents have identical ranks, so only the id orders them.
+    expected = [ make_artifact("zebra migration", "zebra zebra crossing").id
+                 for i in range(7) ]
+    make_artifact("unrelated", "nothing to see")
+    ids = search_pages("zebra", 2)
+    assert ids == sorted(expected, reverse=True)
+
+def test_cursor_pages_match_offset_pages(session, make_artifact):
+    from searcch_backend.api.resources.artifact_search import search_artifacts
+    for i in range(5):
+        make_artifact("zebra %d" % (i,), "zebra " * (i % 3 + 1))
+    offset_ids = search_artifacts(
+        "zebra", None, None, None, None, None, 1, 100)
+    assert len(offset_ids["artifacts"]) == 5
+    assert sorted(search_pages("zebra", 2)) \
+      == sorted(a["id"] for a in offset_ids["artifacts"])
+
+def test_cursor_without_keywords(session, make_artifact):
+    expected = [ make_artifact("artifact %d" % (i,), type=t).id
+                 for (i, t) in enumerate(("software", "dataset", "software",
+                                          "other", "dataset")) ]
+    make_artifact("unpublished", published=False)
+    assert sorted(search_pages(None, 2)) == sorted(expected)
+
+def test_invalid_cursor(session):
+    from searcch_backend.api.resources.artifact_search import decode_search_cursor
+    with pytest.raises(ValueError):
+        decode_search_cursor("not-a-cursor")
+
+def test_search_generation_covers_filters(session, make_artifact):
+    from searcch_backend.api.resources.artifact_search import get_search_generation
+    from searcch_backend.models.model import ArtifactBadge, Badge
+    artifact = make_artifact("zebra", "zebra crossing")
+    badge = Badge(title="Badge", url="https://example.org/badge",
+                  organization="Badge Org")
+    session.add(badge)
+    session.commit()
+
+    generation = get_search_generation()
+    artifact.badges.append(ArtifactBadge(badge=badge))
+    session.commit()
+    assert get_search_generation() != generation
+
+    generation = get_search_generation()
+    artifact.type = "dataset"
+    session.commit()
+    assert get_search_generation() != generation
+
+    # Columns that neither filters nor abstracts read do not matter.
+    generation = get_search_generation()
+    artifact.name = "renamed"
+    session.commit()
+    assert get_search_generation() == generation
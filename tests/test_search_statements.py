@@ -0,0 +1,38 @@
+import pytest
+
+from test_search import search_pages
+
+SEARCH_FILTERS = (None, None, None, None, None)
+
+@pytest.fixture
+def corpus(make_artifact):
+    for i in range(6):
+        make_artifact("zebra %d" % (i,), "zebra crossing " * (i % 3 + 1),
+                      tags=("zebra", "tag%d" % (i % 2,)),
+                      type=("software", "dataset")[i % 2])
+
+@pytest.mark.parametrize("keywords", ["zebra", None])
+@pytest.mark.parametrize("total_mode", ["exact", "none"])
+def test_offset_page_is_one_statement(session, corpus, statements, keywords,
+                                      total_mode):
+    from searcch_backend.api.resources.artifact_search import search_artifacts
+    ret = search_artifacts(keywords, *SEARCH_FILTERS, 1, 4,
+                           total_mode=total_mode)
+    assert len(ret["artifacts"]) == 4
+    if total_mode == "exact":
+        assert ret["total"] == 6
+    assert len(statements) == 1
+
+def test_facets_in_page_statement(session, corpus, statements):
+    from searcch_backend.api.resources.artifact_search import search_artifacts
+    ret = search_artifacts("zebra", *SEARCH_FILTERS, 1, 4,
+                           facets=["type", "badge", "organization"])
+    assert ret["total"] == 6
+    assert "facets" in ret
+    assert len(statements) == 1
+
+@pytest.mark.parametrize("keywords", ["zebra", None])
+def test_cursor_page_is_one_statement(session, corpus, statements, keywords):
+    ids = search_pages(keywords, 2)
+    assert len(ids) == 6
+    assert len(statements) == 3
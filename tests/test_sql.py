@@ -0,0 +1,196 @@
+import json
+
+import pytest
+
+def artifact_doc(n, persons, org=0, license=0):
+    """
+    An artifact document, shaped like importer output, with an affiliation
+    for each of `persons` (numbers) at organization `org`.
+    """
+    return dict(
+        type="software", url="https://example.org/doc/%d" % (n,),
+        title="Document %d" % (n,), description="A test document.",
+        ctime="2021-01-01T00:00:00",
+        license=dict(short_name="LIC-%d" % (license,), long_name="License %d" % (license,),
+                     url="https://licenses.example.org/%d" % (license,)),
+        affiliations=[
+            dict(roles="Author", affiliation=dict(
+                person=dict(name="Person %d" % (p,), email="person%d@example.org" % (p,)),
+                org=dict(name="Organization %d" % (org,), type="Institution",
+                         url="https://org%d.example.org" % (org,))))
+            for p in persons ])
+
+def build(session, docs, resolver):
+    from searcch_backend.api.common.sql import object_from_json
+    from searcch_backend.models.model import Artifact
+    with session.no_autoflush:
+        return [ object_from_json(session, Artifact, doc, allow_fk=True,
+                                  resolver=resolver)
+                 for doc in docs ]
+
+def make_resolver(session, docs):
+    from searcch_backend.api.common.sql import NaturalKeyResolver
+    from searcch_backend.models.model import Artifact
+    resolver = NaturalKeyResolver(session, allow_fk=True)
+    for doc in docs:
+        resolver.collect(Artifact, doc)
+    resolver.resolve()
+    return resolver
+
+def test_resolver_finds_existing_references(session, statements):
+    from searcch_backend.models.model import Affiliation, License, Organization, Person
+    org = Organization(name="Organization 0", type="Institution",
+                       url="https://org0.example.org")
+    affiliations = [
+        Affiliation(person=Person(name="Person %d" % (p,),
+                                  email="person%d@example.org" % (p,)), org=org)
+        for p in range(3) ]
+    license = License(short_name="LIC-0", long_name="License 0",
+                      url="https://licenses.example.org/0")
+    session.add_all(affiliations + [ license ])
+    session.commit()
+    del statements[:]
+
+    docs = [ artifact_doc(0, [0, 1]), artifact_doc(1, [1, 2]) ]
+    resolver = make_resolver(session, docs)
+    # One query per referenced class (License, Person, Organization,
+    # Affiliation), however many references there are.
+    assert resolver.queries == 4
+    assert len(statements) == 4
+    assert not resolver.misses
+
+    artifacts = build(session, docs, resolver)
+    assert len(statements) == 4
+    assert artifacts[0].license is license
+    assert artifacts[1].license is license
+    assert [ a.affiliation for a in artifacts[0].affiliations ] == affiliations[:2]
+    assert [ a.affiliation for a in artifacts[1].affiliations ] == affiliations[1:]
+
+def test_resolver_shares_new_references(session, statements):
+    from searcch_backend.models.model import Affiliation, Person
+    docs = [ artifact_doc(0, [0, 1]), artifact_doc(1, [1]) ]
+    resolver = make_resolver(session, docs)
+    assert resolver.misses
+    executed = len(statements)
+
+    # New references are built once, and shared by every document that
+    # refers to them, without further queries.
+    artifacts = build(session, docs, resolver)
+    assert len(statements) == executed
+    assert artifacts[0].license is artifacts[1].license
+    assert artifacts[0].affiliations[1].affiliation \
+      is artifacts[1].affiliations[0].affiliation
+    assert artifacts[0].affiliations[0].affiliation.org \
+      is artifacts[1].affiliations[0].affiliation.org
+
+    session.add_all(artifacts)
+    session.commit()
+    assert session.query(Person).count() == 2
+    assert session.query(Affiliation).count() == 2
+
+def test_resolve_matches_unresolved_build(session):
+    from searcch_backend.api.common.sql import object_from_json
+    from searcch_backend.models.model import Artifact, Person
+    session.add(Person(name="Person 0", email="person0@example.org"))
+    session.commit()
+    (person,) = session.query(Person).all()
+    doc = artifact_doc(0, [0, 1])
+    with session.no_autoflush:
+        artifact = object_from_json(
+            session, Artifact, doc, allow_fk=True, resolve=True)
+    assert artifact.affiliations[0].affiliation.person is person
+    assert artifact.affiliations[1].affiliation.person.id is None
+
+def modified_copy(artifact, tags, **changes):
+    """
+    Returns a transient copy of `artifact`, as the update path would build
+    it from a client's document: same ids, `changes` to its fields, and
+    `tags` (existing ArtifactTags, kept with their ids, or new tag names).
+    """
+    from searcch_backend.models.model import Artifact, ArtifactTag
+    fields = dict((k, getattr(artifact, k))
+                  for k in Artifact.__mapper__.column_attrs.keys())
+    fields.update(changes)
+    mod = Artifact(**fields)
+    mod.tags = [
+        ArtifactTag(tag=t, source="test") if isinstance(t, str)
+        else ArtifactTag(id=t.id, artifact_id=t.artifact_id, tag=t.tag, source=t.source)
+        for t in tags ]
+    return mod
+
+def test_diff_and_apply(session, make_artifact, user):
+    from searcch_backend.api.common.sql import artifact_diff, record_artifact_diff
+    from searcch_backend.models.model import Artifact, ArtifactCuration
+    artifact = make_artifact("old title", tags=("a", "b", "c"))
+    tags = sorted(artifact.tags, key=lambda t: t.tag)
+    mod = modified_copy(artifact, tags[1:] + [ "d" ], title="new title")
+
+    diff = artifact_diff(session, artifact, artifact, mod)
+    # Computing the diff changes neither the artifact nor the session.
+    assert artifact.title == "old title"
+    assert sorted(t.tag for t in artifact.tags) == [ "a", "b", "c" ]
+    assert not session.new and not session.dirty
+    assert sorted((op["op"], op["data"]["field"]) for op in diff.ops) \
+      == [ ("add", "tags"), ("del", "tags"), ("set", "title") ]
+    assert len(diff) == 3
+
+    diff.apply(session)
+    record_artifact_diff(session, user, artifact, diff)
+    session.commit()
+    session.expire_all()
+    artifact = session.query(Artifact).get(artifact.id)
+    assert artifact.title == "new title"
+    assert sorted(t.tag for t in artifact.tags) == [ "b", "c", "d" ]
+    # The whole diff is one curation.
+    (curation,) = session.query(ArtifactCuration).all()
+    assert curation.artifact_id == artifact.id
+    assert curation.curator_id == user.id
+    opdata = json.loads(curation.opdata)
+    assert opdata["op"] == "batch"
+    assert opdata["ops"] == diff.ops
+
+def test_diff_unchanged(session, make_artifact, user):
+    from searcch_backend.api.common.sql import artifact_diff, record_artifact_diff
+    from searcch_backend.models.model import ArtifactCuration
+    artifact = make_artifact("title", tags=("a", "b"))
+    diff = artifact_diff(session, artifact, artifact,
+                         modified_copy(artifact, artifact.tags))
+    assert len(diff) == 0
+    record_artifact_diff(session, user, artifact, diff)
+    session.commit()
+    assert session.query(ArtifactCuration).count() == 0
+
+def test_diff_rejects_disallowed_changes(session, make_artifact):
+    from searcch_backend.api.common.sql import artifact_diff
+    artifact = make_artifact("title", tags=("a",))
+    with pytest.raises(ValueError):
+        artifact_diff(session, artifact, artifact,
+                      modified_copy(artifact, artifact.tags, version=5))
+    with pytest.raises(ValueError):
+        artifact_diff(session, artifact, artifact,
+                      modified_copy(artifact, artifact.tags, id=artifact.id + 1))
+    with pytest.raises(TypeError):
+        artifact_diff(session, artifact.tags[0], artifact,
+                      modified_copy(artifact, artifact.tags))
+
+def test_delete_artifacts_marks_neighbors_stale(session, make_artifact):
+    import datetime
+    from searcch_backend.api.common.sql import delete_artifacts
+    from searcch_backend.models.model import (
+        Artifact, ArtifactNeighbor, ArtifactRecommendationState)
+    (a, b, c) = [ make_artifact("artifact %d" % (i,)).id for i in range(3) ]
+    now = datetime.datetime.now()
+    session.add_all(
+        [ ArtifactNeighbor(artifact_id=x, neighbor_id=y, score=0.5)
+          for (x, y) in ((a, b), (a, c), (b, c), (c, b)) ]
+        + [ ArtifactRecommendationState(artifact_id=x, generation=1, mtime=now)
+            for x in (a, b, c) ])
+    session.commit()
+
+    delete_artifacts(session, [c])
+    session.commit()
+    assert [ id for (id,) in session.query(Artifact.id).order_by(Artifact.id) ] == [a, b]
+    # a and b listed c, so their lists must be recomputed.
+    assert session.query(ArtifactRecommendationState).count() == 0
+    assert session.query(ArtifactNeighbor.artifact_id, ArtifactNeighbor.neighbor_id).all() \
+      == [ (a, b) ]